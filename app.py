@@ -1,54 +1,154 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, make_response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import bcrypt
 import pymongo
 import os
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
+from bson import ObjectId
+from config import Config
+from cache import TTLCache, build_user_cache_backend, user_cache
+from instrumentation import command_tally, init_instrumentation
+from metrics import init_metrics, pool_wait_listener
+from slow_query_log import slow_query_listener
+from readiness import init_readiness, readiness
+from circuit_breaker import init_circuit_breaker, mongo_breaker
+from load_shedding import init_load_shedding
+from outbox_dispatcher import build_sinks, outbox_dispatcher
+from models.outbox import Outbox, OUTBOX_COLLECTION
+from tasks import task_executor
+from models.task_store import TaskStore, TASK_COLLECTION
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes ObjectIds left in model documents"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__)
+app.json = MongoJSONProvider(app)
 CORS(app)
 load_dotenv()
+app.config.from_object(Config)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default-secret-key')
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
+
+def init_templates():
+    """Keep compiled templates on disk and compile the pages up front.
+
+    Restarted and newly forked workers then skip parsing. Called by the
+    servers (gunicorn.conf.py, run.py, asgi.py) rather than at import, so
+    the command-line jobs that import the app don't compile templates or
+    create JINJA_CACHE_DIR.
+    """
+    os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+    for template_name in ('base.html', 'index.html', 'dashboard.html', 'partials/platform_stats.html'):
+        app.jinja_env.get_template(template_name)
+
+
+fragment_cache = TTLCache(app.config['PLATFORM_STATS_TTL'])
+page_cache = TTLCache(app.config['LANDING_PAGE_TTL'])
+analytics_cache = TTLCache(app.config['PLATFORM_ANALYTICS_MAX_AGE'])
+
 MONGODB_URI = os.getenv('MONGODB_URI')
+MONGODB_DB = os.getenv('MONGODB_DB', 'quickcred')
 
-client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
-db = client['quickcred']
+client = None
+db = None
+users = None
+loans = None
+transactions = None
+idempotency_keys = None
+borrower_scores = None
+accruals = None
 
-# Create collections
-users = db["users"]
-loans = db["loans"]
-transactions = db["transactions"]
 
+def connect_db():
+    """Create the MongoDB client and bind the collections.
 
+    Runs at import, and again in every gunicorn worker after fork when the
+    app is preloaded, because a pymongo client must not cross a fork. The
+    client connects on first use, so this never waits on the network;
+    readiness checks the connection in the background.
+    """
+    global client, db, users, loans, transactions, idempotency_keys, borrower_scores, accruals
 
-def test_mongo_connection():
-    try:
-        # Test the connection
-        client.admin.command('ping')
-        print("✅ MongoDB connection successful!")
+    client = MongoClient(
+        MONGODB_URI,
+        serverSelectionTimeoutMS=app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        connect=False,
+        maxPoolSize=app.config['MONGO_MAX_POOL_SIZE'],
+        event_listeners=[command_tally, pool_wait_listener, slow_query_listener, *mongo_breaker.listeners]
+    )
+    db = client[MONGODB_DB]
 
-        # Test collections access
-        print(f"✅ Database: {db.name}")
-        print(f"✅ Users collection: {users.name}")
-        print(f"✅ Loans collection: {loans.name}")
-        print(f"✅ Transactions collection: {transactions.name}")
+    if app.config['SLOW_QUERY_LOG']:
+        slow_query_listener.configure(
+            db,
+            threshold_ms=app.config['SLOW_QUERY_MS'],
+            explain_interval=app.config['SLOW_QUERY_EXPLAIN_INTERVAL'],
+            capped_bytes=app.config['SLOW_QUERY_LOG_BYTES']
+        )
 
-    except Exception as e:
-        print(f"❌ MongoDB connection failed: {e}")
-        print("Please check your MONGODB_URI in app.py")
-        print("Make sure to replace 'username', 'password', and 'cluster' with your actual MongoDB Atlas credentials")
+    # Create collections
+    users = db["users"]
+    loans = db["loans"]
+    transactions = db["transactions"]
+    idempotency_keys = db["idempotency_keys"]
+    borrower_scores = db["borrower_scores"]
+    accruals = db["loan_accruals"]
+
+    readiness.configure(
+        db,
+        interval=app.config['READINESS_INTERVAL'],
+        timeout=app.config['READINESS_TIMEOUT']
+    )
+
+    if app.config['OUTBOX_ENABLED']:
+        outbox_dispatcher.configure(
+            Outbox(db[OUTBOX_COLLECTION]),
+            build_sinks(app.config['OUTBOX_SINKS'], app.config),
+            batch_size=app.config['OUTBOX_BATCH_SIZE'],
+            poll_ms=app.config['OUTBOX_POLL_MS'],
+            lease_seconds=app.config['OUTBOX_LEASE_SECONDS'],
+            max_attempts=app.config['OUTBOX_MAX_ATTEMPTS']
+        )
+
+    if app.config['USER_CACHE']:
+        user_cache.configure(build_user_cache_backend(app.config), ttl=app.config['USER_CACHE_TTL'])
+
+    if app.config['BACKGROUND_TASKS']:
+        task_executor.configure(
+            threads=app.config['TASK_THREADS'],
+            processes=app.config['TASK_PROCESSES'],
+            max_queue=app.config['TASK_QUEUE_SIZE'],
+            store=TaskStore(db[TASK_COLLECTION]) if app.config['TASK_DURABLE'] else None,
+            lease_seconds=app.config['TASK_LEASE_SECONDS'],
+            max_attempts=app.config['TASK_MAX_ATTEMPTS']
+        )
+
+
+connect_db()
 
 
-try:
-    test_mongo_connection()
-except Exception:
-    pass
 
+init_instrumentation(app)
+init_metrics(app)
+init_readiness(app)
+init_circuit_breaker(app)
+init_load_shedding(app)
 
 
 @app.errorhandler(ServerSelectionTimeoutError)
@@ -59,7 +159,10 @@ def handle_mongo_timeout(error):
 from controllers.auth_controller import auth_bp
 from controllers.loan_controller import loan_bp
 from controllers.transaction_controller import transaction_bp
-from controllers.dashboard_controller import dashboard_bp
+if app.config['ASYNC_VIEWS']:
+    from controllers.async_dashboard_controller import async_dashboard_bp as dashboard_bp
+else:
+    from controllers.dashboard_controller import dashboard_bp
 
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(loan_bp, url_prefix='/loan')
@@ -67,30 +170,96 @@ app.register_blueprint(transaction_bp, url_prefix='/transactions')
 app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
 
 
+from controllers.dashboard_controller import cached_dashboard_data, load_dashboard_data, load_landing_stats
+
+
+def render_platform_stats():
+    """The landing page stats block, or None when the stats can't be loaded"""
+    # After a failure, skip the database for a few seconds rather than make
+    # every visitor wait for the server selection timeout
+    if fragment_cache.get('platform_stats_failed'):
+        return None
+    try:
+        stats = load_landing_stats()
+    except Exception as e:
+        print(f"⚠️  Platform stats unavailable: {e}")
+        fragment_cache.set('platform_stats_failed', True, ttl=5)
+        return None
+    return Markup(render_template('partials/platform_stats.html', stats=stats).strip())
+
+
+def render_landing():
+    """Return the landing page HTML and whether it is complete enough to cache"""
+    stats_html = fragment_cache.get_or_set('platform_stats', render_platform_stats)
+    complete = stats_html is not None
+    if not complete:
+        stats_html = Markup(render_template('partials/platform_stats.html', stats=None).strip())
+    return render_template('index.html', platform_stats_html=stats_html), complete
+
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    if 'user_id' in session:
+        return render_landing()[0]
+
+    # Every anonymous visitor gets the same page, so it is rendered once per TTL
+    rendered = {}
+
+    def render():
+        html, complete = render_landing()
+        rendered['html'] = html
+        return html if complete else None
+
+    html = page_cache.get_or_set('index', render) or rendered['html']
+    response = make_response(html)
+    response.headers['X-Page-Cache'] = 'miss' if rendered else 'hit'
+    response.vary.add('Cookie')
+    return response
 
 
 from decorators import login_required
+from models.user import User
+
+
+def render_dashboard(view=None):
+    """Render dashboard.html with the initial data for `view` embedded.
+
+    The user is fetched once and the payload comes from the same code as
+    the /dashboard/*-data API. If loading fails the page is rendered
+    without it and fetches the data itself, showing its usual error banner.
+    """
+    bootstrap = None
+    if app.config['DASHBOARD_BOOTSTRAP']:
+        try:
+            user = User(users).get_user_by_id(session['user_id'])
+            if not user:
+                session.clear()
+                return redirect('/')
+            view = view or ('lender' if user['role'] == 'lender' else 'borrower')
+            bootstrap = cached_dashboard_data(user['_id'], view, lambda: load_dashboard_data(user, view))
+            bootstrap['view'] = view
+        except Exception as e:
+            print(f"⚠️  Dashboard bootstrap failed: {e}")
+            bootstrap = None
+    return render_template('dashboard.html', bootstrap=bootstrap)
+
 
 @app.route('/dashboard')
 @login_required
 def dashboard():
-
-    return render_template('dashboard.html')
+    return render_dashboard()
 
 
 @app.route('/borrower')
 @login_required
 def borrower_dashboard():
-    return render_template('borrower.html')
+    return render_dashboard('borrower')
 
 
 @app.route('/lender')
 @login_required
 def lender_dashboard():
-    return render_template('lender.html')
+    return render_dashboard('lender')
 
 
 @app.route('/logout')
@@ -100,4 +269,8 @@ def logout():
 
 
 if __name__ == '__main__':
+    readiness.start()
+    if app.config['OUTBOX_DISPATCH_IN_APP']:
+        outbox_dispatcher.start()
+    task_executor.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+QuickCred Loan Archival
+Moves loans repaid more than ARCHIVE_AFTER_DAYS ago, and their
+transactions, out of the hot collections into loans_archive and
+transactions_archive, or into gzip NDJSON segments under
+ARCHIVE_SEGMENT_DIR. History views and counters keep including them while
+ARCHIVE_ENABLED=true. Safe to interrupt and rerun:
+    python archive_loans.py [--days 365] [--batch-size 500]
+"""
+
+import argparse
+import sys
+import os
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from models.archive import ArchiveStore, archive_repaid_loans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive old repaid loans and their transactions')
+    parser.add_argument('--days', type=int, default=Config.ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch-size', type=int, default=Config.ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if not Config.ARCHIVE_ENABLED:
+        print("❌ Set ARCHIVE_ENABLED=true first, or archived loans would disappear from history views")
+        sys.exit(1)
+
+    from app import db, loans, transactions
+
+    print("🚀 QuickCred Loan Archival")
+    print("=" * 40)
+    store = ArchiveStore(db, Config.ARCHIVE_SEGMENT_DIR or None)
+    store.ensure_indexes()
+    started = time.perf_counter()
+    moved_loans, moved_transactions = archive_repaid_loans(loans, transactions, store, args.days, args.batch_size)
+    target = Config.ARCHIVE_SEGMENT_DIR or 'archive collections'
+    print(f"✅ Archived {moved_loans} loans and {moved_transactions} transactions to {target} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+ASGI entry point for QuickCred
+
+    ASYNC_VIEWS=true uvicorn asgi:asgi_app --workers 4
+
+The Flask app stays a WSGI app; asgiref runs it on a thread per request
+while the async dashboard views fan their MongoDB queries out concurrently.
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app, init_templates
+
+init_templates()
+asgi_app = WsgiToAsgi(app)
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+QuickCred Endpoint Benchmark
+Seeds a local MongoDB at several data sizes and drives every blueprint route,
+through the Flask test client and through a real gunicorn process.
+
+Usage:
+    python benchmark.py                          # small dataset, test client
+    python benchmark.py --size small medium --mode both
+    python benchmark.py --save-baseline          # record benchmark_baseline.json
+    python benchmark.py --tolerance 0.2          # fail if p95 regresses > 20%
+    python benchmark.py --compare-async          # sync vs ASYNC_VIEWS dashboards
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+import bcrypt
+from bson import ObjectId
+from pymongo import MongoClient
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from models.borrower_score import BorrowerScore
+from models.indexes import ensure_indexes
+
+DEFAULT_URI = 'mongodb://localhost:27017'
+DEFAULT_DB = 'quickcred_bench'
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+PASSWORD = 'password123'
+
+# users, loans, transactions
+SIZES = {
+    'small': (200, 1000, 4000),
+    'medium': (2000, 10000, 50000),
+    'large': (10000, 50000, 250000),
+}
+
+BORROWER_EMAIL = 'bench-borrower@example.com'
+LENDER_EMAIL = 'bench-lender@example.com'
+
+
+# ---------------------------------------------------------------------------
+# Dataset
+# ---------------------------------------------------------------------------
+
+def seed_database(db, size, reserve):
+    """Drop and seed the benchmark database.
+
+    `reserve` is the number of pending and funded loans set aside for the
+    fund and repay scenarios, so every POST in a run has fresh work to do.
+    """
+    n_users, n_loans, n_transactions = SIZES[size]
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    password = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt())
+
+    for name in ('users', 'loans', 'transactions', 'borrower_scores'):
+        db[name].drop()
+
+    users = []
+    for i in range(n_users):
+        role = 'lender' if i % 4 == 0 else 'borrower'
+        users.append({
+            '_id': ObjectId(),
+            'name': f'User {i}',
+            'email': f'user{i}@example.com',
+            'password': password,
+            'role': role,
+            'wallet_balance': float(rng.randint(0, 100000)),
+            'created_at': now - timedelta(days=rng.randint(0, 700)),
+            'updated_at': now,
+        })
+    borrower = {'_id': ObjectId(), 'name': 'Bench Borrower', 'email': BORROWER_EMAIL,
+                'password': password, 'role': 'borrower', 'wallet_balance': 1e9,
+                'created_at': now, 'updated_at': now}
+    lender = {'_id': ObjectId(), 'name': 'Bench Lender', 'email': LENDER_EMAIL,
+              'password': password, 'role': 'lender', 'wallet_balance': 1e9,
+              'created_at': now, 'updated_at': now}
+    users.extend([borrower, lender])
+    db.users.insert_many(users)
+
+    borrower_ids = [u['_id'] for u in users if u['role'] == 'borrower']
+    lender_ids = [u['_id'] for u in users if u['role'] == 'lender']
+
+    def make_loan(borrower_id, status, lender_id=None):
+        created = now - timedelta(days=rng.randint(0, 700))
+        term = rng.randint(1, 12)
+        funded = status != 'pending'
+        return {
+            '_id': ObjectId(),
+            'borrower_id': borrower_id,
+            'amount': float(rng.randint(500, 50000)),
+            'term_months': term,
+            'purpose': rng.choice(['Education', 'Medical', 'Business', 'Travel', 'Rent']),
+            'status': status,
+            'interest_rate': 0.047,
+            'lender_return_rate': 0.02,
+            'platform_margin_rate': 0.027,
+            'lender_id': lender_id if funded else None,
+            'funded_at': created + timedelta(days=1) if funded else None,
+            'due_date': created + timedelta(days=1 + term * 30) if funded else None,
+            'created_at': created,
+            'updated_at': created,
+        }
+
+    loans = []
+    for _ in range(n_loans):
+        status = rng.choices(['pending', 'funded', 'repaid'], weights=[2, 3, 5])[0]
+        loans.append(make_loan(rng.choice(borrower_ids), status, rng.choice(lender_ids)))
+    pending_reserve = [make_loan(borrower['_id'], 'pending') for _ in range(reserve)]
+    funded_reserve = [make_loan(borrower['_id'], 'funded', lender['_id']) for _ in range(reserve)]
+    db.loans.insert_many(loans + pending_reserve + funded_reserve)
+
+    types = ['wallet_topup', 'loan_funding', 'repayment', 'interest_payment']
+    transactions = []
+    for _ in range(n_transactions):
+        loan = rng.choice(loans)
+        transactions.append({
+            'loan_id': loan['_id'],
+            'user_id': rng.choice([loan['borrower_id'], loan['lender_id'] or loan['borrower_id']]),
+            'amount': loan['amount'],
+            'type': rng.choice(types),
+            'description': 'Seeded transaction',
+            'timestamp': now - timedelta(days=rng.randint(0, 700)),
+            'status': 'completed',
+        })
+    if transactions:
+        db.transactions.insert_many(transactions)
+    ensure_indexes(db)
+    BorrowerScore(db.borrower_scores, db.loans).recompute_all()
+
+    return {
+        'pending': [str(l['_id']) for l in pending_reserve],
+        'funded': [str(l['_id']) for l in funded_reserve],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Drivers
+# ---------------------------------------------------------------------------
+
+class ClientDriver:
+    """Drives the app in-process through the Flask test client"""
+
+    name = 'client'
+
+    def __init__(self, app):
+        self.clients = {role: app.test_client() for role in ('anon', 'borrower', 'lender')}
+
+    def request(self, role, method, path, body=None):
+        response = self.clients[role].open(path, method=method, json=body)
+        return response.status_code
+
+
+class HttpDriver:
+    """Drives a running server over HTTP, keeping one cookie jar per role"""
+
+    name = 'gunicorn'
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.openers = {
+            role: urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+            for role in ('anon', 'borrower', 'lender')
+        }
+        self.last_headers = {}
+
+    def request(self, role, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with self.openers[role].open(req, timeout=30) as response:
+                response.read()
+                self.last_headers = response.headers
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            self.last_headers = e.headers
+            return e.code
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+def login_body(role):
+    return {'email': BORROWER_EMAIL if role == 'borrower' else LENDER_EMAIL, 'password': PASSWORD}
+
+
+def first_paint_paths(role):
+    """Requests the dashboard needs before it can paint.
+
+    With the bootstrap payload the page itself carries the data; without it
+    the browser fetches the profile and then the role's data afterwards.
+    """
+    def paths(ids):
+        if Config.DASHBOARD_BOOTSTRAP:
+            return [f'/{role}']
+        return [f'/{role}', '/auth/profile', f'/dashboard/{role}-data']
+    return paths
+
+
+# name, role, method, path (str, list of sequential paths, or callable
+# taking the reserved ids), body
+SCENARIOS = [
+    ('auth.login', 'borrower', 'POST', '/auth/login', lambda ids: login_body('borrower')),
+    ('auth.profile', 'borrower', 'GET', '/auth/profile', None),
+    ('loan.pending', 'lender', 'GET', '/loan/pending', None),
+    ('loan.pending.search', 'lender', 'GET',
+     '/loan/pending?min_amount=1000&max_amount=20000&max_term=6&sort=smallest', None),
+    ('loan.pending.text', 'lender', 'GET', '/loan/pending?q=medical&sort=newest', None),
+    ('loan.pending.score', 'lender', 'GET', '/loan/pending?sort=score', None),
+    ('loan.my_loans', 'borrower', 'GET', '/loan/my-loans', None),
+    ('dashboard.borrower_data', 'borrower', 'GET', '/dashboard/borrower-data', None),
+    ('dashboard.lender_data', 'lender', 'GET', '/dashboard/lender-data', None),
+    ('dashboard.platform_stats', 'anon', 'GET', '/dashboard/platform-stats', None),
+    ('first_paint.borrower', 'borrower', 'GET', first_paint_paths('borrower'), None),
+    ('first_paint.lender', 'lender', 'GET', first_paint_paths('lender'), None),
+    ('transactions.history', 'borrower', 'GET', '/transactions/history', None),
+    ('transactions.analytics', 'lender', 'GET', '/transactions/analytics', None),
+    ('transactions.platform_analytics', 'lender', 'GET', '/transactions/platform-analytics', None),
+    ('loan.create', 'borrower', 'POST', '/loan/create',
+     lambda ids: {'amount': 1000, 'term_months': 3, 'purpose': 'Benchmark'}),
+    ('loan.fund', 'lender', 'POST', lambda ids: f"/loan/fund/{ids['pending'].pop()}", None),
+    ('loan.repay', 'borrower', 'POST', lambda ids: f"/loan/repay/{ids['funded'].pop()}", None),
+    ('transactions.topup', 'borrower', 'POST', '/transactions/topup', lambda ids: {'amount': 100}),
+    ('transactions.update_wallet', 'lender', 'POST', '/transactions/update-wallet',
+     lambda ids: {'operation': 'add', 'amount': 100}),
+]
+
+
+class CommandCounter:
+    """Counts server-side operations through serverStatus opcounters.
+
+    Works the same whether the app runs in-process or in gunicorn workers.
+    The cost of the serverStatus calls themselves is calibrated away.
+    """
+
+    def __init__(self, client):
+        self.admin = client.admin
+        first = self.snapshot()
+        self.overhead = self.snapshot() - first
+
+    def snapshot(self):
+        return sum(self.admin.command('serverStatus')['opcounters'].values())
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_scenarios(driver, ids, counter, requests, warmup, only=None):
+    """Run every scenario (or those whose name starts with `only`) and return {name: stats}"""
+    driver.request('borrower', 'POST', '/auth/login', login_body('borrower'))
+    driver.request('lender', 'POST', '/auth/login', login_body('lender'))
+
+    results = {}
+    for name, role, method, path, body in SCENARIOS:
+        if only and not name.startswith(only):
+            continue
+        def call():
+            target = path(ids) if callable(path) else path
+            payload = body(ids) if callable(body) else body
+            if isinstance(target, list):
+                # A page load made of sequential round trips; report the worst status
+                return max(driver.request(role, method, t, payload) for t in target)
+            return driver.request(role, method, target, payload)
+
+        for _ in range(warmup):
+            call()
+
+        latencies = []
+        errors = 0
+        before = counter.snapshot()
+        started = time.perf_counter()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            status = call()
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        commands = counter.snapshot() - before - counter.overhead
+
+        results[name] = {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'rps': round(requests / elapsed, 1),
+            'commands': round(max(commands, 0) / requests, 2),
+            'errors': errors,
+        }
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Modes
+# ---------------------------------------------------------------------------
+
+def run_client_mode(uri, db_name, ids, counter, args):
+    os.environ['MONGODB_URI'] = uri
+    os.environ['MONGODB_DB'] = db_name
+    from app import app
+    return run_scenarios(ClientDriver(app), ids, counter, args.requests, args.warmup, args.only)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(uri, db_name, workers, extra_args=()):
+    """Start gunicorn on a free port and wait until it accepts connections"""
+    port = free_port()
+    env = dict(os.environ, MONGODB_URI=uri, MONGODB_DB=db_name)
+    command = [sys.executable, '-m', 'gunicorn', '-w', str(workers),
+               '-b', f'127.0.0.1:{port}', *extra_args, 'app:app']
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30s')
+
+
+def run_gunicorn_mode(uri, db_name, ids, counter, args):
+    process, base_url = start_gunicorn(uri, db_name, args.workers)
+    try:
+        return run_scenarios(HttpDriver(base_url), ids, counter, args.requests, args.warmup, args.only)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if current['p95'] > previous['p95'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {previous['p95']}ms -> {current['p95']}ms")
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {previous['rps']} -> {current['rps']} req/s")
+        if current['commands'] > previous['commands'] + 0.5:
+            regressions.append(f"{key}: mongo commands/request {previous['commands']} -> {current['commands']}")
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append(f"{key}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def print_results(key, stats):
+    print(f"  {key:<58} p50 {stats['p50']:>8.2f}ms  p95 {stats['p95']:>8.2f}ms  "
+          f"p99 {stats['p99']:>8.2f}ms  {stats['rps']:>8.1f} req/s  "
+          f"{stats['commands']:>6.2f} cmds  {stats['errors']} err")
+
+
+def compare_variants(args, variable, labels, only):
+    """Run the same routes with an environment flag off and on, printed side by side"""
+    results = {}
+    for label, flag in zip(labels, ('false', 'true')):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            out = f.name
+        command = [sys.executable, os.path.abspath(__file__), '--uri', args.uri, '--db', args.db,
+                   '--size', *args.size, '--mode', args.mode, '--requests', str(args.requests),
+                   '--warmup', str(args.warmup), '--workers', str(args.workers),
+                   '--only', args.only or only, '--json-out', out]
+        print(f"\n▶️  {label}")
+        subprocess.run(command, env=dict(os.environ, **{variable: flag}), check=True)
+        with open(out) as f:
+            results[label] = json.load(f)
+        os.remove(out)
+
+    before, after = labels
+    print(f"\n📊 {before} vs {after}")
+    for key, old in results[before].items():
+        new = results[after].get(key)
+        if not new:
+            continue
+        speedup = old['p50'] / new['p50'] if new['p50'] else 0
+        print(f"  {key:<50} p50 {old['p50']:>8.2f} -> {new['p50']:>8.2f}ms  "
+              f"p95 {old['p95']:>8.2f} -> {new['p95']:>8.2f}ms  ({speedup:.2f}x)")
+
+
+def compare_async(args):
+    """Run the dashboard routes with sync and async views"""
+    compare_variants(args, 'ASYNC_VIEWS', ('sync views', 'async views'), 'dashboard.')
+
+
+def compare_first_paint(args):
+    """Time-to-first-paint of the dashboards with and without the bootstrap payload"""
+    compare_variants(args, 'DASHBOARD_BOOTSTRAP', ('fetch after load', 'bootstrap payload'), 'first_paint.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark QuickCred endpoints against a local MongoDB')
+    parser.add_argument('--uri', default=os.getenv('BENCH_MONGODB_URI', DEFAULT_URI))
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--size', nargs='+', choices=sorted(SIZES), default=['small'])
+    parser.add_argument('--mode', choices=['client', 'gunicorn', 'both'], default='client')
+    parser.add_argument('--requests', type=int, default=50, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per route')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--only', help='only run routes whose name starts with this prefix')
+    parser.add_argument('--json-out', help='write results to this file instead of comparing to the baseline')
+    parser.add_argument('--compare-async', action='store_true', help='compare sync and async dashboard views')
+    parser.add_argument('--compare-first-paint', action='store_true',
+                        help='compare dashboard time-to-first-paint with and without the bootstrap payload')
+    args = parser.parse_args()
+
+    if args.compare_async:
+        compare_async(args)
+        return
+    if args.compare_first_paint:
+        compare_first_paint(args)
+        return
+
+    print("🚀 QuickCred Endpoint Benchmark")
+    print("=" * 40)
+
+    mongo = MongoClient(args.uri, serverSelectionTimeoutMS=5000)
+    try:
+        mongo.admin.command('ping')
+    except Exception as e:
+        print(f"❌ Cannot reach MongoDB at {args.uri}: {e}")
+        sys.exit(2)
+    counter = CommandCounter(mongo)
+
+    modes = ['client', 'gunicorn'] if args.mode == 'both' else [args.mode]
+    runners = {'client': run_client_mode, 'gunicorn': run_gunicorn_mode}
+    reserve = args.requests + args.warmup
+
+    results = {}
+    for size in args.size:
+        for mode in modes:
+            print(f"\n🌱 Seeding '{size}' dataset for {mode} run...")
+            ids = seed_database(mongo[args.db], size, reserve)
+            print(f"📊 Running routes x {args.requests} requests ({mode})")
+            for name, stats in runners[mode](args.uri, args.db, ids, counter, args).items():
+                key = f'{mode}/{size}/{name}'
+                results[key] = stats
+                print_results(key, stats)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        return
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️  No baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against baseline:")
+        for message in regressions:
+            print(f"  - {message}")
+        sys.exit(1)
+    print("\n✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+QuickCred Record Decode Benchmark
+Measures decode time and peak memory for building the lender dashboard's
+available-loans list from a page of pending loans, the old way (full
+dicts, mutated and copied for JSON) against LoanRecords decoded from raw
+BSON with the record projection. The page is encoded locally as the server
+would send it, so no MongoDB is needed:
+    python benchmark_records.py [--loans 50000] [--rounds 3]
+"""
+
+import argparse
+import gc
+import sys
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import bson
+from bson import ObjectId
+
+from models.records import LOAN_RECORD_PROJECTION, RAW_CODEC_OPTIONS, LoanRecord
+
+
+def make_loans(count):
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'borrower_id': ObjectId(),
+        'amount': 500.0 + (i % 100) * 250,
+        'term_months': 1 + i % 12,
+        'purpose': f'Working capital for shop number {i}',
+        'status': 'pending',
+        'interest_rate': 0.047,
+        'lender_return_rate': 0.02,
+        'platform_margin_rate': 0.027,
+        'borrower_score': 50.0 + i % 50,
+        'lender_id': None,
+        'funded_at': None,
+        'due_date': None,
+        'created_at': now - timedelta(minutes=i),
+        'updated_at': now - timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def encode_page(loans, projection=None):
+    """The bytes a find() reply carries for these loans"""
+    if projection:
+        loans = [{key: value for key, value in loan.items() if key == '_id' or key in projection}
+                 for loan in loans]
+    return b''.join(bson.encode(loan) for loan in loans)
+
+
+def convert(data):
+    """What the dashboard used to do to every dict before jsonify"""
+    if isinstance(data, dict):
+        return {key: convert(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [convert(item) for item in data]
+    if isinstance(data, ObjectId):
+        return str(data)
+    if isinstance(data, datetime):
+        return data.isoformat()
+    return data
+
+
+def dict_path(payload):
+    loans = bson.decode_all(payload)
+    for loan in loans:
+        loan['borrower_name'] = 'Unknown'
+        loan['borrower_email'] = 'Unknown'
+        loan['id'] = str(loan['_id'])
+        loan['borrower_id'] = str(loan['borrower_id'])
+        loan['created_at'] = loan['created_at'].isoformat()
+        loan['updated_at'] = loan['updated_at'].isoformat()
+    return convert(loans)
+
+
+def record_path(payload):
+    records = [LoanRecord.from_document(raw) for raw in bson.decode_all(payload, RAW_CODEC_OPTIONS)]
+    available = []
+    for record in records:
+        data = record.to_dict()
+        data['borrower_name'] = 'Unknown'
+        data['borrower_email'] = 'Unknown'
+        available.append(data)
+    return available
+
+
+def measure(name, build, payload, rounds):
+    timings = []
+    for _ in range(rounds):
+        gc.collect()
+        started = time.perf_counter()
+        build(payload)
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    result = build(payload)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{name:<28} {min(timings) * 1000:9.1f} ms  peak {peak / 2**20:8.1f} MiB  "
+          f"result {retained / 2**20:8.1f} MiB")
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare dict and record decoding of a pending-loan page')
+    parser.add_argument('--loans', type=int, default=50000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    print("🚀 QuickCred Record Decode Benchmark")
+    print("=" * 40)
+    loans = make_loans(args.loans)
+    full = encode_page(loans)
+    projected = encode_page(loans, LOAN_RECORD_PROJECTION)
+    del loans
+    print(f"{args.loans} pending loans: {len(full) / 2**20:.1f} MiB full, "
+          f"{len(projected) / 2**20:.1f} MiB projected\n")
+
+    dict_time, dict_peak = measure('dicts (full documents)', dict_path, full, args.rounds)
+    record_time, record_peak = measure('records (raw, projected)', record_path, projected, args.rounds)
+    print(f"\n✅ Records: {dict_time / record_time:.1f}x faster, "
+          f"{dict_peak / record_peak:.1f}x lower peak memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+In-process caches
+A small thread-safe TTL cache used for rendered page fragments and pages.
+Each gunicorn worker keeps its own copy, so entries are bounded by the
+TTL rather than invalidated on writes.
+
+user_cache holds per-user query results (dashboards, loan lists, history).
+Entries are keyed by user, query shape and the generation of every scope
+the query reads; the model write paths bump the generations they change,
+so a write makes exactly the affected entries unreachable. Entries live in
+a byte-bounded LRU in each worker, or in Redis to share them (and the
+generations) across workers.
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # only needed for USER_CACHE_BACKEND=redis
+    redis = None
+
+from metrics import USER_CACHE_BYTES, USER_CACHE_EVICTIONS, USER_CACHE_REQUESTS
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire `ttl` seconds after being set"""
+
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key):
+        """Return the cached value, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[key] = (value, expires)
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value, computing it with factory() on a miss.
+
+        Concurrent misses for the same key wait for one computation instead
+        of all running it (a burst of traffic on an expired entry). If
+        factory returns None nothing is cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have filled it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > time.monotonic():
+                    return entry[0]
+            try:
+                value = factory()
+                if value is not None:
+                    self.set(key, value, ttl)
+                return value
+            finally:
+                # Threads already waiting have this lock; drop it so the map
+                # doesn't grow with every key ever requested
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        """Drop expired entries, or the one closest to expiry if none are; lock held"""
+        now = time.monotonic()
+        expired = [key for key, (_, expires) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        if not expired:
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][1])]
+
+
+class LRUCache:
+    """Thread-safe LRU whose entries expire after `ttl` seconds and whose
+    total size is bounded by `max_bytes`.
+
+    Values are stored pickled: the bound counts what is actually held, and
+    every get() returns a fresh copy the caller may change.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a copy of the cached value, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            data = entry[0]
+        return pickle.loads(data)
+
+    def set(self, key, value, ttl=None):
+        """Cache a value; one larger than max_bytes on its own is not cached"""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (data, expires)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        """Drop an entry if present; lock held"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self.size}
+
+
+class MemoryBackend:
+    """user_cache storage local to one worker"""
+
+    name = 'memory'
+
+    def __init__(self, max_bytes, ttl, max_generations=100000):
+        self.entries = LRUCache(max_bytes, ttl)
+        self.max_generations = max_generations
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generations(self, keys):
+        with self._lock:
+            return [self._generations.get(key, 0) for key in keys]
+
+    def bump(self, keys):
+        with self._lock:
+            if len(self._generations) >= self.max_generations:
+                # Forgetting generations would make old entries current again
+                self._generations.clear()
+                self.entries.clear()
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl):
+        evictions = self.entries.evictions
+        self.entries.set(key, value, ttl)
+        USER_CACHE_EVICTIONS.inc(self.entries.evictions - evictions)
+        USER_CACHE_BYTES.set(self.entries.size)
+
+    def stats(self):
+        return dict(self.entries.stats(), generations=len(self._generations))
+
+
+class RedisBackend:
+    """user_cache storage shared by every worker; size it with Redis maxmemory"""
+
+    name = 'redis'
+
+    def __init__(self, url, ttl, prefix='quickcred:cache:'):
+        if redis is None:
+            raise RuntimeError('USER_CACHE_BACKEND=redis needs the redis package (pip install redis)')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        # Generations outlive every entry that was keyed with them
+        self.generation_ttl = max(int(ttl * 100), 3600)
+
+    def generations(self, keys):
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, keys):
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(self.prefix + key)
+            pipeline.expire(self.prefix + key, self.generation_ttl)
+        pipeline.execute()
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), px=int(ttl * 1000))
+
+    def stats(self):
+        info = self.client.info('memory')
+        return {'bytes': info.get('used_memory'), 'evictions': self.client.info('stats').get('evicted_keys')}
+
+
+# Scopes shared by every user; any other scope is per user
+GLOBAL_SCOPES = ('marketplace', 'accruals')
+
+
+class UserCache:
+    """Per-user query results; until configured every lookup runs the query"""
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 5.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def configure(self, backend, ttl=5.0):
+        self.backend = backend
+        self.ttl = ttl
+
+    def _generation_key(self, scope, user_id):
+        return f"gen:{scope}:*" if scope in GLOBAL_SCOPES else f"gen:{scope}:{user_id}"
+
+    def lookup(self, user_id, shape, scopes):
+        """Return (key, value) for a query; value is None on a miss and key
+        is what store() takes, or None when the cache is off or unavailable"""
+        if not self.enabled:
+            return None, None
+        user_id = str(user_id)
+        try:
+            generations = self.backend.generations([self._generation_key(scope, user_id) for scope in scopes])
+            key = f"{shape}:{user_id}:{'.'.join(str(generation) for generation in generations)}"
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️  User cache unavailable: {e}")
+            return None, None
+        if value is None:
+            self.misses += 1
+            USER_CACHE_REQUESTS.labels(shape=shape, outcome='miss').inc()
+        else:
+            self.hits += 1
+            USER_CACHE_REQUESTS.labels(shape=shape, outcome='hit').inc()
+        return key, value
+
+    def store(self, key, value):
+        """Cache a value under a key from lookup().
+
+        The key carries the generations read before the query ran, so a
+        write that landed meanwhile leaves this entry unreachable.
+        """
+        if key is None or value is None:
+            return
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            print(f"⚠️  User cache unavailable: {e}")
+
+    def get_or_set(self, user_id, shape, scopes, factory):
+        """Cached result of factory() for this user and query shape; None is not cached"""
+        key, value = self.lookup(user_id, shape, scopes)
+        if value is None:
+            value = factory()
+            self.store(key, value)
+        return value
+
+    def invalidate(self, scope, *user_ids):
+        """Make cached queries reading `scope` of these users (or of everyone, for a global scope) stale"""
+        if not self.enabled:
+            return
+        if scope in GLOBAL_SCOPES:
+            keys = [self._generation_key(scope, None)]
+        else:
+            keys = [self._generation_key(scope, str(user_id)) for user_id in set(user_ids) if user_id is not None]
+        if not keys:
+            return
+        try:
+            self.backend.bump(keys)
+        except Exception as e:
+            # Entries still expire after the TTL
+            print(f"⚠️  User cache invalidation failed: {e}")
+
+    def stats(self):
+        """Hit and miss counts of this worker, with the backend's size and evictions"""
+        stats = {'enabled': self.enabled, 'hits': self.hits, 'misses': self.misses}
+        if self.enabled:
+            stats['backend'] = self.backend.name
+            try:
+                backend = self.backend.stats()
+            except Exception as e:
+                backend = {'error': str(e)}
+            stats.update({key: value for key, value in backend.items() if key not in ('hits', 'misses')})
+        return stats
+
+
+user_cache = UserCache()
+
+
+def build_user_cache_backend(config):
+    """The backend named by USER_CACHE_BACKEND"""
+    if config['USER_CACHE_BACKEND'] == 'redis':
+        return RedisBackend(config['USER_CACHE_REDIS_URL'], config['USER_CACHE_TTL'])
+    if config['USER_CACHE_BACKEND'] != 'memory':
+        raise ValueError(f"Unknown USER_CACHE_BACKEND {config['USER_CACHE_BACKEND']!r}; expected memory or redis")
+    return MemoryBackend(config['USER_CACHE_MAX_BYTES'], config['USER_CACHE_TTL'])
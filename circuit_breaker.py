@@ -0,0 +1,288 @@
+"""
+MongoDB circuit breaker
+When the cluster is unreachable every request waits serverSelectionTimeoutMS
+before failing, so an outage ties up every worker for seconds per request.
+With MONGO_BREAKER=true the breaker watches the shared client's events and
+opens after MONGO_BREAKER_FAILURES consecutive timeouts: commands that time
+out or lose their connection, and failed heartbeats while no server is
+writable. A command that succeeds resets the count.
+
+While open, writes and most reads fail at once with a 503 and Retry-After.
+The read endpoints in DEGRADED_READS get their last good response instead,
+flagged "stale": true and with a Warning header. After
+MONGO_BREAKER_RESET_SECONDS the breaker turns half-open and lets one
+request through as a probe: the first command that succeeds closes it, a
+timeout opens it again.
+"""
+
+import json
+import threading
+import time
+
+from flask import g, jsonify, request, session
+from pymongo import monitoring
+
+from cache import LRUCache
+from load_shedding import EXEMPT_ENDPOINTS
+from metrics import MONGO_BREAKER_REQUESTS, MONGO_BREAKER_STATE, MONGO_BREAKER_TRIPS
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Failures a command event reports for a timeout or a lost connection
+TIMEOUT_ERRTYPES = {'AutoReconnect', 'ConnectionFailure', 'NetworkTimeout', 'ExecutionTimeout', 'WTimeoutError'}
+TIMEOUT_CODES = {50, 64, 262}  # MaxTimeMSExpired, WriteConcernFailed, ExceededTimeLimit
+
+# Read endpoints served from their last good response while the breaker is
+# open; True where the response belongs to the logged-in user
+DEGRADED_READS = {
+    'dashboard.get_platform_stats': False,
+    'loan.get_pending_loans': False,
+    'auth.get_profile': True,
+}
+
+
+def is_timeout(failure):
+    """True when a CommandFailedEvent failure document is a timeout or network error"""
+    return failure.get('errtype') in TIMEOUT_ERRTYPES or failure.get('code') in TIMEOUT_CODES
+
+
+class CircuitBreaker:
+    """Consecutive-timeout breaker for the shared MongoClient; always closed until configured"""
+
+    def __init__(self):
+        self.failure_threshold = 3
+        self.reset_seconds = 10.0
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.writable = True
+        self._configured = False
+        self._lock = threading.Lock()
+        self.listeners = [_CommandListener(self), _HeartbeatListener(self), _TopologyListener(self)]
+
+    @property
+    def enabled(self):
+        return self._configured
+
+    def configure(self, failure_threshold=3, reset_seconds=10.0):
+        """Set the trip threshold and how long to stay open; resets the breaker"""
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._configured = True
+        with self._lock:
+            self.failures = 0
+            self.probes = 0
+            self._set_state(CLOSED)
+
+    def allow(self):
+        """Whether a request may use MongoDB.
+
+        Returns False while open, True while closed, and 'probe' for the one
+        request let through half-open; pass that to end_probe() when done.
+        """
+        if not self.enabled or self.state == CLOSED:
+            return True
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and self.probes == 0:
+                self.probes = 1
+                return 'probe'
+            return self.state == CLOSED
+
+    def end_probe(self):
+        """A probe request finished; half-open again lets the next one through"""
+        with self._lock:
+            self.probes = 0
+
+    def retry_after(self):
+        """Seconds until the breaker next lets a probe through"""
+        return max(1, int(self.reset_seconds - (time.monotonic() - self.opened_at) + 0.999))
+
+    def record_success(self):
+        if not self.enabled or (self.state == CLOSED and not self.failures):
+            return
+        with self._lock:
+            # Stragglers finishing after the breaker opened don't close it
+            if self.state != OPEN:
+                self.failures = 0
+                self.probes = 0
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trip()
+            elif self.state == CLOSED:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._trip()
+
+    def _trip(self):
+        """Open the breaker; lock held"""
+        self.opened_at = time.monotonic()
+        self.probes = 0
+        if self.state == CLOSED:
+            MONGO_BREAKER_TRIPS.inc()
+            print(f"❌ MongoDB circuit breaker open after {self.failures} consecutive timeouts")
+        self._set_state(OPEN)
+
+    def _set_state(self, state):
+        if state == CLOSED and self.state != CLOSED:
+            print("✅ MongoDB circuit breaker closed")
+        self.state = state
+        MONGO_BREAKER_STATE.set(STATE_VALUES[state])
+
+    def stats(self):
+        return {'state': self.state, 'failures': self.failures, 'writable': self.writable}
+
+
+class _CommandListener(monitoring.CommandListener):
+    def __init__(self, breaker):
+        self.breaker = breaker
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.breaker.record_success()
+
+    def failed(self, event):
+        if is_timeout(event.failure):
+            self.breaker.record_failure()
+        else:
+            # The server answered, so it is reachable
+            self.breaker.record_success()
+
+
+class _HeartbeatListener(monitoring.ServerHeartbeatListener):
+    def __init__(self, breaker):
+        self.breaker = breaker
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        # A secondary going away is not an outage; losing every writable server is
+        if not self.breaker.writable:
+            self.breaker.record_failure()
+
+
+class _TopologyListener(monitoring.TopologyListener):
+    def __init__(self, breaker):
+        self.breaker = breaker
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        self.breaker.writable = event.new_description.has_writable_server()
+
+    def closed(self, event):
+        pass
+
+
+mongo_breaker = CircuitBreaker()
+
+
+class StaleResponses:
+    """Last good response of each degraded read, kept in a byte-bounded LRU"""
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, max_age=3600):
+        self.cache = LRUCache(max_bytes, ttl=max_age)
+
+    @staticmethod
+    def key():
+        """Cache key of the current request, or None when it has no cached form"""
+        per_user = DEGRADED_READS.get(request.endpoint)
+        if per_user is None or request.method != 'GET':
+            return None
+        user_id = session.get('user_id') if per_user else ''
+        if user_id is None:
+            return None
+        return f"{request.endpoint}:{user_id}:{request.query_string.decode()}"
+
+    def remember(self, response):
+        key = self.key()
+        if key is not None and response.status_code == 200 and response.is_json:
+            self.cache.set(key, (response.get_data(), time.time()))
+
+    def serve(self):
+        """The last good response for this request flagged as stale, or None"""
+        key = self.key()
+        entry = self.cache.get(key) if key is not None else None
+        if entry is None:
+            return None
+        body, stored_at = entry
+        data = json.loads(body)
+        age = int(time.time() - stored_at)
+        if isinstance(data, dict):
+            data.update(stale=True, stale_seconds=age)
+        response = jsonify(data)
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        response.headers['Age'] = str(age)
+        return response
+
+
+def unavailable_response():
+    retry_after = mongo_breaker.retry_after()
+    response = jsonify({'error': 'Database unavailable, please retry shortly', 'retry_after': retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_circuit_breaker(app):
+    """Register the request hooks; configured when MONGO_BREAKER is on.
+
+    Pass mongo_breaker.listeners to the MongoClient so it sees the client's
+    events. Register before init_load_shedding, so requests failed fast
+    don't hold a slot.
+    """
+    if not app.config.get('MONGO_BREAKER'):
+        return
+    mongo_breaker.configure(app.config['MONGO_BREAKER_FAILURES'], app.config['MONGO_BREAKER_RESET_SECONDS'])
+    stale = StaleResponses(app.config['MONGO_BREAKER_STALE_BYTES'], app.config['MONGO_BREAKER_STALE_SECONDS'])
+
+    @app.before_request
+    def guard_request():
+        if request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        allowed = mongo_breaker.allow()
+        if allowed == 'probe':
+            g.breaker_probe = True
+        if allowed:
+            return None
+        response = stale.serve()
+        if response is not None:
+            MONGO_BREAKER_REQUESTS.labels('stale').inc()
+            g.breaker_stale = True
+            return response
+        MONGO_BREAKER_REQUESTS.labels('rejected').inc()
+        return unavailable_response()
+
+    @app.after_request
+    def remember_response(response):
+        if g.get('breaker_stale'):
+            return response
+        if response.status_code >= 500 and mongo_breaker.state != CLOSED:
+            # The request failed on the outage that tripped the breaker
+            fallback = stale.serve()
+            if fallback is not None:
+                MONGO_BREAKER_REQUESTS.labels('stale').inc()
+                return fallback
+            return response
+        stale.remember(response)
+        return response
+
+    @app.teardown_request
+    def finish_probe(exc):
+        if g.pop('breaker_probe', False):
+            mongo_breaker.end_probe()
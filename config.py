@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,6 +8,7 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string')
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/quickcred')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
     
     # Loan configuration
     BORROWER_INTEREST_RATE = 0.047  # 4.7% per month
@@ -17,3 +19,115 @@ class Config:
     MIN_LOAN_AMOUNT = 500
     MAX_LOAN_AMOUNT = 50000
     MAX_LOAN_TERM_MONTHS = 12
+
+    # Request instrumentation
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+    REQUEST_LOG = os.getenv('REQUEST_LOG', 'true').lower() == 'true'
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '500'))
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+
+    # Slow query log
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'true').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+    SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', '60'))
+    SLOW_QUERY_LOG_BYTES = int(os.getenv('SLOW_QUERY_LOG_BYTES', str(16 * 1024 * 1024)))
+
+    # Background database readiness check behind /readyz
+    READINESS_INTERVAL = float(os.getenv('READINESS_INTERVAL', '5'))
+    READINESS_TIMEOUT = float(os.getenv('READINESS_TIMEOUT', '2'))
+
+    # Archival of old repaid loans and their transactions (archive_loans.py)
+    ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED', 'false').lower() == 'true'
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '365'))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+    ARCHIVE_SEGMENT_DIR = os.getenv('ARCHIVE_SEGMENT_DIR', '')  # gzip NDJSON segments instead of collections
+
+    # Wallet reconciliation against the transaction ledger (reconcile_wallets.py)
+    RECONCILE_PARTITIONS = int(os.getenv('RECONCILE_PARTITIONS', '64'))
+    RECONCILE_TOLERANCE = float(os.getenv('RECONCILE_TOLERANCE', '0.01'))
+
+    # Daily interest accrual on funded loans (accrue_interest.py)
+    ACCRUAL_CHUNK_SIZE = int(os.getenv('ACCRUAL_CHUNK_SIZE', '1000'))
+
+    # Async dashboard views (concurrent MongoDB fan-out)
+    ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+
+    # Embed the initial dashboard data in the page instead of fetching it after load
+    DASHBOARD_BOOTSTRAP = os.getenv('DASHBOARD_BOOTSTRAP', 'true').lower() == 'true'
+
+    # Template bytecode cache and landing page caching
+    JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'quickcred-jinja'))
+    PLATFORM_STATS_TTL = float(os.getenv('PLATFORM_STATS_TTL', '60'))
+    LANDING_PAGE_TTL = float(os.getenv('LANDING_PAGE_TTL', '30'))
+
+    # Read-preference routing (models/routing.py)
+    ANALYTICS_ON_SECONDARIES = os.getenv('ANALYTICS_ON_SECONDARIES', 'true').lower() == 'true'
+    ANALYTICS_MAX_STALENESS_SECONDS = int(os.getenv('ANALYTICS_MAX_STALENESS_SECONDS', '90'))  # server minimum is 90
+    STRONG_WRITE_TIMEOUT_MS = int(os.getenv('STRONG_WRITE_TIMEOUT_MS', '5000'))
+
+    # Sharded cluster behind mongos (models/sharding.py): marketplace queries
+    # go through the pending_loans index collection
+    MONGO_SHARDED = os.getenv('MONGO_SHARDED', 'false').lower() == 'true'
+
+    # Multi-document transactions for money-moving writes; needs a replica set or mongos
+    MONGO_TRANSACTIONS = os.getenv('MONGO_TRANSACTIONS', 'false').lower() == 'true'
+
+    # Transactional outbox for loan and wallet events (outbox_dispatcher.py)
+    OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', 'false').lower() == 'true'
+    OUTBOX_DISPATCH_IN_APP = os.getenv('OUTBOX_DISPATCH_IN_APP', 'true').lower() == 'true'
+    OUTBOX_SINKS = os.getenv('OUTBOX_SINKS', 'log')  # comma-separated: log, webhook, email
+    OUTBOX_WEBHOOK_URL = os.getenv('OUTBOX_WEBHOOK_URL', 'http://127.0.0.1:8099/events')
+    OUTBOX_EMAIL_PATH = os.getenv('OUTBOX_EMAIL_PATH', 'outbox_emails.log')
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+    OUTBOX_POLL_MS = float(os.getenv('OUTBOX_POLL_MS', '500'))
+    OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '30'))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+    OUTBOX_RETENTION_SECONDS = int(os.getenv('OUTBOX_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+    # Idempotency-Key support on POST endpoints
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+    # A retry takes over a reservation still in progress after this long
+    # (a few request timeouts: its worker died or was killed)
+    IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS',
+                                              str(3 * int(os.getenv('GUNICORN_TIMEOUT', '30')))))
+
+    # Background task executor (tasks.py); off means tasks run inline after the response
+    BACKGROUND_TASKS = os.getenv('BACKGROUND_TASKS', 'false').lower() == 'true'
+    TASK_THREADS = int(os.getenv('TASK_THREADS', '2'))
+    TASK_PROCESSES = int(os.getenv('TASK_PROCESSES', '0'))  # process pool for CPU-bound tasks; 0 for none
+    TASK_QUEUE_SIZE = int(os.getenv('TASK_QUEUE_SIZE', '1000'))
+    TASK_DURABLE = os.getenv('TASK_DURABLE', 'true').lower() == 'true'  # store durable tasks in background_tasks
+    TASK_LEASE_SECONDS = int(os.getenv('TASK_LEASE_SECONDS', '60'))
+    TASK_MAX_ATTEMPTS = int(os.getenv('TASK_MAX_ATTEMPTS', '5'))
+    TASK_DRAIN_SECONDS = float(os.getenv('TASK_DRAIN_SECONDS', '10'))
+
+    # /transactions/platform-analytics is served from cache and refreshed in the
+    # background once older than the TTL; entries past MAX_AGE are recomputed inline
+    PLATFORM_ANALYTICS_TTL = float(os.getenv('PLATFORM_ANALYTICS_TTL', '30'))
+    PLATFORM_ANALYTICS_MAX_AGE = float(os.getenv('PLATFORM_ANALYTICS_MAX_AGE', '300'))
+
+    # Per-user query result cache (cache.py user_cache) for dashboards, loan
+    # lists and history; memory is per worker, redis is shared by all of them
+    USER_CACHE = os.getenv('USER_CACHE', 'false').lower() == 'true'
+    USER_CACHE_BACKEND = os.getenv('USER_CACHE_BACKEND', 'memory')  # memory or redis
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '5'))
+    USER_CACHE_MAX_BYTES = int(os.getenv('USER_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    USER_CACHE_REDIS_URL = os.getenv('USER_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Load shedding (load_shedding.py): admit requests by route class within a
+    # queue-time budget counted from X-Request-Start, else 503 + Retry-After
+    LOAD_SHEDDING = os.getenv('LOAD_SHEDDING', 'false').lower() == 'true'
+    LOAD_SHED_CAPACITY = int(os.getenv('LOAD_SHED_CAPACITY', '0'))  # per worker; 0 for its threads or greenlets
+    LOAD_SHED_BUDGET_MS = int(os.getenv('LOAD_SHED_BUDGET_MS', '2000'))
+    LOAD_SHED_ANALYTICS_BUDGET_MS = int(os.getenv('LOAD_SHED_ANALYTICS_BUDGET_MS', '500'))
+    LOAD_SHED_TARGET_MS = int(os.getenv('LOAD_SHED_TARGET_MS', '1000'))  # slower requests shrink the limit
+    LOAD_SHED_RETRY_AFTER = int(os.getenv('LOAD_SHED_RETRY_AFTER', '2'))
+
+    # MongoDB circuit breaker (circuit_breaker.py): after consecutive timeouts,
+    # fail writes fast and serve the last good response of a few reads
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+    MONGO_BREAKER = os.getenv('MONGO_BREAKER', 'false').lower() == 'true'
+    MONGO_BREAKER_FAILURES = int(os.getenv('MONGO_BREAKER_FAILURES', '3'))
+    MONGO_BREAKER_RESET_SECONDS = float(os.getenv('MONGO_BREAKER_RESET_SECONDS', '10'))
+    MONGO_BREAKER_STALE_SECONDS = float(os.getenv('MONGO_BREAKER_STALE_SECONDS', '3600'))
+    MONGO_BREAKER_STALE_BYTES = int(os.getenv('MONGO_BREAKER_STALE_BYTES', str(8 * 1024 * 1024)))
@@ -0,0 +1,110 @@
+import asyncio
+
+from flask import Blueprint, jsonify, session
+from models.user import User
+from models.loan import Loan
+from models.transaction import Transaction
+from models.async_model import AsyncModel
+from models.routing import routed, ANALYTICS
+from decorators import conditional
+from cache import user_cache
+from controllers.dashboard_controller import (get_collections, get_accrual_model, build_borrower_data,
+                                              build_lender_data, DASHBOARD_SCOPES)
+
+# Same blueprint name as the sync controller so endpoints, metrics labels
+# and templates don't change when ASYNC_VIEWS is switched on
+async_dashboard_bp = Blueprint('dashboard', __name__)
+
+
+@async_dashboard_bp.route('/borrower-data', methods=['GET'])
+@conditional
+async def get_borrower_data():
+    """Borrower dashboard with the user and loan queries issued concurrently"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not logged in'}), 401
+
+        current_user_id = session['user_id']
+        cache_key, data = user_cache.lookup(current_user_id, 'dashboard:borrower', DASHBOARD_SCOPES['borrower'])
+        if data is not None:
+            return jsonify(data), 200
+        users_collection, loans_collection, transactions_collection = get_collections()
+
+        loan_model = Loan(loans_collection)
+        users = AsyncModel(User(users_collection))
+        loans = AsyncModel(loan_model)
+
+        user, user_loans, accruals = await asyncio.gather(
+            users.get_user_by_id(current_user_id),
+            loans.get_loans_by_borrower(current_user_id),
+            AsyncModel(get_accrual_model()).get_by_borrower(current_user_id)
+        )
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        data = build_borrower_data(user, user_loans, accruals)
+        user_cache.store(cache_key, data)
+        return jsonify(data), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@async_dashboard_bp.route('/lender-data', methods=['GET'])
+@conditional
+async def get_lender_data():
+    """Lender dashboard; the slowest query, not the sum of all, sets latency"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not logged in'}), 401
+
+        current_user_id = session['user_id']
+        cache_key, data = user_cache.lookup(current_user_id, 'dashboard:lender', DASHBOARD_SCOPES['lender'])
+        if data is not None:
+            return jsonify(data), 200
+        users_collection, loans_collection, transactions_collection = get_collections()
+
+        loan_model = Loan(loans_collection)
+        users = AsyncModel(User(users_collection))
+        loans = AsyncModel(loan_model)
+
+        user, my_loans, available_loans, accruals = await asyncio.gather(
+            users.get_user_by_id(current_user_id),
+            loans.get_loans_by_lender(current_user_id),
+            loans.get_pending_loan_records(),
+            AsyncModel(get_accrual_model()).get_by_lender(current_user_id)
+        )
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        # All the pending loans' borrowers in one query
+        borrowers = await users.get_user_records_by_ids([loan.borrower_id for loan in available_loans])
+
+        data = build_lender_data(user, my_loans, available_loans, borrowers, accruals)
+        user_cache.store(cache_key, data)
+        return jsonify(data), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@async_dashboard_bp.route('/platform-stats', methods=['GET'])
+async def get_platform_stats():
+    """Platform-wide counts, queried concurrently"""
+    try:
+        users_collection, loans_collection, transactions_collection = get_collections()
+
+        total_users, total_loans, total_transactions = await asyncio.gather(
+            AsyncModel(routed(users_collection, ANALYTICS)).count_documents({}),
+            AsyncModel(Loan(loans_collection)).count_loans(),
+            AsyncModel(Transaction(transactions_collection)).count_transactions()
+        )
+
+        return jsonify({
+            'total_users': total_users,
+            'total_loans': total_loans,
+            'total_transactions': total_transactions
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
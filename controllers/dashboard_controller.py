@@ -2,206 +2,215 @@ from flask import Blueprint, request, jsonify, session
 from models.user import User
 from models.loan import Loan
 from models.transaction import Transaction
-from datetime import datetime, timedelta
-from bson import ObjectId
+from models.accrual import Accrual
+from models.records import LoanRecord
+from models.routing import routed, ANALYTICS
+from decorators import conditional
+from cache import user_cache
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# The user_cache scopes each dashboard payload reads
+DASHBOARD_SCOPES = {
+    'borrower': ('user', 'loans', 'accruals'),
+    'lender': ('user', 'loans', 'marketplace', 'accruals'),
+}
+
 
 def get_collections():
     from app import users, loans, transactions
     return users, loans, transactions
 
 
-def convert_objectids_to_strings(data):
-    """Convert all ObjectId and datetime objects to strings for JSON serialization"""
-    if isinstance(data, dict):
-        return {key: convert_objectids_to_strings(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [convert_objectids_to_strings(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    elif isinstance(data, datetime):
-        return data.isoformat()
-    else:
-        return data
+def get_accrual_model():
+    from app import accruals
+    return Accrual(accruals)
+
+
+def serialize_user(user):
+    """Public fields of a user document"""
+    return {
+        'id': str(user['_id']),
+        'name': user['name'],
+        'email': user['email'],
+        'role': user['role'],
+        'wallet_balance': user['wallet_balance']
+    }
+
+
+def build_borrower_data(user, user_loans, accruals=None):
+    """Shape the borrower dashboard payload from already-fetched documents.
+
+    `accruals` maps loan ids to their stored accrual; funded loans show the
+    interest accrued so far.
+    """
+    loans = [LoanRecord.from_document(loan) for loan in user_loans]
+    accruals = accruals or {}
+
+    # Calculate analytics
+    analytics = {
+        'wallet_balance': user['wallet_balance'],
+        'total_loans_requested': len(loans),
+        'pending_loans': len([l for l in loans if l.status == 'pending']),
+        'funded_loans': len([l for l in loans if l.status == 'funded']),
+        'repaid_loans': len([l for l in loans if l.status == 'repaid']),
+        'total_borrowed': sum([l.amount for l in loans if l.status in ['funded', 'repaid']]),
+        'accrued_interest': 0.0
+    }
+
+    borrowed = []
+    for loan in loans:
+        data = loan.to_dict()
+        accrual = accruals.get(loan.id) if loan.status == 'funded' else None
+        if accrual:
+            data['accrued_interest'] = accrual['accrued_interest']
+            data['accrued_as_of'] = accrual['as_of'].isoformat()
+            analytics['accrued_interest'] += accrual['accrued_interest']
+        borrowed.append(data)
+
+    return {
+        'user': serialize_user(user),
+        'analytics': analytics,
+        'loans': borrowed
+    }
+
+
+def build_lender_data(user, my_loans, available_loans, borrowers, accruals=None):
+    """Shape the lender dashboard payload.
+
+    `available_loans` are LoanRecords and `borrowers` maps each of their
+    borrower ObjectIds to a UserRecord (or None). `accruals` maps loan ids
+    to their stored accrual.
+    """
+    accruals = accruals or {}
+    # Add borrower info to available loans
+    available = []
+    for loan in available_loans:
+        borrower = borrowers.get(loan.borrower_id)
+        data = loan.to_dict()
+        data['borrower_name'] = borrower.name if borrower else 'Unknown'
+        data['borrower_email'] = borrower.email if borrower else 'Unknown'
+        available.append(data)
+
+    my_loans = [LoanRecord.from_document(loan) for loan in my_loans]
+
+    # Calculate analytics
+    analytics = {
+        'wallet_balance': user['wallet_balance'],
+        'total_loans_funded': len([l for l in my_loans if l.status == 'funded']),
+        'total_loans_repaid': len([l for l in my_loans if l.status == 'repaid']),
+        'total_returns': 0,  # Will be calculated from transactions
+        'active_loans': len([l for l in my_loans if l.status == 'funded']),
+        'total_invested': sum([l.amount for l in my_loans if l.status in ['funded', 'repaid']]),
+        'accrued_returns': 0.0
+    }
+
+    # Funded loans also show what the lender earns, and has earned so far
+    invested = []
+    for loan in my_loans:
+        data = loan.to_dict()
+        if loan.status == 'funded':
+            data['lender_return'] = loan.lender_return
+            accrual = accruals.get(loan.id)
+            if accrual:
+                data['accrued_return'] = accrual['accrued_lender_return']
+                data['accrued_as_of'] = accrual['as_of'].isoformat()
+                analytics['accrued_returns'] += accrual['accrued_lender_return']
+        invested.append(data)
+
+    return {
+        'user': serialize_user(user),
+        'analytics': analytics,
+        'my_loans': invested,
+        'available_loans': available
+    }
+
+
+def load_borrower_data(user):
+    """Borrower dashboard payload for an already-fetched user"""
+    users_collection, loans_collection, transactions_collection = get_collections()
+    user_loans = Loan(loans_collection).get_loans_by_borrower(user['_id'])
+    accruals = get_accrual_model().get_by_borrower(user['_id'])
+    return build_borrower_data(user, user_loans, accruals)
+
+
+def load_lender_data(user):
+    """Lender dashboard payload for an already-fetched user"""
+    users_collection, loans_collection, transactions_collection = get_collections()
+    loan_model = Loan(loans_collection)
+
+    # Get user's investments (loans they funded)
+    my_loans = loan_model.get_loans_by_lender(user['_id'])
+
+    # Get available loans to fund, with all their borrowers in one query
+    available_loans = loan_model.get_pending_loan_records()
+    borrowers = User(users_collection).get_user_records_by_ids(loan.borrower_id for loan in available_loans)
+    accruals = get_accrual_model().get_by_lender(user['_id'])
+
+    return build_lender_data(user, my_loans, available_loans, borrowers, accruals)
+
+
+def load_dashboard_data(user, view):
+    """Dashboard payload for `view` ('borrower' or 'lender'), as served by the API"""
+    if view == 'lender':
+        return load_lender_data(user)
+    return load_borrower_data(user)
+
+
+def cached_dashboard_data(user_id, view, load=None):
+    """Dashboard payload for `view` from user_cache; on a miss it comes from
+    load(), by default the user lookup plus load_dashboard_data. None when
+    the user does not exist."""
+    def load_user():
+        users_collection, loans_collection, transactions_collection = get_collections()
+        user = User(users_collection).get_user_by_id(user_id)
+        return load_dashboard_data(user, view) if user else None
+
+    return user_cache.get_or_set(user_id, f'dashboard:{view}', DASHBOARD_SCOPES[view], load or load_user)
+
+
+def load_landing_stats():
+    """Headline numbers for the landing page: users, loans and amount lent"""
+    users_collection, loans_collection, transactions_collection = get_collections()
+    loan_analytics = Loan(loans_collection).get_loan_analytics()
+    return {
+        'total_users': routed(users_collection, ANALYTICS).count_documents({}),
+        'total_loans': sum(item['count'] for item in loan_analytics),
+        'total_amount': sum(item['total_amount'] for item in loan_analytics)
+    }
 
 
 @dashboard_bp.route('/borrower-data', methods=['GET'])
+@conditional
 def get_borrower_data():
     """Get all data needed for borrower dashboard"""
     try:
         if 'user_id' not in session:
             return jsonify({'error': 'Not logged in'}), 401
 
-        current_user_id = session['user_id']
-        users_collection, loans_collection, transactions_collection = get_collections()
-
-        user_model = User(users_collection)
-        loan_model = Loan(loans_collection)
-
-        # Get user info
-        user = user_model.get_user_by_id(current_user_id)
-        if not user:
+        data = cached_dashboard_data(session['user_id'], 'borrower')
+        if data is None:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get user's loans
-        user_loans = loan_model.get_loans_by_borrower(current_user_id)
-
-        # Calculate analytics
-        analytics = {
-            'wallet_balance': user['wallet_balance'],
-            'total_loans_requested': len(user_loans),
-            'pending_loans': len([l for l in user_loans if l['status'] == 'pending']),
-            'funded_loans': len([l for l in user_loans if l['status'] == 'funded']),
-            'repaid_loans': len([l for l in user_loans if l['status'] == 'repaid']),
-            'total_borrowed': sum([l['amount'] for l in user_loans if l['status'] in ['funded', 'repaid']])
-        }
-
-        # Add calculated fields to loans and convert ObjectIds to strings
-        for loan in user_loans:
-            loan['id'] = str(loan['_id'])
-            loan['borrower_id'] = str(loan['borrower_id'])
-            if loan.get('lender_id'):
-                loan['lender_id'] = str(loan['lender_id'])
-
-            # Convert dates to strings
-            if loan.get('created_at'):
-                loan['created_at'] = loan['created_at'].isoformat()
-            if loan.get('updated_at'):
-                loan['updated_at'] = loan['updated_at'].isoformat()
-            if loan.get('funded_at'):
-                loan['funded_at'] = loan['funded_at'].isoformat()
-            if loan.get('due_date'):
-                loan['due_date'] = loan['due_date'].isoformat()
-
-            # Calculate interest for funded loans
-            if loan['status'] == 'funded':
-                interest = loan_model.calculate_interest(
-                    loan['amount'],
-                    loan['interest_rate'],
-                    loan['term_months']
-                )
-                loan['total_interest'] = interest
-                loan['total_amount'] = loan['amount'] + interest
-
-        # Convert all ObjectIds and datetimes to strings
-        response_data = {
-            'user': {
-                'id': str(user['_id']),
-                'name': user['name'],
-                'email': user['email'],
-                'role': user['role'],
-                'wallet_balance': user['wallet_balance']
-            },
-            'analytics': analytics,
-            'loans': convert_objectids_to_strings(user_loans)
-        }
-
-        return jsonify(response_data), 200
+        return jsonify(data), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @dashboard_bp.route('/lender-data', methods=['GET'])
+@conditional
 def get_lender_data():
     """Get all data needed for lender dashboard"""
     try:
         if 'user_id' not in session:
             return jsonify({'error': 'Not logged in'}), 401
 
-        current_user_id = session['user_id']
-        users_collection, loans_collection, transactions_collection = get_collections()
-
-        user_model = User(users_collection)
-        loan_model = Loan(loans_collection)
-
-        # Get user info
-        user = user_model.get_user_by_id(current_user_id)
-        if not user:
+        data = cached_dashboard_data(session['user_id'], 'lender')
+        if data is None:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get user's investments (loans they funded)
-        my_loans = loan_model.get_loans_by_lender(current_user_id)
-
-        # Get available loans to fund
-        available_loans = loan_model.get_pending_loans()
-
-        # Add borrower info to available loans and convert ObjectIds
-        for loan in available_loans:
-            borrower = user_model.get_user_by_id(loan['borrower_id'])
-            loan['borrower_name'] = borrower['name'] if borrower else 'Unknown'
-            loan['borrower_email'] = borrower['email'] if borrower else 'Unknown'
-            loan['id'] = str(loan['_id'])
-            loan['borrower_id'] = str(loan['borrower_id'])
-
-            # Convert dates to strings
-            if loan.get('created_at'):
-                loan['created_at'] = loan['created_at'].isoformat()
-            if loan.get('updated_at'):
-                loan['updated_at'] = loan['updated_at'].isoformat()
-
-        # Calculate analytics
-        analytics = {
-            'wallet_balance': user['wallet_balance'],
-            'total_loans_funded': len([l for l in my_loans if l['status'] == 'funded']),
-            'total_loans_repaid': len([l for l in my_loans if l['status'] == 'repaid']),
-            'total_returns': 0,  # Will be calculated from transactions
-            'active_loans': len([l for l in my_loans if l['status'] == 'funded']),
-            'total_invested': sum([l['amount'] for l in my_loans if l['status'] in ['funded', 'repaid']])
-        }
-
-        # Add calculated fields to my loans and convert ObjectIds
-        for loan in my_loans:
-            loan['id'] = str(loan['_id'])
-            loan['borrower_id'] = str(loan['borrower_id'])
-            if loan.get('lender_id'):
-                loan['lender_id'] = str(loan['lender_id'])
-
-            # Convert dates to strings
-            if loan.get('created_at'):
-                loan['created_at'] = loan['created_at'].isoformat()
-            if loan.get('updated_at'):
-                loan['updated_at'] = loan['updated_at'].isoformat()
-            if loan.get('funded_at'):
-                loan['funded_at'] = loan['funded_at'].isoformat()
-            if loan.get('due_date'):
-                loan['due_date'] = loan['due_date'].isoformat()
-
-            # Calculate returns for funded loans
-            if loan['status'] == 'funded':
-                interest = loan_model.calculate_interest(
-                    loan['amount'],
-                    loan['interest_rate'],
-                    loan['term_months']
-                )
-                loan['total_interest'] = interest
-                loan['total_amount'] = loan['amount'] + interest
-
-                # Calculate lender return
-                lender_return = loan_model.calculate_interest(
-                    loan['amount'],
-                    loan['lender_return_rate'],
-                    loan['term_months']
-                )
-                loan['lender_return'] = lender_return
-
-        # Convert all ObjectIds and datetimes to strings
-        response_data = {
-            'user': {
-                'id': str(user['_id']),
-                'name': user['name'],
-                'email': user['email'],
-                'role': user['role'],
-                'wallet_balance': user['wallet_balance']
-            },
-            'analytics': analytics,
-            'my_loans': convert_objectids_to_strings(my_loans),
-            'available_loans': convert_objectids_to_strings(available_loans)
-        }
-
-        return jsonify(response_data), 200
+        return jsonify(data), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -214,9 +223,9 @@ def get_platform_stats():
         users_collection, loans_collection, transactions_collection = get_collections()
 
         # Get basic counts
-        total_users = users_collection.count_documents({})
-        total_loans = loans_collection.count_documents({})
-        total_transactions = transactions_collection.count_documents({})
+        total_users = routed(users_collection, ANALYTICS).count_documents({})
+        total_loans = Loan(loans_collection).count_loans()
+        total_transactions = Transaction(transactions_collection).count_transactions()
 
         return jsonify({
             'total_users': total_users,
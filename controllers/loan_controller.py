@@ -2,7 +2,14 @@ from flask import Blueprint, request, jsonify, session
 from models.loan import Loan
 from models.user import User
 from models.transaction import Transaction
+from models.borrower_score import BorrowerScore
+from models.records import LoanRecord
+from models.routing import in_transaction
 from datetime import datetime
+from metrics import LOANS_CREATED, LOANS_FUNDED, LOANS_REPAID
+from decorators import idempotent, conditional
+from cache import user_cache
+from tasks import task, task_executor
 
 loan_bp = Blueprint('loan', __name__)
 
@@ -12,7 +19,28 @@ def get_collections():
     return users, loans, transactions
 
 
+def get_client():
+    from app import client
+    return client
+
+
+def get_score_model():
+    from app import borrower_scores, loans
+    return BorrowerScore(borrower_scores, loans)
+
+
+@task('scores.record_funding', durable=True)
+def record_funding_score(borrower_id, amount, loan_id=None):
+    get_score_model().record_funding(borrower_id, amount, loan_id)
+
+
+@task('scores.record_repayment', durable=True)
+def record_repayment_score(borrower_id, amount, on_time, loan_id=None):
+    get_score_model().record_repayment(borrower_id, amount, on_time, loan_id)
+
+
 @loan_bp.route('/create', methods=['POST'])
+@idempotent
 def create_loan():
     try:
         if 'user_id' not in session:
@@ -38,8 +66,10 @@ def create_loan():
         users_collection, loans_collection, transactions_collection = get_collections()
         loan_model = Loan(loans_collection)
 
-        # Create loan
-        loan_id = loan_model.create_loan(current_user_id, amount, term_months, purpose)
+        # Create loan, carrying the borrower's current score for marketplace sorting
+        borrower_score = get_score_model().get_score(current_user_id)
+        loan_id = loan_model.create_loan(current_user_id, amount, term_months, purpose, borrower_score)
+        LOANS_CREATED.inc()
 
         return jsonify({
             'message': 'Loan request created successfully',
@@ -51,29 +81,51 @@ def create_loan():
 
 
 @loan_bp.route('/pending', methods=['GET'])
+@conditional
 def get_pending_loans():
     try:
         users_collection, loans_collection, transactions_collection = get_collections()
         loan_model = Loan(loans_collection)
         user_model = User(users_collection)
 
-        pending_loans = loan_model.get_pending_loans()
-
-        # Add borrower information to each loan
+        args = request.args
+        try:
+            limit = min(max(args.get('limit', 20, type=int), 1), 100)
+            pending_loans, next_cursor, total, total_capped = loan_model.search_pending_loans(
+                min_amount=args.get('min_amount', type=float),
+                max_amount=args.get('max_amount', type=float),
+                min_term=args.get('min_term', type=int),
+                max_term=args.get('max_term', type=int),
+                text=args.get('q', '').strip() or None,
+                sort=args.get('sort', 'newest'),
+                cursor=args.get('cursor'),
+                limit=limit
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Add borrower information to each loan (one query for the whole page)
+        borrowers = user_model.get_users_by_ids(loan['borrower_id'] for loan in pending_loans)
         for loan in pending_loans:
-            borrower = user_model.get_user_by_id(loan['borrower_id'])
+            borrower = borrowers.get(loan['borrower_id'])
             loan['borrower_name'] = borrower['name'] if borrower else 'Unknown'
             loan['borrower_email'] = borrower['email'] if borrower else 'Unknown'
             loan['id'] = str(loan['_id'])
             loan['borrower_id'] = str(loan['borrower_id'])
 
-        return jsonify({'loans': pending_loans}), 200
+        return jsonify({
+            'loans': pending_loans,
+            'next_cursor': next_cursor,
+            'total': total,
+            'total_capped': total_capped
+        }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @loan_bp.route('/fund/<loan_id>', methods=['POST'])
+@idempotent
 def fund_loan(loan_id):
     try:
         if 'user_id' not in session:
@@ -103,22 +155,36 @@ def fund_loan(loan_id):
         if current_user['wallet_balance'] < loan['amount']:
             return jsonify({'error': 'Insufficient wallet balance'}), 400
 
-        # Fund the loan
-        success = loan_model.fund_loan(loan_id, current_user_id)
-        if not success:
+        def fund(db_session):
+            # Fund the loan
+            if not loan_model.fund_loan(loan_id, current_user_id, session=db_session):
+                return False
+
+            # Update lender's wallet
+            user_model.update_wallet_balance(current_user_id, -loan['amount'], session=db_session)
+
+            # Create transaction record
+            transaction_model.create_transaction(
+                loan_id,
+                current_user_id,
+                loan['amount'],
+                'loan_funding',
+                f'Funded loan for {loan["amount"]}',
+                session=db_session
+            )
+            return True
+
+        # One transaction when MONGO_TRANSACTIONS is on, outbox events included
+        if not in_transaction(get_client(), fund):
             return jsonify({'error': 'Failed to fund loan'}), 500
+        LOANS_FUNDED.inc()
 
-        # Update lender's wallet
-        user_model.update_wallet_balance(current_user_id, -loan['amount'])
-
-        # Create transaction record
-        transaction_model.create_transaction(
-            loan_id,
-            current_user_id,
-            loan['amount'],
-            'loan_funding',
-            f'Funded loan for {loan["amount"]}'
-        )
+        # Scores are derived data, updated after the response; the recompute
+        # job repairs a missed update
+        try:
+            task_executor.defer('scores.record_funding', loan['borrower_id'], loan['amount'], loan_id)
+        except Exception as e:
+            print(f"⚠️  Borrower score update failed: {e}")
 
         return jsonify({'message': 'Loan funded successfully'}), 200
 
@@ -127,6 +193,7 @@ def fund_loan(loan_id):
 
 
 @loan_bp.route('/my-loans', methods=['GET'])
+@conditional
 def get_my_loans():
     try:
         if 'user_id' not in session:
@@ -137,40 +204,32 @@ def get_my_loans():
         loan_model = Loan(loans_collection)
         user_model = User(users_collection)
 
-        # Get user to determine role
-        current_user = user_model.get_user_by_id(current_user_id)
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
+        def load():
+            # Get user to determine role
+            current_user = user_model.get_user_by_id(current_user_id)
+            if not current_user:
+                return None
 
-        if current_user['role'] == 'borrower':
-            loans = loan_model.get_loans_by_borrower(current_user_id)
-        else:
-            loans = loan_model.get_loans_by_lender(current_user_id)
+            if current_user['role'] == 'borrower':
+                loans = loan_model.get_loans_by_borrower(current_user_id)
+            else:
+                loans = loan_model.get_loans_by_lender(current_user_id)
 
-        # Add additional information
-        for loan in loans:
-            loan['id'] = str(loan['_id'])
-            loan['borrower_id'] = str(loan['borrower_id'])
-            if loan.get('lender_id'):
-                loan['lender_id'] = str(loan['lender_id'])
+            # Funded loans carry their interest and repayment totals
+            return {'loans': [LoanRecord.from_document(loan).to_dict() for loan in loans]}
 
-            # Calculate interest
-            if loan['status'] == 'funded':
-                interest = loan_model.calculate_interest(
-                    loan['amount'],
-                    loan['interest_rate'],
-                    loan['term_months']
-                )
-                loan['total_interest'] = interest
-                loan['total_amount'] = loan['amount'] + interest
-
-        return jsonify({'loans': loans}), 200
+        # Invalidated by the Loan writes that touch this user's loans
+        payload = user_cache.get_or_set(current_user_id, 'my-loans', ('loans',), load)
+        if payload is None:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify(payload), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @loan_bp.route('/repay/<loan_id>', methods=['POST'])
+@idempotent
 def repay_loan(loan_id):
     try:
         if 'user_id' not in session:
@@ -183,8 +242,8 @@ def repay_loan(loan_id):
         user_model = User(users_collection)
         transaction_model = Transaction(transactions_collection)
 
-        # Get loan details
-        loan = loan_model.get_loan_by_id(loan_id)
+        # Get loan details; only its borrower may repay, so look on their shard
+        loan = loan_model.get_loan_by_id(loan_id, borrower_id=current_user_id)
         if not loan:
             return jsonify({'error': 'Loan not found'}), 404
 
@@ -207,12 +266,6 @@ def repay_loan(loan_id):
         if borrower['wallet_balance'] < total_repayment:
             return jsonify({'error': 'Insufficient wallet balance for repayment'}), 400
 
-        # Process repayment
-        loan_model.repay_loan(loan_id)
-
-        # Update borrower's wallet
-        user_model.update_wallet_balance(current_user_id, -total_repayment)
-
         # Calculate lender return and platform margin
         lender_return = loan_model.calculate_interest(
             loan['amount'],
@@ -221,25 +274,45 @@ def repay_loan(loan_id):
         )
         platform_margin = interest - lender_return
 
-        # Update lender's wallet with return
-        user_model.update_wallet_balance(loan['lender_id'], loan['amount'] + lender_return)
-
-        # Create transaction records
-        transaction_model.create_transaction(
-            loan_id,
-            current_user_id,
-            total_repayment,
-            'repayment',
-            f'Loan repayment of {total_repayment}'
-        )
-
-        transaction_model.create_transaction(
-            loan_id,
-            loan['lender_id'],
-            lender_return,
-            'interest_payment',
-            f'Lender return of {lender_return}'
-        )
+        def repay(db_session):
+            # Process repayment
+            loan_model.repay_loan(loan_id, loan['borrower_id'], session=db_session, lender_id=loan['lender_id'])
+
+            # Update borrower's wallet
+            user_model.update_wallet_balance(current_user_id, -total_repayment, session=db_session)
+
+            # Update lender's wallet with return
+            user_model.update_wallet_balance(loan['lender_id'], loan['amount'] + lender_return, session=db_session)
+
+            # Create transaction records
+            transaction_model.create_transaction(
+                loan_id,
+                current_user_id,
+                total_repayment,
+                'repayment',
+                f'Loan repayment of {total_repayment}',
+                session=db_session
+            )
+
+            # The lender's only ledger row for the repayment, so it is written
+            # with the wallet credit rather than behind it
+            transaction_model.create_transaction(
+                loan_id,
+                loan['lender_id'],
+                lender_return,
+                'interest_payment',
+                f'Lender return of {lender_return}',
+                session=db_session
+            )
+
+        in_transaction(get_client(), repay)
+        LOANS_REPAID.inc()
+
+        try:
+            on_time = loan.get('due_date') is None or datetime.utcnow() <= loan['due_date']
+            task_executor.defer('scores.record_repayment', current_user_id, loan['amount'], on_time, loan_id)
+        except Exception as e:
+            print(f"⚠️  Borrower score update failed: {e}")
 
         return jsonify({
             'message': 'Loan repaid successfully',
@@ -1,34 +1,82 @@
+import time
 from flask import Blueprint, request, jsonify, session
 from models.transaction import Transaction
 from models.loan import Loan
 from models.user import User
+from models.accrual import Accrual
+from models.records import TransactionRecord
+from metrics import WALLET_TOPUPS
+from models.routing import in_transaction
+from decorators import idempotent, conditional
+from cache import user_cache
+from tasks import task, task_executor, LOW
 
 transaction_bp = Blueprint('transaction', __name__)
 
-def get_db():
-    from app import mongo
-    return mongo.db
+def get_collections():
+    from app import users, loans, transactions
+    return users, loans, transactions
+
+def get_client():
+    from app import client
+    return client
+
+def get_accrual_model():
+    from app import accruals
+    return Accrual(accruals)
+
+def get_analytics_cache():
+    from app import analytics_cache, app
+    return analytics_cache, app.config['PLATFORM_ANALYTICS_TTL']
+
+def compute_platform_analytics():
+    users_collection, loans_collection, transactions_collection = get_collections()
+    user_model = User(users_collection)
+    loan_model = Loan(loans_collection)
+    transaction_model = Transaction(transactions_collection)
+
+    # Get user counts
+    total_lenders = len(user_model.get_all_lenders())
+    total_borrowers = len(user_model.get_all_borrowers())
+
+    return {
+        'total_users': total_lenders + total_borrowers,
+        'total_lenders': total_lenders,
+        'total_borrowers': total_borrowers,
+        'loan_analytics': loan_model.get_loan_analytics(),
+        'transaction_analytics': transaction_model.get_platform_analytics(),
+        # Accrued-to-date interest on funded loans, from the last daily accrual run
+        'accruals': get_accrual_model().get_latest_summary()
+    }
+
+@task('analytics.platform', priority=LOW)
+def refresh_platform_analytics(force=False):
+    """Recompute the cached platform analytics unless another refresh just did"""
+    cache, ttl = get_analytics_cache()
+    cached = cache.get('platform')
+    if not force and cached is not None and time.time() - cached['computed_at'] < ttl:
+        return cached
+    cached = {'data': compute_platform_analytics(), 'computed_at': time.time()}
+    cache.set('platform', cached)
+    return cached
 
 @transaction_bp.route('/history', methods=['GET'])
+@conditional
 def get_transaction_history():
     try:
         if 'user_id' not in session:
             return jsonify({'error': 'Not logged in'}), 401
         
         current_user_id = session['user_id']
-        db = get_db()
-        transaction_model = Transaction(db)
-        
-        transactions = transaction_model.get_transactions_by_user(current_user_id)
-        
-        # Convert ObjectId to string for JSON serialization
-        for transaction in transactions:
-            transaction['id'] = str(transaction['_id'])
-            transaction['loan_id'] = str(transaction['loan_id'])
-            transaction['user_id'] = str(transaction['user_id'])
-            transaction['timestamp'] = transaction['timestamp'].isoformat()
-        
-        return jsonify({'transactions': transactions}), 200
+        _, _, transactions_collection = get_collections()
+        transaction_model = Transaction(transactions_collection)
+
+        def load():
+            transactions = transaction_model.get_transactions_by_user(current_user_id)
+            return {'transactions': [TransactionRecord.from_document(t).to_dict() for t in transactions]}
+
+        # Invalidated by Transaction.create_transaction for this user
+        return jsonify(user_cache.get_or_set(current_user_id, 'history', ('transactions',), load)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -40,11 +88,11 @@ def get_analytics():
             return jsonify({'error': 'Not logged in'}), 401
         
         current_user_id = session['user_id']
-        db = get_db()
+        users_collection, loans_collection, transactions_collection = get_collections()
         
-        user_model = User(db)
-        loan_model = Loan(db)
-        transaction_model = Transaction(db)
+        user_model = User(users_collection)
+        loan_model = Loan(loans_collection)
+        transaction_model = Transaction(transactions_collection)
         
         # Get user details
         current_user = user_model.get_user_by_id(current_user_id)
@@ -86,6 +134,7 @@ def get_analytics():
         return jsonify({'error': str(e)}), 500
 
 @transaction_bp.route('/update-wallet', methods=['POST'])
+@idempotent
 def update_wallet():
     try:
         if 'user_id' not in session:
@@ -101,7 +150,7 @@ def update_wallet():
         if operation not in ['add', 'subtract']:
             return jsonify({'error': 'Invalid operation'}), 400
             
-        from app import users
+        users, _, _ = get_collections()
         user_model = User(users)
         user = user_model.get_user_by_id(session['user_id'])
         
@@ -116,11 +165,9 @@ def update_wallet():
                 return jsonify({'error': 'Insufficient balance'}), 400
             new_balance = current_balance - amount
             
-        # Update user's wallet balance
-        users.update_one(
-            {'_id': user['_id']},
-            {'$set': {'wallet_balance': new_balance}}
-        )
+        # Update user's wallet balance, and its outbox event, together
+        in_transaction(get_client(), lambda db_session: user_model.set_wallet_balance(
+            user['_id'], new_balance, session=db_session))
         
         # Update session
         session['wallet_balance'] = new_balance
@@ -138,37 +185,22 @@ def get_platform_analytics():
     try:
         if 'user_id' not in session:
             return jsonify({'error': 'Not logged in'}), 401
-        db = get_db()
-        
         # Check if user is admin (for now, allow all users to see platform analytics)
-        user_model = User(db)
-        loan_model = Loan(db)
-        transaction_model = Transaction(db)
-        
-        # Get loan analytics
-        loan_analytics = loan_model.get_loan_analytics()
-        
-        # Get transaction analytics
-        transaction_analytics = transaction_model.get_platform_analytics()
-        
-        # Get user counts
-        total_lenders = len(user_model.get_all_lenders())
-        total_borrowers = len(user_model.get_all_borrowers())
-        
-        platform_data = {
-            'total_users': total_lenders + total_borrowers,
-            'total_lenders': total_lenders,
-            'total_borrowers': total_borrowers,
-            'loan_analytics': loan_analytics,
-            'transaction_analytics': transaction_analytics
-        }
-        
-        return jsonify({'platform_analytics': platform_data}), 200
+        cache, ttl = get_analytics_cache()
+        cached = cache.get('platform')
+        if cached is None:
+            cached = refresh_platform_analytics(force=True)
+        elif time.time() - cached['computed_at'] >= ttl:
+            # Serve the stale figures and refresh them after the response
+            task_executor.defer('analytics.platform')
+
+        return jsonify({'platform_analytics': cached['data']}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @transaction_bp.route('/topup', methods=['POST'])
+@idempotent
 def topup_wallet():
     try:
         if 'user_id' not in session:
@@ -181,21 +213,26 @@ def topup_wallet():
         if not amount or amount <= 0:
             return jsonify({'error': 'Valid amount required'}), 400
         
-        db = get_db()
-        user_model = User(db)
-        transaction_model = Transaction(db)
-        
-        # Update user's wallet balance
-        user_model.update_wallet_balance(current_user_id, amount)
-        
-        # Create transaction record
-        transaction_model.create_transaction(
-            None,  # No loan_id for wallet topup
-            current_user_id,
-            amount,
-            'wallet_topup',
-            f'Wallet topup of {amount}'
-        )
+        users_collection, _, transactions_collection = get_collections()
+        user_model = User(users_collection)
+        transaction_model = Transaction(transactions_collection)
+        
+        def topup(db_session):
+            # Update user's wallet balance
+            user_model.update_wallet_balance(current_user_id, amount, session=db_session)
+
+            # Create transaction record
+            transaction_model.create_transaction(
+                None,  # No loan_id for wallet topup
+                current_user_id,
+                amount,
+                'wallet_topup',
+                f'Wallet topup of {amount}',
+                session=db_session
+            )
+
+        in_transaction(get_client(), topup)
+        WALLET_TOPUPS.inc()
         
         # Get updated user data
         user = user_model.get_user_by_id(current_user_id)
@@ -1,6 +1,9 @@
 from functools import wraps
-from flask import session, redirect, url_for, jsonify, request
+from flask import session, redirect, url_for, jsonify, request, make_response
+import hashlib
+import inspect
 import time
+from models.routing import committed_writes
 
 def login_required(f):
     @wraps(f)
@@ -18,4 +21,94 @@ def login_required(f):
             return redirect(url_for('index'))
             
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+
+def idempotency_store():
+    from app import idempotency_keys
+    from models.idempotency import IdempotencyKey
+    return IdempotencyKey(idempotency_keys)
+
+
+def idempotent(f):
+    """Honour an Idempotency-Key header on a state-changing endpoint.
+
+    The first response for a (user, key) pair is stored; retries with the
+    same key replay it instead of running the write path again. Reusing a
+    key for a different request is rejected, and a retry that arrives while
+    the first attempt is still running gets 409. A 5xx is stored like any
+    other response once the request has written anything (see
+    models.routing.note_committed); if nothing was written the key is
+    released so a retry runs it again.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key or 'user_id' not in session:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': 'Idempotency-Key too long'}), 400
+
+        store = idempotency_store()
+        user_id = session['user_id']
+        fingerprint = hashlib.sha256(
+            request.method.encode() + request.path.encode() + request.get_data()
+        ).hexdigest()
+
+        existing = store.lookup_or_reserve(user_id, key, fingerprint)
+        if existing:
+            if existing['fingerprint'] != fingerprint:
+                return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+            if existing['status'] != 'completed':
+                response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            response = make_response(existing['response']['body'], existing['response']['status'])
+            response.mimetype = 'application/json'
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            if not committed_writes():
+                store.release(user_id, key)
+            else:
+                store.complete(user_id, key, 500, '{"error": "Internal server error"}')
+            raise
+
+        if response.status_code >= 500 and not committed_writes():
+            store.release(user_id, key)
+        else:
+            store.complete(user_id, key, response.status_code, response.get_data(as_text=True))
+        return response
+    return decorated_function
+
+
+def _conditional_response(rv):
+    response = make_response(rv)
+    if request.method == 'GET' and response.status_code == 200:
+        response.add_etag()
+        # Per-user data: never shared by proxies, always revalidated by the client
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        response = response.make_conditional(request)
+    return response
+
+
+def conditional(f):
+    """Tag successful GET responses with an ETag and answer If-None-Match with 304.
+
+    The view still runs; a match saves sending and parsing the body, which
+    lets the frontend revalidate its cached copy cheaply.
+    """
+    if inspect.iscoroutinefunction(f):
+        @wraps(f)
+        async def async_decorated_function(*args, **kwargs):
+            return _conditional_response(await f(*args, **kwargs))
+        return async_decorated_function
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        return _conditional_response(f(*args, **kwargs))
+    return decorated_function
@@ -0,0 +1,266 @@
+"""
+In-memory MongoDB for the tests
+FakeDB, FakeCollection and FakeCursor understand the query and update
+operators the models use, closely enough for unit tests that run without
+a MongoDB server. Tests that need more (an aggregate() for their pipeline,
+a counter of calls) subclass FakeCollection and pass it to FakeDB.
+
+    db = FakeDB()
+    db['loans'].insert_one({'status': 'pending'})
+"""
+
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+
+# A field the document does not have, which $exists tells apart from null
+MISSING = object()
+
+
+def _compare(actual, arg, op):
+    """Range comparison; null and missing values never match"""
+    if actual is None:
+        return False
+    try:
+        return op(actual, arg)
+    except TypeError:
+        return False
+
+
+def value_matches(actual, condition):
+    """Match one field value (MISSING when absent) against a literal or an operator document"""
+    exists = actual is not MISSING
+    actual = actual if exists else None
+    if isinstance(condition, dict) and any(key.startswith('$') for key in condition):
+        values = actual if isinstance(actual, list) else [actual]
+        for op, arg in condition.items():
+            if op == '$in' and not any(value in arg for value in values):
+                return False
+            if op == '$nin' and any(value in arg for value in values):
+                return False
+            if op == '$ne' and arg in values:
+                return False
+            if op == '$exists' and exists != bool(arg):
+                return False
+            if op == '$lt' and not _compare(actual, arg, lambda a, b: a < b):
+                return False
+            if op == '$lte' and not _compare(actual, arg, lambda a, b: a <= b):
+                return False
+            if op == '$gt' and not _compare(actual, arg, lambda a, b: a > b):
+                return False
+            if op == '$gte' and not _compare(actual, arg, lambda a, b: a >= b):
+                return False
+            if op == '$elemMatch' and not any(matches(item, arg) if isinstance(item, dict) else
+                                              value_matches(item, arg) for item in actual or []):
+                return False
+        return True
+    if isinstance(actual, list) and not isinstance(condition, list):
+        return condition in actual
+    return actual == condition
+
+
+def matches(doc, query):
+    """Whether a document matches a filter of fields, $or and $and"""
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(matches(doc, option) for option in condition):
+                return False
+        elif key == '$and':
+            if not all(matches(doc, option) for option in condition):
+                return False
+        elif not value_matches(doc.get(key, MISSING), condition):
+            return False
+    return True
+
+
+def sort_key(value):
+    """MongoDB's order for the values the tests use: null before numbers before strings"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        docs = list(self)
+        for field, order in reversed(keys):
+            docs.sort(key=lambda doc: sort_key(doc.get(field)), reverse=order == -1)
+        return FakeCursor(docs)
+
+    def limit(self, n):
+        return FakeCursor(self[:n]) if n else self
+
+    def skip(self, n):
+        return FakeCursor(self[n:])
+
+
+class FakeCollection:
+    """In-memory collection; remembers the session every write used"""
+
+    def __init__(self, database=None, name=None, docs=()):
+        self.database = database
+        self.name = name
+        self.docs = [dict(doc) for doc in docs]
+        self.sessions = []
+        self.finds = 0
+        self.bulk_writes = 0
+
+    def with_options(self, **kwargs):
+        return self
+
+    def create_index(self, keys, **kwargs):
+        pass
+
+    def _matching(self, query):
+        """The stored documents matching a filter (not copies)"""
+        return [doc for doc in self.docs if matches(doc, query or {})]
+
+    def find(self, query=None, projection=None, session=None, **kwargs):
+        self.finds += 1
+        return FakeCursor(dict(doc) for doc in self._matching(query))
+
+    def find_one(self, query=None, projection=None, session=None, **kwargs):
+        found = self.find(query, projection)
+        return found[0] if found else None
+
+    def count_documents(self, query, session=None, **kwargs):
+        return len(self._matching(query))
+
+    def insert_one(self, doc, session=None):
+        self.sessions.append(session)
+        doc.setdefault('_id', ObjectId())
+        self.docs.append(dict(doc))
+        return SimpleNamespace(inserted_id=doc['_id'])
+
+    def insert_many(self, docs, ordered=True, session=None):
+        self.sessions.append(session)
+        existing = {doc['_id'] for doc in self.docs}
+        for doc in docs:
+            doc.setdefault('_id', ObjectId())
+            if doc['_id'] not in existing:
+                self.docs.append(dict(doc))
+                existing.add(doc['_id'])
+        return SimpleNamespace(inserted_ids=[doc['_id'] for doc in docs])
+
+    def _apply(self, doc, update, inserting=False):
+        if not any(key.startswith('$') for key in update):
+            # A replacement document
+            doc_id = doc.get('_id')
+            doc.clear()
+            doc.update(update)
+            doc.setdefault('_id', doc_id)
+            return
+        doc.update(update.get('$set', {}))
+        if inserting:
+            doc.update(update.get('$setOnInsert', {}))
+        for field in update.get('$unset', {}):
+            doc.pop(field, None)
+        for field, amount in update.get('$inc', {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        for field, value in update.get('$max', {}).items():
+            doc[field] = value if doc.get(field) is None else max(doc[field], value)
+        for field, value in update.get('$min', {}).items():
+            doc[field] = value if doc.get(field) is None else min(doc[field], value)
+        for field, value in update.get('$push', {}).items():
+            if isinstance(value, dict) and '$each' in value:
+                doc.setdefault(field, []).extend(value['$each'])
+                if '$slice' in value:
+                    doc[field] = doc[field][value['$slice']:] if value['$slice'] < 0 else doc[field][:value['$slice']]
+            else:
+                doc.setdefault(field, []).append(value)
+        for field, value in update.get('$addToSet', {}).items():
+            if value not in doc.setdefault(field, []):
+                doc[field].append(value)
+
+    def _upsert(self, query, update):
+        doc = {key: value for key, value in query.items()
+               if not key.startswith('$') and not isinstance(value, dict)}
+        self._apply(doc, update, inserting=True)
+        doc.setdefault('_id', ObjectId())
+        if any(existing['_id'] == doc['_id'] for existing in self.docs):
+            # The filter missed a document that has this _id
+            raise DuplicateKeyError('E11000 duplicate key error collection: _id_')
+        self.docs.append(doc)
+        return doc
+
+    def update_one(self, query, update, upsert=False, session=None, **kwargs):
+        self.sessions.append(session)
+        found = self._matching(query)[:1]
+        for doc in found:
+            self._apply(doc, update)
+        upserted_id = None
+        if not found and upsert:
+            upserted_id = self._upsert(query, update)['_id']
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found), upserted_id=upserted_id)
+
+    def update_many(self, query, update, upsert=False, session=None, **kwargs):
+        self.sessions.append(session)
+        found = self._matching(query)
+        for doc in found:
+            self._apply(doc, update)
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found))
+
+    def replace_one(self, query, doc, upsert=False, session=None):
+        return self.update_one(query, doc, upsert=upsert, session=session)
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False,
+                            session=None, **kwargs):
+        """Returns the document before the update, or after it when return_document is ReturnDocument.AFTER"""
+        self.sessions.append(session)
+        found = self._matching(query)[:1]
+        if not found:
+            if not upsert:
+                return None
+            doc = self._upsert(query, update)
+            return dict(doc) if return_document else None
+        before = dict(found[0])
+        self._apply(found[0], update)
+        return dict(found[0]) if return_document else before
+
+    def delete_one(self, query, session=None):
+        self.sessions.append(session)
+        found = self._matching(query)[:1]
+        for doc in found:
+            self.docs.remove(doc)
+        return SimpleNamespace(deleted_count=len(found))
+
+    def delete_many(self, query, session=None):
+        self.sessions.append(session)
+        found = {id(doc) for doc in self._matching(query)}
+        self.docs = [doc for doc in self.docs if id(doc) not in found]
+        return SimpleNamespace(deleted_count=len(found))
+
+    def bulk_write(self, requests, ordered=True, session=None):
+        self.bulk_writes += 1
+        for request in requests:
+            if isinstance(request, InsertOne):
+                self.insert_one(dict(request._doc), session=session)
+            elif isinstance(request, (UpdateOne, ReplaceOne)):
+                self.update_one(request._filter, request._doc, upsert=request._upsert, session=session)
+            elif isinstance(request, UpdateMany):
+                self.update_many(request._filter, request._doc, session=session)
+            elif isinstance(request, DeleteOne):
+                self.delete_one(request._filter, session=session)
+            elif isinstance(request, DeleteMany):
+                self.delete_many(request._filter, session=session)
+        return SimpleNamespace(acknowledged=True)
+
+
+class FakeDB(dict):
+    """Collections by name, created on first use as `collection_class`"""
+
+    def __init__(self, collection_class=FakeCollection):
+        super().__init__()
+        self.collection_class = collection_class
+
+    def __missing__(self, name):
+        self[name] = self.collection_class(self, name)
+        return self[name]
@@ -0,0 +1,99 @@
+"""
+Gunicorn configuration for QuickCred
+
+    python serve.py        # or: gunicorn -c gunicorn.conf.py app:app
+
+Worker and thread counts come from serve.worker_settings(); see
+DEPLOYMENT.md for the environment variables that tune them.
+"""
+
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from serve import worker_settings
+
+_settings = worker_settings()
+
+if _settings['worker_class'] == 'gevent':
+    # Patch before anything imports pymongo or threading, so the driver's
+    # monitor threads and pool locks become greenlet-aware
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+worker_class = _settings['worker_class']
+workers = _settings['workers']
+threads = _settings['threads']
+if 'worker_connections' in _settings:
+    worker_connections = _settings['worker_connections']
+
+# Recycle workers gradually so slow leaks never build up, without all
+# workers restarting at the same moment
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+keepalive = 5
+
+# Preloading shares the imported code between workers; each worker still
+# opens its own MongoDB client in post_fork
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', None)
+errorlog = '-'
+
+
+def on_starting(server):
+    """Clear samples left in the metrics directory by a previous run, and
+    with a preloaded app compile the templates once for every worker"""
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+    if preload_app:
+        from app import init_templates
+        init_templates()
+
+
+def post_fork(server, worker):
+    """Give each worker its own MongoDB client; pymongo clients are not fork-safe"""
+    if preload_app:
+        import app
+        app.connect_db()
+
+
+def post_worker_init(worker):
+    """Compile the templates unless the master already did, then start the
+    background database check, the background task workers, and the outbox
+    dispatcher when it runs in the app, once the worker has loaded the app"""
+    from app import app, init_templates
+    if not preload_app:
+        init_templates()
+    from readiness import readiness
+    readiness.start()
+    from tasks import task_executor
+    task_executor.start()
+    if app.config['OUTBOX_DISPATCH_IN_APP']:
+        from outbox_dispatcher import outbox_dispatcher
+        outbox_dispatcher.start()
+
+
+def worker_exit(server, worker):
+    """Drain queued background tasks and stop the outbox dispatcher before
+    the worker goes away"""
+    from app import app
+    from tasks import task_executor
+    task_executor.shutdown(app.config['TASK_DRAIN_SECONDS'])
+    from outbox_dispatcher import outbox_dispatcher
+    outbox_dispatcher.stop()
+
+
+def child_exit(server, worker):
+    """Drop live gauges of a worker that exited so they stop being summed"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
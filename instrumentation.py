@@ -0,0 +1,167 @@
+"""
+Per-request MongoDB instrumentation
+Tallies the commands issued while a Flask request is handled and reports
+them as a Server-Timing header and a structured log line.
+"""
+
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+
+from flask import g, request
+from pymongo import monitoring
+
+logger = logging.getLogger('quickcred.requests')
+
+# A context variable rather than a thread-local, so AsyncModel can carry
+# the request's tally onto its executor threads
+_tally = contextvars.ContextVar('request_tally', default=None)
+
+
+class RequestTally:
+    """Command statistics for a single request"""
+
+    def __init__(self, trace=False):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_name = None
+        self.slowest_ms = 0.0
+        self.trace = [] if trace else None
+        self.targets = {}
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self._lock = threading.Lock()
+
+    def record(self, event, ok):
+        """Add a finished command to the tally"""
+        with self._lock:
+            self._record(event, ok)
+
+    def _record(self, event, ok):
+        duration_ms = event.duration_micros / 1000.0
+        self.count += 1
+        self.total_ms += duration_ms
+        if duration_ms >= self.slowest_ms:
+            self.slowest_name = event.command_name
+            self.slowest_ms = duration_ms
+        if self.trace is not None:
+            self.trace.append({
+                'command': event.command_name,
+                'collection': self.targets.pop(event.request_id, None),
+                'ms': round(duration_ms, 3),
+                'ok': ok,
+            })
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def cpu_ms(self):
+        return (time.thread_time() - self.cpu_started) * 1000.0
+
+
+def current_tally():
+    """Return the tally of the request running in this context, if any"""
+    return _tally.get()
+
+
+class CommandTally(monitoring.CommandListener):
+    """CommandListener that feeds the tally of the request on the calling thread.
+
+    pymongo publishes command events on the thread that issued the command,
+    so the context that thread runs in attributes them to the right request;
+    AsyncModel runs its calls in a copy of the request's context.
+    """
+
+    def started(self, event):
+        tally = current_tally()
+        if tally is not None and tally.trace is not None:
+            target = event.command.get(event.command_name)
+            tally.targets[event.request_id] = target if isinstance(target, str) else None
+
+    def succeeded(self, event):
+        tally = current_tally()
+        if tally is not None:
+            tally.record(event, ok=True)
+
+    def failed(self, event):
+        tally = current_tally()
+        if tally is not None:
+            tally.record(event, ok=False)
+
+
+command_tally = CommandTally()
+
+
+def server_timing(tally):
+    """Format a tally as a Server-Timing header value"""
+    metrics = [f'db;dur={tally.total_ms:.2f};desc="{tally.count} commands"']
+    if tally.slowest_name:
+        metrics.append(f'db-slowest;dur={tally.slowest_ms:.2f};desc="{tally.slowest_name}"')
+    metrics.append(f'cpu;dur={tally.cpu_ms():.2f}')
+    metrics.append(f'app;dur={tally.elapsed_ms():.2f}')
+    return ', '.join(metrics)
+
+
+def init_instrumentation(app):
+    """Register the request hooks on the Flask app.
+
+    Settings (read from app.config):
+        SERVER_TIMING      add the Server-Timing header to responses
+        REQUEST_LOG        emit one JSON log line per request
+        SLOW_REQUEST_MS    requests slower than this are logged at WARNING
+        TRACE_SAMPLE_RATE  fraction of requests that keep a full command
+                           trace, logged only when the request is slow
+    """
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    @app.before_request
+    def start_tally():
+        sample_rate = app.config.get('TRACE_SAMPLE_RATE', 0.0)
+        _tally.set(RequestTally(trace=sample_rate > 0 and random.random() < sample_rate))
+
+    @app.after_request
+    def report_tally(response):
+        tally = current_tally()
+        if tally is None:
+            return response
+
+        if app.config.get('SERVER_TIMING', True):
+            response.headers['Server-Timing'] = server_timing(tally)
+
+        # Kept on g so later hooks (metrics, logging) can reuse the numbers
+        g.db_commands = tally.count
+        g.db_ms = tally.total_ms
+
+        if app.config.get('REQUEST_LOG', True):
+            elapsed_ms = tally.elapsed_ms()
+            slow = elapsed_ms >= app.config.get('SLOW_REQUEST_MS', 500)
+            entry = {
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(elapsed_ms, 2),
+                'cpu_ms': round(tally.cpu_ms(), 2),
+                'db_commands': tally.count,
+                'db_ms': round(tally.total_ms, 2),
+                'db_slowest': tally.slowest_name,
+                'db_slowest_ms': round(tally.slowest_ms, 2),
+                'slow': slow,
+            }
+            if slow and tally.trace is not None:
+                entry['trace'] = tally.trace
+            logger.log(logging.WARNING if slow else logging.INFO, json.dumps(entry))
+        return response
+
+    @app.teardown_request
+    def clear_tally(exc):
+        _tally.set(None)
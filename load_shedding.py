@@ -0,0 +1,216 @@
+"""
+Load shedding
+When MongoDB slows down, requests pile up waiting for a pooled connection
+until the browser gives up, and the server keeps working on responses
+nobody will read. With LOAD_SHEDDING=true every request is admitted by
+route class before its view runs:
+
+    write      money-moving and auth POSTs, may use the whole capacity
+    read       pages and per-user GETs, up to 85% of it
+    analytics  platform-wide aggregations, up to 50% of it
+
+Health probes, /metrics and static files are never shed. Capacity is the
+number of requests a worker lets through to MongoDB at once; by default
+the requests it can actually serve at once (its gunicorn threads, or
+greenlets under gevent), capped at its pool size. A request that cannot be admitted within its class's
+queue-time budget, counted from when the proxy received it
+(X-Request-Start), gets a 503 with Retry-After instead. Each class's
+concurrency limit adapts AIMD-style: it shrinks by a quarter when
+requests run slower than LOAD_SHED_TARGET_MS and grows back by about one
+per limit's worth of fast requests, so analytics give way first.
+"""
+
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+from metrics import LOAD_SHED_LIMIT, LOAD_SHED_QUEUE_SECONDS, LOAD_SHED_REJECTED
+
+WRITE, READ, ANALYTICS = 'write', 'read', 'analytics'
+
+# Endpoints that are never shed
+EXEMPT_ENDPOINTS = {'static', 'metrics', 'healthz', 'readyz', 'logout', 'auth.logout'}
+
+# Endpoints whose class isn't implied by their method
+ENDPOINT_CLASSES = {
+    'transaction.get_analytics': ANALYTICS,
+    'transaction.get_platform_analytics': ANALYTICS,
+    'dashboard.get_platform_stats': ANALYTICS,
+}
+
+# Share of the capacity each class may use; the rest is kept for higher classes
+CLASS_SHARES = {WRITE: 1.0, READ: 0.85, ANALYTICS: 0.5}
+
+DECREASE_FACTOR = 0.75
+
+
+def request_arrival(header, now=None):
+    """Wall-clock arrival time from an X-Request-Start header ("t=<time>" in
+    seconds, milliseconds or microseconds); `now` when absent or invalid"""
+    now = time.time() if now is None else now
+    if not header:
+        return now
+    try:
+        value = float(header.strip().removeprefix('t='))
+    except ValueError:
+        return now
+    if value > 1e14:
+        value /= 1e6
+    elif value > 1e11:
+        value /= 1e3
+    # A proxy clock slightly ahead of ours must not grant extra budget
+    return min(value, now)
+
+
+class RouteClass:
+    """Concurrency limit and queue-time budget of one route class"""
+
+    def __init__(self, name, max_limit, budget, target, retry_after):
+        self.name = name
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.budget = budget
+        self.target = target
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.decreased_at = 0.0
+
+
+class LoadShedder:
+    """Admits requests by route class; admits everything until configured"""
+
+    def __init__(self):
+        self.capacity = 0
+        self.classes = {}
+        self.in_flight = 0
+        self._changed = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def configure(self, capacity, budget_ms=2000, analytics_budget_ms=500, target_ms=1000, retry_after=2):
+        """Set the per-worker capacity, queue-time budgets (ms) and latency target (ms); 0 turns it off"""
+        self.capacity = capacity
+        if not capacity:
+            self.classes = {}
+            return
+        target = target_ms / 1000.0
+        budgets = {WRITE: budget_ms, READ: budget_ms, ANALYTICS: analytics_budget_ms}
+        self.classes = {
+            name: RouteClass(name, max(1, int(capacity * share)), budgets[name] / 1000.0, target,
+                             retry_after * (2 if name == ANALYTICS else 1))
+            for name, share in CLASS_SHARES.items()
+        }
+        for route_class in self.classes.values():
+            LOAD_SHED_LIMIT.labels(route_class.name).set(route_class.limit)
+
+    def classify(self, endpoint, method):
+        """The RouteClass of a request, or None when it is never shed"""
+        if not self.enabled or endpoint in EXEMPT_ENDPOINTS:
+            return None
+        if endpoint in ENDPOINT_CLASSES:
+            return self.classes[ENDPOINT_CLASSES[endpoint]]
+        return self.classes[READ if method in ('GET', 'HEAD') else WRITE]
+
+    def admit(self, route_class, arrived_at):
+        """Wait for a slot until the class's budget since `arrived_at` runs out.
+
+        Returns None once admitted, or the reason for rejecting:
+        'queue_time' when the request had already waited too long before
+        reaching the app, 'concurrency' when no slot freed up in time.
+        """
+        remaining = route_class.budget - (time.time() - arrived_at)
+        if remaining <= 0:
+            return 'queue_time'
+        deadline = time.monotonic() + remaining
+        share = CLASS_SHARES[route_class.name]
+        with self._changed:
+            while not (self.in_flight < self.capacity * share and route_class.in_flight < route_class.limit):
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    return 'concurrency'
+                self._changed.wait(wait)
+            self.in_flight += 1
+            route_class.in_flight += 1
+        LOAD_SHED_QUEUE_SECONDS.labels(route_class.name).observe(max(time.time() - arrived_at, 0.0))
+        return None
+
+    def release(self, route_class, latency, overloaded=False):
+        """Free the slot and adapt the class's limit to how the request went"""
+        with self._changed:
+            self.in_flight -= 1
+            route_class.in_flight -= 1
+            now = time.monotonic()
+            if overloaded or latency > route_class.target:
+                # Once per target interval, so one slow burst doesn't collapse the limit
+                if now - route_class.decreased_at >= route_class.target:
+                    route_class.limit = max(1.0, route_class.limit * DECREASE_FACTOR)
+                    route_class.decreased_at = now
+            else:
+                route_class.limit = min(float(route_class.max_limit), route_class.limit + 1.0 / route_class.limit)
+            self._changed.notify_all()
+        LOAD_SHED_LIMIT.labels(route_class.name).set(route_class.limit)
+
+    def stats(self):
+        with self._changed:
+            return {name: {'in_flight': route_class.in_flight, 'limit': round(route_class.limit, 2),
+                           'max_limit': route_class.max_limit}
+                    for name, route_class in self.classes.items()}
+
+
+load_shedder = LoadShedder()
+
+
+def default_capacity(pool_size):
+    """Requests a worker serves at once, from the same settings gunicorn.conf.py uses"""
+    from serve import worker_settings
+    settings = worker_settings()
+    return min(settings.get('worker_connections', settings['threads']), pool_size)
+
+
+def init_load_shedding(app):
+    """Register the admission hooks; configured when LOAD_SHEDDING is on.
+
+    Register after init_metrics so rejected requests still show up in the
+    request metrics.
+    """
+    if app.config.get('LOAD_SHEDDING'):
+        load_shedder.configure(
+            app.config['LOAD_SHED_CAPACITY'] or default_capacity(app.config['MONGO_MAX_POOL_SIZE']),
+            budget_ms=app.config['LOAD_SHED_BUDGET_MS'],
+            analytics_budget_ms=app.config['LOAD_SHED_ANALYTICS_BUDGET_MS'],
+            target_ms=app.config['LOAD_SHED_TARGET_MS'],
+            retry_after=app.config['LOAD_SHED_RETRY_AFTER']
+        )
+
+    @app.before_request
+    def admit_request():
+        route_class = load_shedder.classify(request.endpoint, request.method)
+        if route_class is None:
+            return None
+        reason = load_shedder.admit(route_class, request_arrival(request.headers.get('X-Request-Start')))
+        if reason is not None:
+            LOAD_SHED_REJECTED.labels(route_class.name, reason).inc()
+            response = jsonify({'error': 'Server busy, please retry shortly', 'retry_after': route_class.retry_after})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(math.ceil(route_class.retry_after))
+            return response
+        g.load_shed = (route_class, time.monotonic())
+        return None
+
+    @app.after_request
+    def note_overload(response):
+        if response.status_code in (503, 504) and 'load_shed' in g:
+            g.load_shed_overloaded = True
+        return response
+
+    @app.teardown_request
+    def release_request(exc):
+        admitted = g.pop('load_shed', None)
+        if admitted is not None:
+            route_class, started = admitted
+            load_shedder.release(route_class, time.monotonic() - started,
+                                 overloaded=g.pop('load_shed_overloaded', False))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Local MongoDB Test Clusters
+Starts throwaway mongod processes on free ports for tests that need a real
+replica set or sharded cluster.
+
+    python local_cluster.py replset   # start a 3-node replica set until Ctrl+C
+    python local_cluster.py sharded   # start a 2-shard cluster behind mongos until Ctrl+C
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from pymongo import MongoClient
+
+
+def mongod_available():
+    """True when a mongod binary is on PATH"""
+    return shutil.which('mongod') is not None
+
+
+def mongos_available():
+    """True when both mongod and mongos are on PATH"""
+    return mongod_available() and shutil.which('mongos') is not None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until(check, timeout=60, interval=0.25, message='condition'):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if check():
+                return
+        except Exception:
+            pass
+        time.sleep(interval)
+    raise TimeoutError(f'Timed out waiting for {message}')
+
+
+class LocalMongod:
+    """One mongod process with its own data directory"""
+
+    binary = 'mongod'
+
+    def __init__(self, root, port, args=()):
+        self.port = port
+        self.args = list(args)
+        self.dbpath = os.path.join(root, f'db-{port}')
+        self.logpath = os.path.join(root, f'mongod-{port}.log')
+        self.process = None
+        os.makedirs(self.dbpath, exist_ok=True)
+
+    @property
+    def address(self):
+        return f'127.0.0.1:{self.port}'
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.binary, '--port', str(self.port), '--bind_ip', '127.0.0.1', *self.storage_args(),
+             '--logpath', self.logpath, *self.args],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        client = MongoClient(f'mongodb://{self.address}/?directConnection=true', serverSelectionTimeoutMS=1000)
+        wait_until(lambda: client.admin.command('ping'), message=f'{self.binary} on {self.address}')
+        client.close()
+
+    def storage_args(self):
+        return ['--dbpath', self.dbpath]
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=30)
+        self.process = None
+
+
+class LocalReplicaSet:
+    """A replica set of `members` local mongods; member 0 is preferred as primary.
+
+        with LocalReplicaSet() as rs:
+            client = MongoClient(rs.uri)
+    """
+
+    def __init__(self, name='rs0', members=3, extra_args=(), root=None):
+        self.name = name
+        self.root = root or tempfile.mkdtemp(prefix='quickcred-rs-')
+        self.members = [LocalMongod(self.root, free_port(), ['--replSet', name, *extra_args])
+                        for _ in range(members)]
+
+    @property
+    def uri(self):
+        hosts = ','.join(m.address for m in self.members)
+        return f'mongodb://{hosts}/?replicaSet={self.name}'
+
+    def start(self):
+        for member in self.members:
+            member.start()
+        config = {
+            '_id': self.name,
+            'members': [{'_id': i, 'host': m.address, 'priority': 2 if i == 0 else 1}
+                        for i, m in enumerate(self.members)],
+        }
+        if '--configsvr' in self.members[0].args:
+            config['configsvr'] = True
+        seed = MongoClient(f'mongodb://{self.members[0].address}/?directConnection=true')
+        seed.admin.command('replSetInitiate', config)
+        seed.close()
+        self.wait_healthy()
+        return self
+
+    def wait_healthy(self, timeout=60):
+        """Wait until there is a primary and every running member is PRIMARY or SECONDARY"""
+        running = [m for m in self.members if m.process]
+        client = MongoClient(f'mongodb://{running[0].address}/?directConnection=true')
+
+        def healthy():
+            states = {m['name']: m['stateStr'] for m in client.admin.command('replSetGetStatus')['members']}
+            return ('PRIMARY' in states.values() and
+                    all(states.get(m.address) in ('PRIMARY', 'SECONDARY') for m in running))
+
+        try:
+            wait_until(healthy, timeout=timeout, message='replica set to become healthy')
+        finally:
+            client.close()
+
+    def stop_member(self, index):
+        self.members[index].stop()
+
+    def start_member(self, index):
+        self.members[index].start()
+
+    def stop(self):
+        for member in self.members:
+            member.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class LocalMongos(LocalMongod):
+    """A mongos router in front of a config server replica set"""
+
+    binary = 'mongos'
+
+    def __init__(self, root, port, configdb):
+        super().__init__(root, port, ['--configdb', configdb])
+
+    def storage_args(self):
+        return []
+
+
+class LocalShardedCluster:
+    """A config server replica set, `shards` single-member shard replica sets
+    and one mongos; connect through `uri`.
+
+        with LocalShardedCluster() as cluster:
+            client = MongoClient(cluster.uri)
+    """
+
+    def __init__(self, shards=2):
+        self.root = tempfile.mkdtemp(prefix='quickcred-sharded-')
+        self.config = LocalReplicaSet('cfg', members=1, extra_args=['--configsvr'],
+                                      root=os.path.join(self.root, 'cfg'))
+        self.shards = [LocalReplicaSet(f'shard{i}', members=1, extra_args=['--shardsvr'],
+                                       root=os.path.join(self.root, f'shard{i}'))
+                       for i in range(shards)]
+        self.mongos = None
+
+    @property
+    def uri(self):
+        return f'mongodb://{self.mongos.address}/'
+
+    def start(self):
+        self.config.start()
+        for shard in self.shards:
+            shard.start()
+        configdb = f"{self.config.name}/{','.join(m.address for m in self.config.members)}"
+        self.mongos = LocalMongos(self.root, free_port(), configdb)
+        self.mongos.start()
+
+        client = MongoClient(self.uri)
+        for shard in self.shards:
+            client.admin.command('addShard', f"{shard.name}/{shard.members[0].address}")
+        client.close()
+        return self
+
+    def stop(self):
+        if self.mongos:
+            self.mongos.stop()
+        for shard in self.shards:
+            shard.stop()
+        self.config.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    clusters = {'replset': (LocalReplicaSet, mongod_available), 'sharded': (LocalShardedCluster, mongos_available)}
+    if len(sys.argv) < 2 or sys.argv[1] not in clusters:
+        print(__doc__)
+        sys.exit(1)
+    cluster_class, available = clusters[sys.argv[1]]
+    if not available():
+        print("❌ mongod/mongos not found on PATH")
+        sys.exit(1)
+
+    with cluster_class() as cluster:
+        print(f"✅ {sys.argv[1]} cluster running: {cluster.uri}")
+        print("🛑 Press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n👋 Stopping cluster")
+
+
+if __name__ == '__main__':
+    main()
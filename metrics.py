@@ -0,0 +1,179 @@
+"""
+Prometheus metrics
+Request latency and in-flight gauges per blueprint route, MongoDB pool
+checkout wait, bcrypt queue depth and business counters, served in the
+Prometheus text format at /metrics.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory before
+the workers start; every worker then writes its samples there and /metrics
+aggregates them (see gunicorn.conf.py for the matching cleanup hooks).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'quickcred_request_duration_seconds', 'Request latency by route',
+    ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge(
+    'quickcred_requests_in_flight', 'Requests currently being handled',
+    ['endpoint'], multiprocess_mode='livesum')
+
+MONGO_POOL_WAIT = Histogram(
+    'quickcred_mongo_pool_checkout_seconds', 'Time spent waiting for a pooled MongoDB connection',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    'quickcred_mongo_pool_checkout_failures_total', 'Failed MongoDB connection checkouts', ['reason'])
+
+BCRYPT_QUEUE = Gauge(
+    'quickcred_bcrypt_in_progress', 'bcrypt operations waiting or running',
+    multiprocess_mode='livesum')
+BCRYPT_SECONDS = Histogram(
+    'quickcred_bcrypt_seconds', 'Time spent in bcrypt hash and verify',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+LOANS_CREATED = Counter('quickcred_loans_created_total', 'Loan requests created')
+LOANS_FUNDED = Counter('quickcred_loans_funded_total', 'Loans funded by lenders')
+LOANS_REPAID = Counter('quickcred_loans_repaid_total', 'Loans repaid by borrowers')
+WALLET_TOPUPS = Counter('quickcred_wallet_topups_total', 'Wallet top-ups')
+
+OUTBOX_EVENTS = Counter(
+    'quickcred_outbox_events_total', 'Outbox event deliveries by sink and outcome', ['sink', 'outcome'])
+OUTBOX_DELIVERY_SECONDS = Histogram(
+    'quickcred_outbox_delivery_seconds', 'Time a sink takes to accept a batch of outbox events', ['sink'])
+TASK_QUEUE_DEPTH = Gauge(
+    'quickcred_task_queue_depth', 'Background tasks waiting for a worker thread', ['priority'],
+    multiprocess_mode='livesum')
+TASK_WAIT_SECONDS = Histogram(
+    'quickcred_task_wait_seconds', 'Time a background task waits in the queue before it starts', ['priority'])
+TASK_DURATION_SECONDS = Histogram(
+    'quickcred_task_duration_seconds', 'Background task run time', ['task'])
+TASK_RUNS = Counter(
+    'quickcred_task_runs_total', 'Background task runs by outcome', ['task', 'outcome'])
+USER_CACHE_REQUESTS = Counter(
+    'quickcred_user_cache_requests_total', 'Per-user cache lookups by query shape and outcome', ['shape', 'outcome'])
+USER_CACHE_EVICTIONS = Counter(
+    'quickcred_user_cache_evictions_total', 'Per-user cache entries evicted to stay within USER_CACHE_MAX_BYTES')
+USER_CACHE_BYTES = Gauge(
+    'quickcred_user_cache_bytes', 'Bytes held by the in-process per-user cache', multiprocess_mode='livesum')
+LOAD_SHED_REJECTED = Counter(
+    'quickcred_load_shed_rejected_total', 'Requests rejected with 503 before running, by route class and reason',
+    ['route_class', 'reason'])
+LOAD_SHED_LIMIT = Gauge(
+    'quickcred_load_shed_limit', 'Adaptive concurrency limit per route class', ['route_class'],
+    multiprocess_mode='livesum')
+LOAD_SHED_QUEUE_SECONDS = Histogram(
+    'quickcred_load_shed_queue_seconds', 'Time from arrival at the proxy until a request was admitted',
+    ['route_class'], buckets=LATENCY_BUCKETS)
+MONGO_BREAKER_STATE = Gauge(
+    'quickcred_mongo_breaker_state', 'MongoDB circuit breaker state: 0 closed, 1 half-open, 2 open',
+    multiprocess_mode='livemax')
+MONGO_BREAKER_TRIPS = Counter(
+    'quickcred_mongo_breaker_trips_total', 'Times the MongoDB circuit breaker opened')
+MONGO_BREAKER_REQUESTS = Counter(
+    'quickcred_mongo_breaker_requests_total', 'Requests answered without MongoDB while the breaker was open',
+    ['outcome'])
+
+
+@contextmanager
+def track_bcrypt():
+    """Count a bcrypt call in the queue-depth gauge while it runs"""
+    BCRYPT_QUEUE.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        BCRYPT_SECONDS.observe(time.perf_counter() - started)
+        BCRYPT_QUEUE.dec()
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Measures connection checkout wait on the calling thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            MONGO_POOL_WAIT.observe(time.perf_counter() - started)
+            self._local.started = None
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        MONGO_POOL_CHECKOUT_FAILURES.labels(reason=str(event.reason)).inc()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+pool_wait_listener = PoolWaitListener()
+
+
+def metrics_view():
+    """Render all metrics in the Prometheus text format"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Register the request hooks and the /metrics route on the Flask app"""
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_endpoint = request.endpoint or 'unmatched'
+        REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+    @app.after_request
+    def observe_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            REQUEST_LATENCY.labels(g.metrics_endpoint, request.method, response.status_code).observe(
+                time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        endpoint = g.pop('metrics_endpoint', None)
+        if endpoint is not None:
+            REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,151 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from cache import user_cache
+from models.routing import routed, STRONG, ANALYTICS
+
+try:
+    import numpy as np
+except ImportError:  # the job falls back to plain Python loops
+    np = None
+
+SUMMARIES_COLLECTION = 'accrual_summaries'
+
+# A loan's term is counted in 30-day months, as its due_date is
+DAYS_PER_MONTH = 30
+
+ACCRUAL_SOURCE_PROJECTION = {
+    'borrower_id': 1, 'lender_id': 1, 'amount': 1, 'term_months': 1,
+    'interest_rate': 1, 'lender_return_rate': 1, 'funded_at': 1,
+}
+
+
+def accrual_date(now=None):
+    """Midnight UTC of the day an accrual run covers"""
+    now = now or datetime.utcnow()
+    return datetime(now.year, now.month, now.day)
+
+
+def accrue(amounts, interest_rates, lender_rates, days, terms):
+    """Accrued borrower interest, lender return and platform margin, per loan.
+
+    Simple interest on the principal for the days funded, capped at the
+    loan's term, in the same terms as Loan.calculate_interest(). Takes and
+    returns parallel lists; with numpy installed a chunk is one set of array
+    operations instead of a loop.
+    """
+    if np is not None:
+        months = np.minimum(np.asarray(days, dtype=float) / DAYS_PER_MONTH, np.asarray(terms, dtype=float))
+        principal = np.asarray(amounts, dtype=float) * months
+        interest = principal * np.asarray(interest_rates, dtype=float)
+        lender_return = principal * np.asarray(lender_rates, dtype=float)
+        return (np.round(interest, 2).tolist(), np.round(lender_return, 2).tolist(),
+                np.round(interest - lender_return, 2).tolist())
+
+    interest, lender_return, margin = [], [], []
+    for amount, rate, lender_rate, elapsed, term in zip(amounts, interest_rates, lender_rates, days, terms):
+        months = min(elapsed / DAYS_PER_MONTH, term)
+        borrower_side, lender_side = amount * months * rate, amount * months * lender_rate
+        interest.append(round(borrower_side, 2))
+        lender_return.append(round(lender_side, 2))
+        margin.append(round(borrower_side - lender_side, 2))
+    return interest, lender_return, margin
+
+
+class Accrual:
+    """Accrued-to-date interest on funded loans, one document per loan.
+
+    accrue_funded_loans() is run daily; dashboards and revenue reports read
+    the stored figures and the run's totals in accrual_summaries instead of
+    recomputing them from every loan.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.summaries = collection.database[SUMMARIES_COLLECTION]
+
+    def ensure_indexes(self):
+        """Per-user lookups for dashboards, and the (status, _id) walk over loans"""
+        self.collection.create_index('lender_id')
+        self.collection.create_index('borrower_id')
+        self.collection.database['loans'].create_index([('status', ASCENDING), ('_id', ASCENDING)])
+
+    def accrue_funded_loans(self, loans_collection, as_of=None, chunk_size=1000):
+        """Recompute accruals for every funded loan as of `as_of` (default: today).
+
+        Loans are read in _id order through the (status, _id) index, one
+        chunk per query, and each chunk is written with one bulk_write.
+        Accruals of loans no longer funded are removed at the end, so a rerun
+        for the same day is harmless. A day older than the latest run raises
+        ValueError, since the dashboards read the latest summary next to the
+        stored accruals. Returns the run's summary.
+        """
+        as_of = as_of or accrual_date()
+        latest = list(routed(self.summaries, STRONG).find().sort('_id', -1).limit(1))
+        if latest and as_of < latest[0]['_id']:
+            raise ValueError(f"Accruals are stored as of {latest[0]['_id']:%Y-%m-%d}; "
+                             f"refusing to go back to {as_of:%Y-%m-%d}")
+        loans = routed(loans_collection, ANALYTICS)
+        accruals = routed(self.collection, STRONG)
+        summary = {'_id': as_of, 'loans': 0, 'principal': 0.0, 'accrued_interest': 0.0,
+                   'accrued_lender_return': 0.0, 'accrued_platform_margin': 0.0}
+
+        last_id = None
+        while True:
+            query = {'status': 'funded'}
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            chunk = list(loans.find(query, ACCRUAL_SOURCE_PROJECTION).sort('_id', ASCENDING).limit(chunk_size))
+            if not chunk:
+                break
+            last_id = chunk[-1]['_id']
+
+            days = [max((as_of - (loan.get('funded_at') or as_of)).total_seconds() / 86400, 0.0)
+                    for loan in chunk]
+            interest, lender_return, margin = accrue(
+                [loan['amount'] for loan in chunk],
+                [loan['interest_rate'] for loan in chunk],
+                [loan['lender_return_rate'] for loan in chunk],
+                days,
+                [loan['term_months'] for loan in chunk]
+            )
+            accruals.bulk_write([
+                UpdateOne({'_id': loan['_id']}, {'$set': {
+                    'borrower_id': loan['borrower_id'],
+                    'lender_id': loan.get('lender_id'),
+                    'principal': loan['amount'],
+                    'days_accrued': int(days[i]),
+                    'accrued_interest': interest[i],
+                    'accrued_lender_return': lender_return[i],
+                    'accrued_platform_margin': margin[i],
+                    'as_of': as_of,
+                }}, upsert=True)
+                for i, loan in enumerate(chunk)
+            ], ordered=False)
+
+            summary['loans'] += len(chunk)
+            summary['principal'] += sum(loan['amount'] for loan in chunk)
+            summary['accrued_interest'] += sum(interest)
+            summary['accrued_lender_return'] += sum(lender_return)
+            summary['accrued_platform_margin'] += sum(margin)
+
+        accruals.delete_many({'as_of': {'$ne': as_of}})
+        for field in ('principal', 'accrued_interest', 'accrued_lender_return', 'accrued_platform_margin'):
+            summary[field] = round(summary[field], 2)
+        summary['finished_at'] = datetime.utcnow()
+        routed(self.summaries, STRONG).replace_one({'_id': as_of}, summary, upsert=True)
+        user_cache.invalidate('accruals')
+        return summary
+
+    def get_by_lender(self, lender_id):
+        """{loan_id: accrual} for a lender's funded loans"""
+        return {doc['_id']: doc for doc in routed(self.collection, ANALYTICS).find({'lender_id': ObjectId(lender_id)})}
+
+    def get_by_borrower(self, borrower_id):
+        """{loan_id: accrual} for a borrower's funded loans"""
+        return {doc['_id']: doc for doc in routed(self.collection, ANALYTICS).find({'borrower_id': ObjectId(borrower_id)})}
+
+    def get_latest_summary(self):
+        """Platform totals from the most recent accrual run, or None before the first"""
+        latest = list(routed(self.summaries, ANALYTICS).find().sort('_id', -1).limit(1))
+        return latest[0] if latest else None
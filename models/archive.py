@@ -0,0 +1,246 @@
+import gzip
+import os
+from datetime import datetime, timedelta
+from bson import json_util
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from config import Config
+from models.routing import routed, STRONG, ANALYTICS
+
+LOANS_ARCHIVE = 'loans_archive'
+TRANSACTIONS_ARCHIVE = 'transactions_archive'
+SEGMENTS_COLLECTION = 'archive_segments'
+
+# Catalog field listing the values a segment holds, per lookup field
+CATALOG_FIELDS = {
+    '_id': 'loan_ids',
+    'loan_id': 'loan_ids',
+    'borrower_id': 'borrower_ids',
+    'lender_id': 'lender_ids',
+    'user_id': 'user_ids',
+}
+# Fields kept per record in a segment's record index, by kind
+RECORD_FIELDS = {
+    'loan': ('_id', 'borrower_id', 'lender_id'),
+    'transaction': ('_id', 'loan_id', 'user_id'),
+}
+
+
+def archive_store(collection):
+    """The archive next to a hot collection when archival is enabled, otherwise None"""
+    if not Config.ARCHIVE_ENABLED:
+        return None
+    return ArchiveStore(collection.database, Config.ARCHIVE_SEGMENT_DIR or None)
+
+
+def insert_batch(collection, rows):
+    """insert_many that treats already-present _ids as written"""
+    try:
+        collection.insert_many(rows, ordered=False)
+    except BulkWriteError as e:
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+
+
+def summarize(docs, group_field):
+    """Per-group count and amount, in the shape the analytics aggregations return"""
+    totals = {}
+    for doc in docs:
+        group = totals.setdefault(doc.get(group_field), {'count': 0, 'total_amount': 0.0})
+        group['count'] += 1
+        group['total_amount'] += doc.get('amount', 0.0)
+    return totals
+
+
+def merge_analytics(*results):
+    """Add up [{'_id', 'count', 'total_amount'}] lists group by group"""
+    merged = {}
+    for result in results:
+        for item in result:
+            group = merged.setdefault(item['_id'], {'_id': item['_id'], 'count': 0, 'total_amount': 0.0})
+            group['count'] += item['count']
+            group['total_amount'] += item['total_amount']
+    return list(merged.values())
+
+
+class ArchiveStore:
+    """Cold storage for repaid loans and their transactions.
+
+    Records go to the loans_archive and transactions_archive collections
+    or, given a segment directory, to gzip-compressed NDJSON segment files.
+    Every batch has an archive_segments catalog entry listing the ids it
+    holds and its totals, so the counters never aggregate the archive. A
+    segment's entry also indexes each record's compressed offset, so a
+    lookup opens only segments that can match and decompresses only the
+    matching records.
+    """
+
+    def __init__(self, db, segment_dir=None):
+        self.db = db
+        self.segment_dir = segment_dir
+        self.loans = db[LOANS_ARCHIVE]
+        self.transactions = db[TRANSACTIONS_ARCHIVE]
+        self.segments = db[SEGMENTS_COLLECTION]
+
+    def ensure_indexes(self):
+        """Lookup indexes on the archive, and on the hot loans for picking what to archive"""
+        self.db['loans'].create_index([('status', ASCENDING), ('repaid_at', ASCENDING)])
+        for field in ('borrower_id', 'lender_id'):
+            self.loans.create_index(field)
+        for field in ('loan_id', 'user_id'):
+            self.transactions.create_index(field)
+        for field in set(CATALOG_FIELDS.values()):
+            self.segments.create_index(field)
+
+    def write(self, loans, transactions):
+        """Store a batch; safe to repeat for records already archived"""
+        entry = {}
+        if self.segment_dir:
+            entry = self._write_segment(loans, transactions)
+        else:
+            # Transactions first: an archived loan implies its rows are archived too
+            if transactions:
+                insert_batch(routed(self.transactions, STRONG), transactions)
+            insert_batch(routed(self.loans, STRONG), loans)
+
+        # Catalogued only once the batch is stored; a rerun stores it again
+        routed(self.segments, STRONG).insert_one(dict(entry, **{
+            'created_at': datetime.utcnow(),
+            'loan_ids': [loan['_id'] for loan in loans],
+            'borrower_ids': list({loan['borrower_id'] for loan in loans}),
+            'lender_ids': list({loan['lender_id'] for loan in loans if loan.get('lender_id')}),
+            'user_ids': list({transaction['user_id'] for transaction in transactions}),
+            'loan_stats': summarize(loans, 'status'),
+            'transaction_stats': summarize(transactions, 'type'),
+        }))
+
+    def _write_segment(self, loans, transactions):
+        """Write the batch to a new segment file; returns its catalog fields.
+
+        Each record is a gzip member of its own, so the file still reads as
+        one gzip stream and a single record can be decompressed from its
+        offset.
+        """
+        os.makedirs(self.segment_dir, exist_ok=True)
+        name = f"segment-{datetime.utcnow():%Y%m%dT%H%M%S}-{loans[0]['_id']}.ndjson.gz"
+        path = os.path.join(self.segment_dir, name)
+        records = []
+        with open(path + '.tmp', 'wb') as handle:
+            for kind, docs in (('loan', loans), ('transaction', transactions)):
+                for doc in docs:
+                    member = gzip.compress((json_util.dumps({'kind': kind, 'doc': doc}) + '\n').encode('utf-8'))
+                    records.append(dict({field: doc.get(field) for field in RECORD_FIELDS[kind]},
+                                        kind=kind, offset=handle.tell(), length=len(member)))
+                    handle.write(member)
+        os.replace(path + '.tmp', path)
+        return {'file': name, 'records': records}
+
+    def archived_loan_ids(self, loan_ids):
+        """Which of these loans are already archived (left behind by an interrupted run)"""
+        catalog = routed(self.segments, STRONG).find({'loan_ids': {'$in': loan_ids}}, {'loan_ids': 1})
+        return {loan_id for segment in catalog for loan_id in segment['loan_ids']} & set(loan_ids)
+
+    def find_loans(self, field, value):
+        """Archived loans whose `field` equals `value`"""
+        if self.segment_dir:
+            return self._scan('loan', field, value)
+        return list(routed(self.loans, STRONG).find({field: value}))
+
+    def find_transactions(self, field, value):
+        """Archived transactions whose `field` equals `value`"""
+        if self.segment_dir:
+            return self._scan('transaction', field, value)
+        return list(routed(self.transactions, STRONG).find({field: value}))
+
+    def _scan(self, kind, field, value):
+        segments = routed(self.segments, STRONG).find({CATALOG_FIELDS[field]: value}, {'file': 1, 'records': 1})
+        return self._read(segments, kind, lambda record: record.get(field) == value)
+
+    def _read(self, segments, kind, wanted):
+        """Docs of `kind` whose record index entry satisfies `wanted`, read from their offsets"""
+        # A batch re-archived after an interrupted run can sit in two segments
+        found = {}
+        for segment in segments:
+            with open(os.path.join(self.segment_dir, segment['file']), 'rb') as handle:
+                for record in segment['records']:
+                    if record['kind'] == kind and wanted(record):
+                        handle.seek(record['offset'])
+                        doc = json_util.loads(gzip.decompress(handle.read(record['length'])))['doc']
+                        found[doc['_id']] = doc
+        return list(found.values())
+
+    def iter_loans(self):
+        """Every archived loan; for backfills that rebuild aggregates"""
+        if not self.segment_dir:
+            yield from routed(self.loans, STRONG).find({})
+            return
+        seen = set()
+        for segment in routed(self.segments, STRONG).find({}, {'file': 1}):
+            with gzip.open(os.path.join(self.segment_dir, segment['file']), 'rt', encoding='utf-8') as handle:
+                for line in handle:
+                    record = json_util.loads(line)
+                    if record['kind'] == 'loan' and record['doc']['_id'] not in seen:
+                        seen.add(record['doc']['_id'])
+                        yield record['doc']
+
+    def scan_user_range(self, lower, upper):
+        """Archived transactions of users with lower <= user_id < upper (segment mode)"""
+        condition = {}
+        if lower is not None:
+            condition['$gte'] = lower
+        if upper is not None:
+            condition['$lt'] = upper
+        query = {'user_ids': {'$elemMatch': condition}} if condition else {}
+        segments = routed(self.segments, STRONG).find(query, {'file': 1, 'records': 1})
+        return self._read(segments, 'transaction', lambda record: (
+            (lower is None or record['user_id'] >= lower) and (upper is None or record['user_id'] < upper)))
+
+    def loan_analytics(self):
+        """Archived loans counted by status, shaped like Loan.get_loan_analytics()"""
+        return self._analytics('loan_stats')
+
+    def transaction_analytics(self):
+        """Archived transactions counted by type, shaped like Transaction.get_platform_analytics()"""
+        return self._analytics('transaction_stats')
+
+    def _analytics(self, catalog_field):
+        # Totals are computed once per batch when it is archived
+        catalog = routed(self.segments, ANALYTICS).find({}, {catalog_field: 1})
+        return merge_analytics(*([dict(totals, _id=group) for group, totals in segment[catalog_field].items()]
+                                 for segment in catalog))
+
+
+def archive_repaid_loans(loans_collection, transactions_collection, store, older_than_days, batch_size=500):
+    """Move loans repaid more than `older_than_days` ago, with their
+    transactions, into the archive one batch at a time.
+
+    Each batch is written to the archive before it is deleted from the hot
+    collections, so an interrupted run loses nothing and the next run
+    finishes it. Returns (loans, transactions) moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    query = {'status': 'repaid', '$or': [
+        {'repaid_at': {'$lt': cutoff}},
+        # Loans repaid before repaid_at was recorded
+        {'repaid_at': None, 'updated_at': {'$lt': cutoff}},
+    ]}
+    loans = routed(loans_collection, STRONG)
+    transactions = routed(transactions_collection, STRONG)
+
+    moved_loans = moved_transactions = 0
+    while True:
+        batch = list(loans.find(query).sort('_id', ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        loan_ids = [loan['_id'] for loan in batch]
+        already = store.archived_loan_ids(loan_ids)
+        fresh = [loan for loan in batch if loan['_id'] not in already]
+        rows = list(transactions.find({'loan_id': {'$in': [loan['_id'] for loan in fresh]}})) if fresh else []
+        if fresh:
+            store.write(fresh, rows)
+
+        transactions.delete_many({'loan_id': {'$in': loan_ids}})
+        loans.delete_many({'_id': {'$in': loan_ids}, 'status': 'repaid'})
+        moved_loans += len(fresh)
+        moved_transactions += len(rows)
+    return moved_loans, moved_transactions
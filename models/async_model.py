@@ -0,0 +1,42 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared by every AsyncModel so concurrent requests can't exceed the pymongo pool
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASYNC_MAX_WORKERS', '32')),
+    thread_name_prefix='async-model'
+)
+
+
+class AsyncModel:
+    """Async interface over a sync model (or a raw collection).
+
+    Every method call returns a coroutine that runs the original pymongo
+    call on a shared thread pool, in a copy of the caller's context so the
+    request's command tally sees it, and independent queries can be
+    awaited together with asyncio.gather:
+
+        users = AsyncModel(User(users_collection))
+        user, loans = await asyncio.gather(users.get_user_by_id(uid), ...)
+    """
+
+    def __init__(self, model, executor=None):
+        self._model = model
+        self._executor = executor or _executor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._model, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor,
+                                              functools.partial(context.run, attribute, *args, **kwargs))
+
+        return call
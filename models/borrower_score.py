@@ -0,0 +1,200 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from cache import user_cache
+from models.archive import archive_store
+from models.loan import pending_index_collection
+from models.routing import routed, STRONG
+
+DEFAULT_SCORE = 50.0             # a borrower with no settled loans
+EXPOSURE_PENALTY_UNIT = 5000.0   # one point off per this much outstanding principal
+EXPOSURE_PENALTY_MAX = 20.0
+# Recent events kept per borrower for deduplicating redelivered tasks; a
+# redelivery comes within a few task leases, long before this many newer events
+APPLIED_EVENTS_KEPT = 100
+STAT_FIELDS = ('loans_funded', 'loans_repaid', 'loans_defaulted', 'repaid_on_time', 'outstanding')
+
+
+def compute_score(stats):
+    """Score from 0 to 100 out of a borrower's aggregates.
+
+    The on-time ratio is Laplace-smoothed so a borrower with one repaid
+    loan doesn't outrank one with twenty, and outstanding principal
+    takes off up to EXPOSURE_PENALTY_MAX points.
+    """
+    settled = stats.get('loans_repaid', 0) + stats.get('loans_defaulted', 0)
+    on_time_ratio = (stats.get('repaid_on_time', 0) + 1) / (settled + 2)
+    penalty = min(EXPOSURE_PENALTY_MAX, max(stats.get('outstanding', 0.0), 0.0) / EXPOSURE_PENALTY_UNIT)
+    return round(max(0.0, min(100.0, 100.0 * on_time_ratio - penalty)), 1)
+
+
+class BorrowerScore:
+    """Per-borrower repayment aggregates, with the score copied onto pending loans"""
+
+    def __init__(self, collection, loans_collection):
+        self.collection = collection
+        self.loans_collection = loans_collection
+        self.pending_index = pending_index_collection(loans_collection)
+        self.archive = archive_store(loans_collection)
+
+    def get_score(self, borrower_id):
+        """Current score for a borrower, DEFAULT_SCORE if they have no history"""
+        doc = routed(self.collection, STRONG).find_one({'_id': ObjectId(borrower_id)}, {'score': 1})
+        return doc['score'] if doc else DEFAULT_SCORE
+
+    def record_funding(self, borrower_id, amount, loan_id=None):
+        """A loan of this borrower was funded"""
+        return self._apply(borrower_id, {'loans_funded': 1, 'outstanding': float(amount)},
+                           self._event('funding', loan_id))
+
+    def record_repayment(self, borrower_id, amount, on_time, loan_id=None):
+        """A funded loan of this borrower was repaid"""
+        increments = {'loans_repaid': 1, 'outstanding': -float(amount)}
+        if on_time:
+            increments['repaid_on_time'] = 1
+        return self._apply(borrower_id, increments, self._event('repayment', loan_id))
+
+    @staticmethod
+    def _event(kind, loan_id):
+        return f"{kind}:{loan_id}" if loan_id is not None else None
+
+    def _apply(self, borrower_id, increments, event=None):
+        """Add the increments once per event.
+
+        Durable tasks are delivered at least once, so the last
+        APPLIED_EVENTS_KEPT events are kept on the document and one already
+        there matches nothing; the upsert then hits the existing _id and the
+        update is skipped.
+        """
+        borrower_id = ObjectId(borrower_id)
+        collection = routed(self.collection, STRONG)
+        query = {'_id': borrower_id}
+        update = {'$inc': increments, '$set': {'updated_at': datetime.utcnow()}}
+        if event is not None:
+            query['applied_events'] = {'$ne': event}
+            update['$push'] = {'applied_events': {'$each': [event], '$slice': -APPLIED_EVENTS_KEPT}}
+        try:
+            stats = collection.find_one_and_update(query, update, upsert=True,
+                                                   return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            return self.get_score(borrower_id)
+        score = compute_score(stats)
+        if stats.get('score') != score:
+            collection.update_one({'_id': borrower_id}, {'$set': {'score': score}})
+            self._denormalize(borrower_id, score)
+        return score
+
+    def _denormalize(self, borrower_id, score):
+        for collection in self._pending_copies():
+            routed(collection, STRONG).update_many(
+                {'borrower_id': borrower_id, 'status': 'pending'},
+                {'$set': {'borrower_score': score}}
+            )
+        user_cache.invalidate('loans', borrower_id)
+        user_cache.invalidate('marketplace')
+
+    def _pending_copies(self):
+        """Collections holding pending loans: the loans, plus the index when sharded"""
+        if self.pending_index is None:
+            return [self.loans_collection]
+        return [self.loans_collection, self.pending_index]
+
+    def recompute_all(self, batch_size=1000):
+        """Rebuild every borrower's aggregates from the loans collection and
+        the archive.
+
+        Used for backfills and to repair drift; returns the number of
+        borrowers written. The events of the loans it counted replace each
+        borrower's applied_events, so a task still queued for one of them
+        doesn't add it again on top of the rebuilt totals.
+        """
+        half = APPLIED_EVENTS_KEPT // 2
+        pipeline = [
+            {'$match': {'status': {'$in': ['funded', 'repaid', 'defaulted']}}},
+            {'$sort': {'updated_at': 1}},
+            {'$group': {
+                '_id': '$borrower_id',
+                'loans_funded': {'$sum': 1},
+                'loans_repaid': {'$sum': {'$cond': [{'$eq': ['$status', 'repaid']}, 1, 0]}},
+                'loans_defaulted': {'$sum': {'$cond': [{'$eq': ['$status', 'defaulted']}, 1, 0]}},
+                'repaid_on_time': {'$sum': {'$cond': [
+                    {'$and': [
+                        {'$eq': ['$status', 'repaid']},
+                        {'$lte': [{'$ifNull': ['$repaid_at', '$updated_at']}, '$due_date']}
+                    ]}, 1, 0]}},
+                'outstanding': {'$sum': {'$cond': [{'$eq': ['$status', 'funded']}, '$amount', 0]}},
+                'funding_events': {'$push': {'$concat': ['funding:', {'$toString': '$_id'}]}},
+                'repayment_events': {'$push': {'$cond': [
+                    {'$eq': ['$status', 'repaid']},
+                    {'$concat': ['repayment:', {'$toString': '$_id'}]},
+                    '$$REMOVE']}},
+            }},
+            {'$set': {'funding_events': {'$slice': ['$funding_events', -half]},
+                      'repayment_events': {'$slice': ['$repayment_events', -half]}}},
+        ]
+        archived = self._archived_stats()
+        now = datetime.utcnow()
+        count = 0
+        score_ops, loan_ops = [], []
+
+        def rebuilt():
+            for stats in routed(self.loans_collection, STRONG).aggregate(pipeline, allowDiskUse=True):
+                for field, value in archived.pop(stats['_id'], {}).items():
+                    stats[field] += value
+                stats['applied_events'] = stats.pop('funding_events') + stats.pop('repayment_events')
+                yield stats
+            # Borrowers whose loans are all archived, long past any queued task
+            for borrower_id, stats in archived.items():
+                yield dict(stats, _id=borrower_id, applied_events=[])
+
+        for stats in rebuilt():
+            score = compute_score(stats)
+            fields = {key: value for key, value in stats.items() if key != '_id'}
+            fields.update({'score': score, 'updated_at': now})
+            score_ops.append(UpdateOne({'_id': stats['_id']}, {'$set': fields}, upsert=True))
+            loan_ops.append(UpdateMany({'borrower_id': stats['_id'], 'status': 'pending'},
+                                       {'$set': {'borrower_score': score}}))
+            count += 1
+            if len(score_ops) >= batch_size:
+                self._flush(score_ops, loan_ops)
+                score_ops, loan_ops = [], []
+        self._flush(score_ops, loan_ops)
+
+        # Pending loans of borrowers with no funded history get the default;
+        # a null score is matched too, since keyset paging on it needs a number
+        for collection in self._pending_copies():
+            routed(collection, STRONG).update_many(
+                {'status': 'pending', 'borrower_score': None},
+                {'$set': {'borrower_score': DEFAULT_SCORE}}
+            )
+        user_cache.invalidate('marketplace')
+        return count
+
+    def _archived_stats(self):
+        """Aggregates of the archived loans by borrower, summed the way the pipeline does"""
+        totals = {}
+        if self.archive is None:
+            return totals
+        for loan in self.archive.iter_loans():
+            status = loan.get('status')
+            if status not in ('funded', 'repaid', 'defaulted'):
+                continue
+            stats = totals.setdefault(loan['borrower_id'], dict.fromkeys(STAT_FIELDS, 0))
+            stats['loans_funded'] += 1
+            if status == 'repaid':
+                stats['loans_repaid'] += 1
+                settled_at = loan.get('repaid_at') or loan.get('updated_at')
+                if settled_at is not None and loan.get('due_date') is not None and settled_at <= loan['due_date']:
+                    stats['repaid_on_time'] += 1
+            elif status == 'defaulted':
+                stats['loans_defaulted'] += 1
+            else:
+                stats['outstanding'] += loan.get('amount', 0)
+        return totals
+
+    def _flush(self, score_ops, loan_ops):
+        if score_ops:
+            routed(self.collection, STRONG).bulk_write(score_ops, ordered=False)
+            for collection in self._pending_copies():
+                routed(collection, STRONG).bulk_write(loan_ops, ordered=False)
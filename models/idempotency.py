@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from models.routing import routed, STRONG
+from config import Config
+
+
+class IdempotencyKey:
+    """Stores the first response for each (user, Idempotency-Key) pair"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        """Unique key per user, expired by a TTL index on created_at"""
+        self.collection.create_index([('user_id', ASCENDING), ('key', ASCENDING)], unique=True)
+        self.collection.create_index('created_at', expireAfterSeconds=Config.IDEMPOTENCY_TTL_SECONDS)
+
+    def lookup_or_reserve(self, user_id, key, fingerprint):
+        """Return the stored record for a retry, or None after reserving the key.
+
+        A retry costs one lookup on the unique index. A new key is reserved
+        with an insert; if another request reserved it first, its record is
+        returned instead. A reservation still in progress after
+        IDEMPOTENCY_LEASE_SECONDS belongs to a request whose worker died,
+        and the retry takes it over.
+        """
+        collection = routed(self.collection, STRONG)
+        existing = collection.find_one({'user_id': user_id, 'key': key})
+        if existing:
+            return self._take_over(collection, existing, fingerprint)
+        now = datetime.utcnow()
+        try:
+            collection.insert_one({
+                'user_id': user_id,
+                'key': key,
+                'fingerprint': fingerprint,
+                'status': 'in_progress',
+                'response': None,
+                'created_at': now,
+                'reserved_at': now
+            })
+            return None
+        except DuplicateKeyError:
+            return collection.find_one({'user_id': user_id, 'key': key})
+
+    def _take_over(self, collection, existing, fingerprint):
+        """None once an expired reservation is ours, otherwise the record as it is"""
+        reserved_at = existing.get('reserved_at', existing['created_at'])
+        if (existing['status'] != 'in_progress' or existing['fingerprint'] != fingerprint
+                or datetime.utcnow() - reserved_at < timedelta(seconds=Config.IDEMPOTENCY_LEASE_SECONDS)):
+            return existing
+        # Matching the old reserved_at lets only one of several retries win
+        taken = collection.update_one(
+            {'_id': existing['_id'], 'status': 'in_progress', 'reserved_at': existing.get('reserved_at')},
+            {'$set': {'reserved_at': datetime.utcnow()}}
+        )
+        return None if taken.modified_count else existing
+
+    def complete(self, user_id, key, status_code, body):
+        """Store the response that retries will replay"""
+        routed(self.collection, STRONG).update_one(
+            {'user_id': user_id, 'key': key},
+            {'$set': {'status': 'completed', 'response': {'status': status_code, 'body': body}}}
+        )
+
+    def release(self, user_id, key):
+        """Forget a reservation whose request failed without writing anything, so a retry runs it again"""
+        routed(self.collection, STRONG).delete_one({'user_id': user_id, 'key': key, 'status': 'in_progress'})
@@ -0,0 +1,48 @@
+from pymongo.errors import OperationFailure
+from models.accrual import Accrual
+from models.archive import archive_store
+from models.idempotency import IdempotencyKey
+from models.loan import Loan
+from models.outbox import Outbox, OUTBOX_COLLECTION
+from models.reconciliation import ReconciliationRun
+from models.task_store import TaskStore, TASK_COLLECTION
+from models.transaction import Transaction
+
+
+# IndexOptionsConflict, IndexKeySpecsConflict: an index of that name or
+# those keys already exists with other options
+INDEX_CONFLICT_CODES = {85, 86}
+
+
+def ensure_indexes(db):
+    """Create every index the models rely on; safe to run repeatedly.
+
+    An index that already exists with other options (changed by hand, or
+    by an older release) is left as it is: the existing index still
+    serves the queries, and retrying can never succeed. Each model's
+    conflict is returned as a warning, so one stale index doesn't keep
+    the rest from being created. Any other error is raised.
+    """
+    steps = [
+        lambda: IdempotencyKey(db['idempotency_keys']).ensure_indexes(),
+        lambda: Loan(db['loans']).ensure_indexes(),
+        lambda: Transaction(db['transactions']).ensure_indexes(),
+        lambda: ReconciliationRun(db).ensure_indexes(),
+        lambda: Accrual(db['loan_accruals']).ensure_indexes(),
+        lambda: Outbox(db[OUTBOX_COLLECTION]).ensure_indexes(),
+        lambda: TaskStore(db[TASK_COLLECTION]).ensure_indexes(),
+    ]
+    archive = archive_store(db['loans'])
+    if archive is not None:
+        steps.append(archive.ensure_indexes)
+
+    warnings = []
+    for step in steps:
+        try:
+            step()
+        except OperationFailure as e:
+            if e.code not in INDEX_CONFLICT_CODES:
+                raise
+            print(f"⚠️  Index left as it is: {e}")
+            warnings.append(str(e))
+    return warnings
@@ -1,13 +1,62 @@
+import base64
 from datetime import datetime, timedelta
-from bson import ObjectId
+from bson import ObjectId, json_util
+from pymongo import ASCENDING, DESCENDING, TEXT
+from cache import user_cache
+from config import Config
+from models.archive import archive_store, merge_analytics
+from models.outbox import outbox_for
+from models.records import LoanRecord, LOAN_RECORD_PROJECTION, RAW_CODEC_OPTIONS
+from models.routing import after_commit, note_committed, routed, STRONG, ANALYTICS
+from models.sharding import PENDING_INDEX_COLLECTION
+
+# Sort orders for the pending-loan search; _id breaks ties so cursors are stable
+PENDING_SORTS = {
+    'newest': ('created_at', DESCENDING),
+    'smallest': ('amount', ASCENDING),
+    'shortest': ('term_months', ASCENDING),
+    'score': ('borrower_score', DESCENDING),
+}
+PENDING_COUNT_CAP = 1000
+
+
+def encode_cursor(sort_value, loan_id):
+    raw = json_util.dumps([sort_value, loan_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, _id) from a cursor, or raise ValueError"""
+    try:
+        sort_value, loan_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return sort_value, ObjectId(loan_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def pending_index_collection(loans_collection):
+    """The pending-loan index collection in sharded mode, otherwise None"""
+    if not Config.MONGO_SHARDED:
+        return None
+    return loans_collection.database[PENDING_INDEX_COLLECTION]
+
 
 class Loan:
-    def __init__(self, collection):
+    def __init__(self, collection, pending_index=None, archive=None, outbox=None):
         self.collection = collection
+        self.pending_index = pending_index if pending_index is not None else pending_index_collection(collection)
+        self.archive = archive if archive is not None else archive_store(collection)
+        self.outbox = outbox if outbox is not None else outbox_for(collection)
+
+    @property
+    def market(self):
+        """Where pending loans are browsed: the index collection when sharded"""
+        return self.pending_index if self.pending_index is not None else self.collection
     
-    def create_loan(self, borrower_id, amount, term_months, purpose=""):
+    def create_loan(self, borrower_id, amount, term_months, purpose="", borrower_score=None):
         """Create a new loan request"""
         loan_data = {
+            '_id': ObjectId(),
             'borrower_id': ObjectId(borrower_id),
             'amount': float(amount),
             'term_months': int(term_months),
@@ -16,6 +65,7 @@ class Loan:
             'interest_rate': 0.047,  # 4.7% per month
             'lender_return_rate': 0.02,  # 2% per month
             'platform_margin_rate': 0.027,  # 2.7% per month
+            'borrower_score': borrower_score,
             'lender_id': None,
             'funded_at': None,
             'due_date': None,
@@ -23,35 +73,163 @@ class Loan:
             'updated_at': datetime.utcnow()
         }
         
-        result = self.collection.insert_one(loan_data)
+        result = routed(self.collection, STRONG).insert_one(loan_data)
+        # Not in a transaction: the loan exists even if the index copy fails
+        note_committed()
+        if self.pending_index is not None:
+            routed(self.pending_index, STRONG).insert_one(loan_data)
+        user_cache.invalidate('loans', loan_data['borrower_id'])
+        user_cache.invalidate('marketplace')
         return str(result.inserted_id)
     
-    def get_loan_by_id(self, loan_id):
-        """Get loan by ID"""
-        return self.collection.find_one({'_id': ObjectId(loan_id)})
+    def get_loan_by_id(self, loan_id, borrower_id=None, session=None):
+        """Get loan by ID.
+
+        Pass the borrower when the caller knows it so a sharded cluster
+        reads a single shard; pending loans find theirs in the index
+        collection. Anything else falls back to a lookup by _id alone,
+        then to the archive.
+        """
+        loan_id = ObjectId(loan_id)
+        collection = routed(self.collection, STRONG)
+        if borrower_id is None and self.pending_index is not None:
+            entry = routed(self.pending_index, STRONG).find_one({'_id': loan_id}, {'borrower_id': 1}, session=session)
+            borrower_id = entry['borrower_id'] if entry else None
+        if borrower_id is not None:
+            loan = collection.find_one({'_id': loan_id, 'borrower_id': ObjectId(borrower_id)}, session=session)
+            if loan:
+                return loan
+        loan = collection.find_one({'_id': loan_id}, session=session)
+        if loan is None and self.archive is not None:
+            archived = self.archive.find_loans('_id', loan_id)
+            loan = archived[0] if archived else None
+        return loan
     
     def get_pending_loans(self):
         """Get all pending loans"""
-        return list(self.collection.find({'status': 'pending'}))
+        return list(routed(self.market, STRONG).find({'status': 'pending'}))
+
+    def get_pending_loan_records(self):
+        """All pending loans as LoanRecords, decoded from raw BSON with only
+        the rendered fields; for the lender dashboard's full market list"""
+        collection = routed(self.market, STRONG).with_options(codec_options=RAW_CODEC_OPTIONS)
+        return [LoanRecord.from_document(raw)
+                for raw in collection.find({'status': 'pending'}, LOAN_RECORD_PROJECTION)]
     
+    def search_pending_loans(self, min_amount=None, max_amount=None, min_term=None, max_term=None,
+                             text=None, sort='newest', cursor=None, limit=20):
+        """Search pending loans with keyset pagination.
+
+        Returns (loans, next_cursor, total, total_capped). The total is
+        counted up to PENDING_COUNT_CAP so it never scans the whole market.
+        """
+        if sort not in PENDING_SORTS:
+            raise ValueError(f"sort must be one of: {', '.join(PENDING_SORTS)}")
+        field, direction = PENDING_SORTS[sort]
+
+        query = {'status': 'pending'}
+        if min_amount is not None or max_amount is not None:
+            query['amount'] = {}
+            if min_amount is not None:
+                query['amount']['$gte'] = float(min_amount)
+            if max_amount is not None:
+                query['amount']['$lte'] = float(max_amount)
+        if min_term is not None or max_term is not None:
+            query['term_months'] = {}
+            if min_term is not None:
+                query['term_months']['$gte'] = int(min_term)
+            if max_term is not None:
+                query['term_months']['$lte'] = int(max_term)
+        if text:
+            query['$text'] = {'$search': text}
+
+        collection = routed(self.market, STRONG)
+        total = collection.count_documents(query, limit=PENDING_COUNT_CAP)
+
+        page_query = dict(query)
+        if cursor:
+            after_value, after_id = decode_cursor(cursor)
+            op = '$gt' if direction == ASCENDING else '$lt'
+            if after_value is None:
+                # Null sorts before every value; $gt and $lt never match it
+                page_query['$or'] = [{field: None, '_id': {op: after_id}}]
+                if direction == ASCENDING:
+                    page_query['$or'].append({field: {'$ne': None}})
+            else:
+                page_query['$or'] = [
+                    {field: {op: after_value}},
+                    {field: after_value, '_id': {op: after_id}}
+                ]
+                if direction == DESCENDING:
+                    page_query['$or'].append({field: None})
+
+        loans = list(collection.find(page_query)
+                     .sort([(field, direction), ('_id', direction)])
+                     .limit(limit + 1))
+        next_cursor = None
+        if len(loans) > limit:
+            loans = loans[:limit]
+            # Loans from before scores were kept have no borrower_score; the
+            # cursor treats the missing field as null
+            next_cursor = encode_cursor(loans[-1].get(field), str(loans[-1]['_id']))
+        return loans, next_cursor, total, total >= PENDING_COUNT_CAP
+
+    def ensure_indexes(self):
+        """One compound index per pending-loan sort, a text index on purpose,
+        and a borrower index for per-borrower lookups and score updates"""
+        for field, direction in PENDING_SORTS.values():
+            self.market.create_index([('status', ASCENDING), (field, direction), ('_id', direction)])
+        self.market.create_index([('status', ASCENDING), ('purpose', TEXT)])
+        self.collection.create_index([('borrower_id', ASCENDING), ('status', ASCENDING)])
+        if self.pending_index is not None:
+            self.pending_index.create_index('borrower_id')
+            self.collection.create_index('lender_id')
+
+    def rebuild_pending_index(self):
+        """Copy every pending loan into the index collection and drop stale
+        entries; for switching an existing database to sharded mode or
+        repairing drift. Returns the number of pending loans."""
+        index = routed(self.pending_index, STRONG)
+        pending = list(routed(self.collection, STRONG).find({'status': 'pending'}))
+        for loan in pending:
+            index.replace_one({'_id': loan['_id']}, loan, upsert=True)
+        index.delete_many({'_id': {'$nin': [loan['_id'] for loan in pending]}})
+        return len(pending)
+
     def get_loans_by_borrower(self, borrower_id):
-        """Get all loans for a specific borrower"""
-        return list(self.collection.find({'borrower_id': ObjectId(borrower_id)}))
+        """Get all loans for a specific borrower, archived ones included"""
+        borrower_id = ObjectId(borrower_id)
+        loans = list(routed(self.collection, STRONG).find({'borrower_id': borrower_id}))
+        return loans + self._archived('borrower_id', borrower_id, loans)
+
+    def _archived(self, field, value, hot):
+        """Archived loans matching field == value that aren't already in `hot`"""
+        if self.archive is None:
+            return []
+        seen = {loan['_id'] for loan in hot}
+        return [loan for loan in self.archive.find_loans(field, value) if loan['_id'] not in seen]
     
     def get_loans_by_lender(self, lender_id):
-        """Get all loans for a specific lender"""
-        return list(self.collection.find({'lender_id': ObjectId(lender_id)}))
+        """Get all loans for a specific lender.
+
+        The lender is not part of the shard key, so on a sharded cluster
+        this asks every shard; each answers from its lender_id index.
+        Archived loans are included.
+        """
+        lender_id = ObjectId(lender_id)
+        loans = list(routed(self.collection, STRONG).find({'lender_id': lender_id}))
+        return loans + self._archived('lender_id', lender_id, loans)
     
-    def fund_loan(self, loan_id, lender_id):
-        """Fund a loan"""
-        loan = self.get_loan_by_id(loan_id)
+    def fund_loan(self, loan_id, lender_id, session=None):
+        """Fund a loan; with the outbox enabled this also records a loan.funded event"""
+        loan = self.get_loan_by_id(loan_id, session=session)
         if not loan or loan['status'] != 'pending':
             return False
         
         due_date = datetime.utcnow() + timedelta(days=loan['term_months'] * 30)
         
-        self.collection.update_one(
-            {'_id': ObjectId(loan_id)},
+        routed(self.collection, STRONG).update_one(
+            {'_id': loan['_id'], 'borrower_id': loan['borrower_id']},
             {
                 '$set': {
                     'status': 'funded',
@@ -60,29 +238,63 @@ class Loan:
                     'due_date': due_date,
                     'updated_at': datetime.utcnow()
                 }
-            }
+            },
+            session=session
         )
+        if self.pending_index is not None:
+            routed(self.pending_index, STRONG).delete_one({'_id': loan['_id']}, session=session)
+        if self.outbox is not None:
+            self.outbox.record('loan.funded', {
+                'loan_id': loan['_id'],
+                'borrower_id': loan['borrower_id'],
+                'lender_id': ObjectId(lender_id),
+                'amount': loan['amount'],
+                'due_date': due_date,
+            }, session=session)
+
+        def invalidate():
+            user_cache.invalidate('loans', loan['borrower_id'], ObjectId(lender_id))
+            user_cache.invalidate('marketplace')
+        after_commit(session, invalidate)
         return True
     
-    def repay_loan(self, loan_id):
-        """Mark loan as repaid"""
-        self.collection.update_one(
-            {'_id': ObjectId(loan_id)},
+    def repay_loan(self, loan_id, borrower_id=None, session=None, lender_id=None):
+        """Mark loan as repaid; pass the borrower to target a single shard,
+        and the lender so their cached loan lists are invalidated too.
+        With the outbox enabled this also records a loan.repaid event."""
+        query = {'_id': ObjectId(loan_id)}
+        if borrower_id is not None:
+            query['borrower_id'] = ObjectId(borrower_id)
+        routed(self.collection, STRONG).update_one(
+            query,
             {
                 '$set': {
                     'status': 'repaid',
+                    'repaid_at': datetime.utcnow(),
                     'updated_at': datetime.utcnow()
                 }
-            }
+            },
+            session=session
         )
+        if self.outbox is not None:
+            self.outbox.record('loan.repaid', {'loan_id': ObjectId(loan_id), 'borrower_id': query.get('borrower_id')},
+                               session=session)
+        after_commit(session, lambda: user_cache.invalidate('loans', query.get('borrower_id'), lender_id))
         return True
     
     def calculate_interest(self, principal, rate, months):
         """Calculate interest for a loan"""
         return principal * rate * months
     
+    def count_loans(self):
+        """Number of loans ever created, archived ones included"""
+        total = routed(self.collection, ANALYTICS).count_documents({})
+        if self.archive is not None:
+            total += sum(item['count'] for item in self.archive.loan_analytics())
+        return total
+
     def get_loan_analytics(self):
-        """Get loan analytics for dashboard"""
+        """Get loan analytics for dashboard, archived loans included"""
         pipeline = [
             {
                 '$group': {
@@ -92,4 +304,7 @@ class Loan:
                 }
             }
         ]
-        return list(self.collection.aggregate(pipeline))
+        analytics = list(routed(self.collection, ANALYTICS).aggregate(pipeline))
+        if self.archive is not None:
+            analytics = merge_analytics(analytics, self.archive.loan_analytics())
+        return analytics
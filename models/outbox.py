@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from config import Config
+from models.routing import routed, STRONG, ANALYTICS
+
+OUTBOX_COLLECTION = 'outbox'
+
+# Event lifecycle: pending -> claimed -> delivered, or back to pending with
+# a later next_attempt_at, or dead after OUTBOX_MAX_ATTEMPTS
+PENDING, CLAIMED, DELIVERED, DEAD = 'pending', 'claimed', 'delivered', 'dead'
+
+
+def outbox_for(collection):
+    """The outbox next to a model's collection when the outbox is enabled, otherwise None"""
+    if not Config.OUTBOX_ENABLED:
+        return None
+    return Outbox(collection.database[OUTBOX_COLLECTION])
+
+
+def retry_delay(attempts):
+    """Seconds before retrying an event after its `attempts`-th failure: 2, 4, 8... up to 10 minutes"""
+    return min(2 ** attempts, 600)
+
+
+class Outbox:
+    """Loan and wallet events waiting to be delivered to the outbox sinks.
+
+    Models record an event with the same session as the write it describes,
+    so the event exists exactly when the write commits. Dispatchers claim
+    batches under a lease; an event whose dispatcher died is claimed again
+    once the lease runs out, so every event is delivered at least once.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        """Claim index, and expiry of delivered events after OUTBOX_RETENTION_SECONDS"""
+        self.collection.create_index([('status', ASCENDING), ('next_attempt_at', ASCENDING)])
+        self.collection.create_index('delivered_at', expireAfterSeconds=Config.OUTBOX_RETENTION_SECONDS)
+
+    def record(self, event_type, payload, session=None):
+        """Store an event; pass the session of the write it describes"""
+        now = datetime.utcnow()
+        event = {
+            '_id': ObjectId(),
+            'type': event_type,
+            'payload': payload,
+            'created_at': now,
+            'status': PENDING,
+            'attempts': 0,
+            'next_attempt_at': now,
+            'delivered_to': [],
+        }
+        routed(self.collection, STRONG).insert_one(event, session=session)
+        return event['_id']
+
+    def claim(self, owner, batch_size=100, lease_seconds=30):
+        """Lease up to `batch_size` due events to `owner`, oldest first"""
+        outbox = routed(self.collection, STRONG)
+        now = datetime.utcnow()
+        due = {'$or': [
+            {'status': PENDING, 'next_attempt_at': {'$lte': now}},
+            {'status': CLAIMED, 'lease_until': {'$lt': now}},
+        ]}
+        candidates = [event['_id'] for event in outbox.find(due, {'_id': 1}).sort('_id', ASCENDING).limit(batch_size)]
+        if not candidates:
+            return []
+        # Another dispatcher may claim some of them first; the filter decides who wins
+        outbox.update_many(
+            dict(due, _id={'$in': candidates}),
+            {'$set': {'status': CLAIMED, 'claimed_by': owner, 'lease_until': now + timedelta(seconds=lease_seconds)}}
+        )
+        return list(outbox.find({'_id': {'$in': candidates}, 'status': CLAIMED, 'claimed_by': owner})
+                    .sort('_id', ASCENDING))
+
+    def mark_delivered_to(self, event_ids, sink_name):
+        """Note that a sink has these events, so a retry skips it"""
+        routed(self.collection, STRONG).update_many(
+            {'_id': {'$in': event_ids}}, {'$addToSet': {'delivered_to': sink_name}})
+
+    def complete(self, event_ids, owner):
+        """Events every sink has received"""
+        routed(self.collection, STRONG).update_many(
+            {'_id': {'$in': event_ids}, 'claimed_by': owner},
+            {'$set': {'status': DELIVERED, 'delivered_at': datetime.utcnow()},
+             '$unset': {'lease_until': '', 'claimed_by': ''}}
+        )
+
+    def fail(self, events, owner, error, max_attempts=8):
+        """Schedule a retry with backoff, or give up after max_attempts"""
+        now = datetime.utcnow()
+        requests = []
+        for event in events:
+            attempts = event['attempts'] + 1
+            update = {'status': DEAD if attempts >= max_attempts else PENDING,
+                      'attempts': attempts,
+                      'last_error': str(error)[:500],
+                      'next_attempt_at': now + timedelta(seconds=retry_delay(attempts))}
+            requests.append(UpdateOne({'_id': event['_id'], 'claimed_by': owner},
+                                      {'$set': update, '$unset': {'lease_until': '', 'claimed_by': ''}}))
+        if requests:
+            routed(self.collection, STRONG).bulk_write(requests, ordered=False)
+
+    def requeue_dead(self):
+        """Give dead events another round of attempts; returns how many"""
+        result = routed(self.collection, STRONG).update_many(
+            {'status': DEAD}, {'$set': {'status': PENDING, 'attempts': 0, 'next_attempt_at': datetime.utcnow()}})
+        return result.modified_count
+
+    def stats(self):
+        """Number of events per status"""
+        pipeline = [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]
+        counts = {status: 0 for status in (PENDING, CLAIMED, DELIVERED, DEAD)}
+        counts.update({item['_id']: item['count'] for item in routed(self.collection, ANALYTICS).aggregate(pipeline)})
+        return counts
@@ -0,0 +1,236 @@
+import gzip
+import os
+from datetime import datetime
+from bson import json_util
+from pymongo import ASCENDING, ReplaceOne
+from models.routing import routed, STRONG
+
+RUNS_COLLECTION = 'reconciliation_runs'
+DISCREPANCIES_COLLECTION = 'reconciliation_discrepancies'
+
+# How each transaction type moves its user's wallet. A lender is also paid
+# back the principal on repayment, which has no row of its own: it is the
+# lender's loan_funding amount, owed once the loan's interest_payment exists.
+WALLET_SIGNS = {
+    'wallet_topup': 1,
+    'loan_funding': -1,
+    'repayment': -1,
+    'interest_payment': 1,
+}
+
+
+def id_range(lower, upper):
+    """Query condition for lower <= value < upper; None leaves that end open"""
+    condition = {}
+    if lower is not None:
+        condition['$gte'] = lower
+    if upper is not None:
+        condition['$lt'] = upper
+    return condition
+
+
+def split_points(users, partitions, oversample=32):
+    """_id boundaries cutting users into about `partitions` equal ranges.
+
+    Taken from a $sample of the _ids rather than by skipping through the
+    collection, so planning costs the same for ten users or ten million.
+    """
+    if partitions <= 1:
+        return []
+    pipeline = [{'$sample': {'size': partitions * oversample}}, {'$project': {'_id': 1}}]
+    sample = sorted({doc['_id'] for doc in routed(users, STRONG).aggregate(pipeline)})
+    step = len(sample) / partitions
+    return sorted({sample[int(step * i)] for i in range(1, partitions)}) if sample else []
+
+
+def partition_ranges(points):
+    """[lower, upper) pairs covering every _id, given sorted split points"""
+    bounds = [None] + list(points) + [None]
+    return [[bounds[i], bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def ledger_pipeline(match):
+    """Expected wallet balance per user from the transactions matching `match`"""
+    signed_amount = {'$multiply': ['$amount', {'$switch': {
+        'branches': [{'case': {'$eq': ['$type', kind]}, 'then': sign} for kind, sign in WALLET_SIGNS.items()],
+        'default': 0,
+    }}]}
+    return [
+        {'$match': match},
+        {'$group': {
+            '_id': {'user_id': '$user_id', 'loan_id': '$loan_id'},
+            'delta': {'$sum': signed_amount},
+            'funded': {'$sum': {'$cond': [{'$eq': ['$type', 'loan_funding']}, '$amount', 0]}},
+            'repaid': {'$max': {'$cond': [{'$eq': ['$type', 'interest_payment']}, 1, 0]}},
+        }},
+        {'$group': {
+            '_id': '$_id.user_id',
+            'expected': {'$sum': {'$add': ['$delta', {'$multiply': ['$funded', '$repaid']}]}},
+        }},
+    ]
+
+
+def ledger_balances(rows):
+    """ledger_pipeline() over rows already in memory, for archive segments"""
+    loans = {}
+    for row in rows:
+        entry = loans.setdefault((row['user_id'], row.get('loan_id')), {'delta': 0.0, 'funded': 0.0, 'repaid': 0})
+        entry['delta'] += row['amount'] * WALLET_SIGNS.get(row['type'], 0)
+        if row['type'] == 'loan_funding':
+            entry['funded'] += row['amount']
+        elif row['type'] == 'interest_payment':
+            entry['repaid'] = 1
+    balances = {}
+    for (user_id, _), entry in loans.items():
+        balances[user_id] = balances.get(user_id, 0.0) + entry['delta'] + entry['funded'] * entry['repaid']
+    return balances
+
+
+def expected_balances(transactions, lower, upper, archive=None):
+    """Expected balance of every user in [lower, upper) that has ledger rows.
+
+    Archival moves a loan with all its rows, so the hot and archived sums
+    simply add up.
+    """
+    match = {'user_id': id_range(lower, upper)} if lower is not None or upper is not None else {}
+    balances = {doc['_id']: doc['expected']
+                for doc in routed(transactions, STRONG).aggregate(ledger_pipeline(match))}
+    if archive is None:
+        return balances
+
+    if archive.segment_dir:
+        archived = ledger_balances(archive.scan_user_range(lower, upper))
+    else:
+        archived = {doc['_id']: doc['expected']
+                    for doc in routed(archive.transactions, STRONG).aggregate(ledger_pipeline(match))}
+    for user_id, amount in archived.items():
+        balances[user_id] = balances.get(user_id, 0.0) + amount
+    return balances
+
+
+def user_balances(users, transactions, user_id, archive=None, attempts=3):
+    """Stored and expected balance of one user, read as close together as possible.
+
+    The ledger is read before and after the wallet and the read is retried
+    until both agree, so a transfer committing in between isn't mistaken
+    for drift.
+    """
+    def ledger():
+        rows = routed(transactions, STRONG).aggregate(ledger_pipeline({'user_id': user_id}))
+        expected = sum(doc['expected'] for doc in rows)
+        if archive is not None:
+            expected += ledger_balances(archive.find_transactions('user_id', user_id)).get(user_id, 0.0)
+        return expected
+
+    after = ledger()
+    for _ in range(attempts):
+        before = after
+        user = routed(users, STRONG).find_one({'_id': user_id}, {'wallet_balance': 1})
+        after = ledger()
+        if before == after:
+            break
+    return (user.get('wallet_balance', 0.0) if user is not None else None), after
+
+
+def reconcile_partition(users, transactions, lower, upper, archive=None, tolerance=0.01):
+    """Compare stored and expected balances for users in [lower, upper).
+
+    Returns (users checked, discrepancies). The range's wallets and ledger
+    are read one after the other, so each user flagged there is read again
+    on its own and reported only if it still differs. Ledger rows whose user
+    no longer exists are reported with a stored balance of None.
+    """
+    query = {'_id': id_range(lower, upper)} if lower is not None or upper is not None else {}
+    stored = {doc['_id']: doc.get('wallet_balance', 0.0)
+              for doc in routed(users, STRONG).find(query, {'wallet_balance': 1})}
+    expected = expected_balances(transactions, lower, upper, archive)
+
+    discrepancies = []
+    for user_id in sorted(set(stored) | set(expected)):
+        balance, ledger = stored.get(user_id), expected.get(user_id, 0.0)
+        if balance is not None and abs(balance - ledger) <= tolerance:
+            continue
+        balance, ledger = user_balances(users, transactions, user_id, archive)
+        if balance is None or abs(balance - ledger) > tolerance:
+            discrepancies.append({
+                'user_id': user_id,
+                'stored_balance': balance,
+                'expected_balance': round(ledger, 2),
+                'difference': round(balance - ledger, 2) if balance is not None else None,
+            })
+    return len(stored), discrepancies
+
+
+class ReconciliationRun:
+    """Bookkeeping for one reconciliation run.
+
+    The run document fixes the partition plan and records each partition
+    as it finishes, so a resumed run skips finished partitions and redoes
+    at most the ones that were in flight. Discrepancies are keyed by run and
+    user, so redoing a partition overwrites rather than duplicates them.
+    """
+
+    def __init__(self, db):
+        self.runs = db[RUNS_COLLECTION]
+        self.discrepancies = db[DISCREPANCIES_COLLECTION]
+
+    def ensure_indexes(self):
+        self.discrepancies.create_index([('run_id', ASCENDING), ('user_id', ASCENDING)])
+
+    def start(self, users, partitions):
+        """Plan a new run and return its document"""
+        now = datetime.utcnow()
+        run = {
+            '_id': f'{now:%Y%m%dT%H%M%S}',
+            'started_at': now,
+            'finished_at': None,
+            'partitions': partition_ranges(split_points(users, partitions)),
+            'done': [],
+            'users_checked': 0,
+            'discrepancies': 0,
+        }
+        routed(self.runs, STRONG).insert_one(run)
+        return run
+
+    def get(self, run_id=None):
+        """The run with this id, or the latest unfinished one"""
+        runs = routed(self.runs, STRONG)
+        if run_id is not None:
+            return runs.find_one({'_id': run_id})
+        unfinished = list(runs.find({'finished_at': None}).sort('started_at', -1).limit(1))
+        return unfinished[0] if unfinished else None
+
+    def pending(self, run):
+        """(index, lower, upper) for partitions not yet finished"""
+        done = set(run['done'])
+        return [(index, lower, upper) for index, (lower, upper) in enumerate(run['partitions'])
+                if index not in done]
+
+    def record(self, run_id, index, checked, discrepancies):
+        """Store a finished partition's discrepancies, then mark it done"""
+        if discrepancies:
+            routed(self.discrepancies, STRONG).bulk_write([
+                ReplaceOne({'_id': f"{run_id}:{item['user_id']}"},
+                           dict(item, _id=f"{run_id}:{item['user_id']}", run_id=run_id, partition=index),
+                           upsert=True)
+                for item in discrepancies
+            ], ordered=False)
+        routed(self.runs, STRONG).update_one(
+            {'_id': run_id, 'done': {'$ne': index}},
+            {'$push': {'done': index}, '$inc': {'users_checked': checked, 'discrepancies': len(discrepancies)}}
+        )
+
+    def finish(self, run_id):
+        routed(self.runs, STRONG).update_one({'_id': run_id}, {'$set': {'finished_at': datetime.utcnow()}})
+        return self.get(run_id)
+
+    def export(self, run_id, path):
+        """Write the run's discrepancies to `path` as (gzip if .gz) NDJSON; returns the count"""
+        opener = gzip.open if path.endswith('.gz') else open
+        count = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with opener(path, 'wt', encoding='utf-8') as handle:
+            for item in routed(self.discrepancies, STRONG).find({'run_id': run_id}).sort('user_id', ASCENDING):
+                handle.write(json_util.dumps(item) + '\n')
+                count += 1
+        return count
@@ -0,0 +1,170 @@
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+# Queries that build records ask for undecoded documents: each one is
+# decoded only while its record is built, so a page of loans never sits in
+# memory as full dicts
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def _decoded(doc):
+    """A plain dict for `doc`. A RawBSONDocument is decoded once into a dict
+    that lives only while the record is built; looking fields up on it one
+    by one goes through the slow Mapping protocol."""
+    if isinstance(doc, RawBSONDocument):
+        return bson.decode(doc.raw)
+    return doc
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _str(value):
+    return str(value) if value is not None else None
+
+
+class LoanRecord:
+    """The fields of a loan the dashboards and marketplace render.
+
+    Build from a document or RawBSONDocument with from_document(); fields
+    nothing renders (platform_margin_rate, updated_at) are never loaded.
+    """
+
+    __slots__ = ('id', 'borrower_id', 'lender_id', 'amount', 'term_months', 'purpose', 'status',
+                 'interest_rate', 'lender_return_rate', 'borrower_score',
+                 'created_at', 'funded_at', 'due_date', 'repaid_at')
+
+    def __init__(self, id, borrower_id, amount, term_months, status, interest_rate, lender_return_rate,
+                 purpose='', lender_id=None, borrower_score=None,
+                 created_at=None, funded_at=None, due_date=None, repaid_at=None):
+        self.id = id
+        self.borrower_id = borrower_id
+        self.lender_id = lender_id
+        self.amount = amount
+        self.term_months = term_months
+        self.purpose = purpose
+        self.status = status
+        self.interest_rate = interest_rate
+        self.lender_return_rate = lender_return_rate
+        self.borrower_score = borrower_score
+        self.created_at = created_at
+        self.funded_at = funded_at
+        self.due_date = due_date
+        self.repaid_at = repaid_at
+
+    @classmethod
+    def from_document(cls, doc):
+        doc = _decoded(doc)
+        return cls(
+            doc['_id'], doc['borrower_id'], doc['amount'], doc['term_months'], doc['status'],
+            doc['interest_rate'], doc['lender_return_rate'],
+            purpose=doc.get('purpose', ''),
+            lender_id=doc.get('lender_id'),
+            borrower_score=doc.get('borrower_score'),
+            created_at=doc.get('created_at'),
+            funded_at=doc.get('funded_at'),
+            due_date=doc.get('due_date'),
+            repaid_at=doc.get('repaid_at')
+        )
+
+    @property
+    def total_interest(self):
+        """What the borrower pays on top of the principal"""
+        return self.amount * self.interest_rate * self.term_months
+
+    @property
+    def total_amount(self):
+        return self.amount + self.total_interest
+
+    @property
+    def lender_return(self):
+        """What the lender earns on top of the principal"""
+        return self.amount * self.lender_return_rate * self.term_months
+
+    def to_dict(self):
+        """JSON-ready fields; funded loans carry their repayment totals"""
+        data = {
+            'id': str(self.id),
+            '_id': str(self.id),
+            'borrower_id': str(self.borrower_id),
+            'lender_id': _str(self.lender_id),
+            'amount': self.amount,
+            'term_months': self.term_months,
+            'purpose': self.purpose,
+            'status': self.status,
+            'interest_rate': self.interest_rate,
+            'lender_return_rate': self.lender_return_rate,
+            'borrower_score': self.borrower_score,
+            'created_at': _iso(self.created_at),
+            'funded_at': _iso(self.funded_at),
+            'due_date': _iso(self.due_date),
+            'repaid_at': _iso(self.repaid_at),
+        }
+        if self.status == 'funded':
+            data['total_interest'] = self.total_interest
+            data['total_amount'] = self.total_amount
+        return data
+
+
+# Projection matching LoanRecord, for queries that build records
+LOAN_RECORD_PROJECTION = {field: 1 for field in LoanRecord.__slots__ if field != 'id'}
+
+
+class UserRecord:
+    """Public profile fields of a user; the password hash is never loaded"""
+
+    __slots__ = ('id', 'name', 'email', 'role', 'wallet_balance')
+
+    def __init__(self, id, name, email, role, wallet_balance=0.0):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+        self.wallet_balance = wallet_balance
+
+    @classmethod
+    def from_document(cls, doc):
+        doc = _decoded(doc)
+        return cls(doc['_id'], doc['name'], doc['email'], doc['role'], doc.get('wallet_balance', 0.0))
+
+
+USER_RECORD_PROJECTION = {field: 1 for field in UserRecord.__slots__ if field != 'id'}
+
+
+class TransactionRecord:
+    """A row of a user's transaction history"""
+
+    __slots__ = ('id', 'loan_id', 'user_id', 'amount', 'type', 'description', 'timestamp', 'status')
+
+    def __init__(self, id, loan_id, user_id, amount, type, description='', timestamp=None, status='completed'):
+        self.id = id
+        self.loan_id = loan_id
+        self.user_id = user_id
+        self.amount = amount
+        self.type = type
+        self.description = description
+        self.timestamp = timestamp
+        self.status = status
+
+    @classmethod
+    def from_document(cls, doc):
+        doc = _decoded(doc)
+        return cls(doc['_id'], doc.get('loan_id'), doc['user_id'], doc['amount'], doc['type'],
+                   description=doc.get('description', ''),
+                   timestamp=doc.get('timestamp'),
+                   status=doc.get('status', 'completed'))
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            '_id': str(self.id),
+            'loan_id': _str(self.loan_id),
+            'user_id': str(self.user_id),
+            'amount': self.amount,
+            'type': self.type,
+            'description': self.description,
+            'timestamp': _iso(self.timestamp),
+            'status': self.status,
+        }
@@ -0,0 +1,94 @@
+from flask import g, has_request_context
+from pymongo import ReadPreference
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import SecondaryPreferred
+from pymongo.write_concern import WriteConcern
+from config import Config
+
+# Operation classes every model method is tagged with
+STRONG = 'strong'        # money-moving writes and the reads they depend on
+ANALYTICS = 'analytics'  # heavy read-only aggregations that tolerate lag
+
+
+def _options(operation):
+    if operation == ANALYTICS and Config.ANALYTICS_ON_SECONDARIES:
+        return {
+            'read_preference': SecondaryPreferred(max_staleness=Config.ANALYTICS_MAX_STALENESS_SECONDS),
+            'read_concern': ReadConcern('local'),
+        }
+    if operation in (STRONG, ANALYTICS):
+        return {
+            'read_preference': ReadPreference.PRIMARY,
+            'read_concern': ReadConcern('majority'),
+            'write_concern': WriteConcern(w='majority', wtimeout=Config.STRONG_WRITE_TIMEOUT_MS),
+        }
+    raise ValueError(f'Unknown operation class: {operation}')
+
+
+def routed(collection, operation):
+    """Return `collection` with the read preference and concerns of `operation`.
+
+    with_options only builds a lightweight Collection handle; connections
+    and the pool stay shared with the original client.
+    """
+    return collection.with_options(**_options(operation))
+
+
+def in_transaction(client, callback):
+    """Run callback(session) as one multi-document transaction and return its result.
+
+    The callback may be retried on a transient error, so it must only
+    write through the session. With MONGO_TRANSACTIONS off (a standalone
+    server has no transactions) it runs once with session=None.
+    """
+    if not Config.MONGO_TRANSACTIONS:
+        # Each write lands as it is made, so any of them may have
+        note_committed()
+        return callback(None)
+    with client.start_session() as session:
+        _after_commit[id(session)] = committed = []
+        try:
+            result = session.with_transaction(
+                callback,
+                read_concern=ReadConcern('majority'),
+                write_concern=WriteConcern(w='majority', wtimeout=Config.STRONG_WRITE_TIMEOUT_MS),
+                read_preference=ReadPreference.PRIMARY
+            )
+        finally:
+            del _after_commit[id(session)]
+    note_committed()
+    for hook in committed:
+        hook()
+    return result
+
+
+def note_committed():
+    """Record that the current request has written to the database.
+
+    in_transaction() calls it once its writes are committed (or, without
+    transactions, before they start); writes made outside it call it
+    themselves. The idempotent decorator only lets a failed request run
+    again when nothing was written.
+    """
+    if has_request_context():
+        g.db_committed = True
+
+
+def committed_writes():
+    """Whether the current request has written to the database"""
+    return has_request_context() and g.get('db_committed', False)
+
+
+# Hooks waiting for the transaction of a session to commit, by id(session)
+_after_commit = {}
+
+
+def after_commit(session, hook):
+    """Call hook() once the in_transaction() that `session` belongs to has
+    committed, or straight away for writes made without one. A retried
+    transaction may call it more than once, so it must be idempotent."""
+    pending = _after_commit.get(id(session)) if session is not None else None
+    if pending is None:
+        hook()
+    else:
+        pending.append(hook)
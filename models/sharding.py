@@ -0,0 +1,36 @@
+# Shard key per collection. Per-user queries carry these fields so mongos
+# sends them to a single shard instead of broadcasting to every shard.
+SHARD_KEYS = {
+    'users': {'_id': 'hashed'},                     # every lookup after login is by _id
+    'loans': {'borrower_id': 'hashed'},             # a borrower's loans live together
+    'transactions': {'user_id': 1, 'timestamp': 1}, # one user's history, in time order
+}
+
+# Small unsharded copy of the pending loans the marketplace searches, so
+# browsing and funding don't have to ask every loans shard
+PENDING_INDEX_COLLECTION = 'pending_loans'
+
+
+def shard_collections(client, db_name):
+    """Enable sharding on the database and shard each collection by its key.
+
+    Run once against mongos, before the collections hold data; safe to
+    repeat because resharding an already sharded collection is skipped.
+    """
+    client.admin.command('enableSharding', db_name)
+    sharded_already = {doc['_id'] for doc in client.config.collections.find({}, {'_id': 1})}
+    for name, key in SHARD_KEYS.items():
+        namespace = f'{db_name}.{name}'
+        if namespace not in sharded_already:
+            client.admin.command('shardCollection', namespace, key=key)
+
+
+def is_targeted(collection_name, query):
+    """True when `query` pins the shard key so mongos can target one shard.
+
+    Hashed keys need an equality match on the field; ranged keys need an
+    equality match on their first field.
+    """
+    field = next(iter(SHARD_KEYS[collection_name]))
+    value = query.get(field)
+    return value is not None and not (isinstance(value, dict) and any(k.startswith('$') for k in value))
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from models.outbox import retry_delay
+from models.routing import routed, STRONG, ANALYTICS
+
+TASK_COLLECTION = 'background_tasks'
+
+# Task lifecycle: queued -> running -> deleted on success, or back to queued
+# with a later run_at, or failed after TASK_MAX_ATTEMPTS
+QUEUED, RUNNING, FAILED = 'queued', 'running', 'failed'
+
+
+class TaskStore:
+    """Durable background tasks, so deferred work survives a restart.
+
+    A task is stored before it is queued in memory and claimed under a lease
+    when a worker thread picks it up; a task whose process died is found
+    again by due() once it has been queued, or its lease has run out, for
+    longer than the grace period.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        self.collection.create_index([('status', ASCENDING), ('run_at', ASCENDING)])
+
+    def add(self, name, args, kwargs, priority):
+        """Store a queued task; returns its _id"""
+        now = datetime.utcnow()
+        task = {
+            '_id': ObjectId(),
+            'name': name,
+            'args': list(args),
+            'kwargs': dict(kwargs),
+            'priority': priority,
+            'status': QUEUED,
+            'attempts': 0,
+            'created_at': now,
+            'run_at': now,
+        }
+        routed(self.collection, STRONG).insert_one(task)
+        return task['_id']
+
+    def claim(self, task_id, owner, lease_seconds=60):
+        """Lease one task to `owner`; None when another worker has it or it is done"""
+        now = datetime.utcnow()
+        return routed(self.collection, STRONG).find_one_and_update(
+            {'_id': task_id, '$or': [{'status': QUEUED}, {'status': RUNNING, 'lease_until': {'$lt': now}}]},
+            {'$set': {'status': RUNNING, 'claimed_by': owner, 'lease_until': now + timedelta(seconds=lease_seconds)},
+             '$inc': {'attempts': 1}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def complete(self, task_id, owner):
+        routed(self.collection, STRONG).delete_one({'_id': task_id, 'claimed_by': owner})
+
+    def fail(self, task, owner, error, max_attempts=5):
+        """Schedule a retry with backoff, or give up after max_attempts"""
+        attempts = task['attempts']
+        routed(self.collection, STRONG).update_one(
+            {'_id': task['_id'], 'claimed_by': owner},
+            {'$set': {'status': FAILED if attempts >= max_attempts else QUEUED,
+                      'last_error': str(error)[:500],
+                      'run_at': datetime.utcnow() + timedelta(seconds=retry_delay(attempts))},
+             '$unset': {'lease_until': '', 'claimed_by': ''}}
+        )
+
+    def due(self, grace_seconds=60, limit=100):
+        """Tasks nobody is working on: queued longer than the grace period, or with an expired lease"""
+        now = datetime.utcnow()
+        query = {'$or': [
+            {'status': QUEUED, 'run_at': {'$lte': now - timedelta(seconds=grace_seconds)}},
+            {'status': RUNNING, 'lease_until': {'$lt': now}},
+        ]}
+        return list(routed(self.collection, STRONG).find(query).sort('run_at', ASCENDING).limit(limit))
+
+    def requeue_failed(self):
+        """Give failed tasks another round of attempts; returns how many"""
+        result = routed(self.collection, STRONG).update_many(
+            {'status': FAILED}, {'$set': {'status': QUEUED, 'attempts': 0, 'run_at': datetime.utcnow()}})
+        return result.modified_count
+
+    def stats(self):
+        """Number of tasks per status"""
+        pipeline = [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]
+        counts = {status: 0 for status in (QUEUED, RUNNING, FAILED)}
+        counts.update({item['_id']: item['count'] for item in routed(self.collection, ANALYTICS).aggregate(pipeline)})
+        return counts
@@ -1,12 +1,20 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from cache import user_cache
+from models.archive import archive_store, merge_analytics
+from models.routing import after_commit, routed, STRONG, ANALYTICS
 
 class Transaction:
-    def __init__(self, collection):
+    def __init__(self, collection, archive=None):
         self.collection = collection
+        self.archive = archive if archive is not None else archive_store(collection)
     
-    def create_transaction(self, loan_id, user_id, amount, transaction_type, description=""):
-        """Create a new transaction"""
+    def create_transaction(self, loan_id, user_id, amount, transaction_type, description="", session=None):
+        """Create a new transaction, as part of `session`'s transaction when given.
+
+        The user's cached history is invalidated once the row is written.
+        """
         transaction_data = {
             'loan_id': ObjectId(loan_id),
             'user_id': ObjectId(user_id),
@@ -17,19 +25,44 @@ class Transaction:
             'status': 'completed'
         }
         
-        result = self.collection.insert_one(transaction_data)
+        result = routed(self.collection, STRONG).insert_one(transaction_data, session=session)
+        after_commit(session, lambda: user_cache.invalidate('transactions', transaction_data['user_id']))
         return str(result.inserted_id)
     
     def get_transactions_by_user(self, user_id):
-        """Get all transactions for a user"""
-        return list(self.collection.find({'user_id': ObjectId(user_id)}).sort('timestamp', -1))
+        """Get all transactions for a user, newest first, archived ones included"""
+        user_id = ObjectId(user_id)
+        rows = list(routed(self.collection, STRONG).find({'user_id': user_id}).sort('timestamp', -1))
+        return self._with_archived('user_id', user_id, rows)
     
     def get_transactions_by_loan(self, loan_id):
-        """Get all transactions for a loan"""
-        return list(self.collection.find({'loan_id': ObjectId(loan_id)}).sort('timestamp', -1))
+        """Get all transactions for a loan, newest first, archived ones included"""
+        loan_id = ObjectId(loan_id)
+        rows = list(routed(self.collection, STRONG).find({'loan_id': loan_id}).sort('timestamp', -1))
+        return self._with_archived('loan_id', loan_id, rows)
+
+    def _with_archived(self, field, value, rows):
+        if self.archive is None:
+            return rows
+        seen = {row['_id'] for row in rows}
+        archived = [row for row in self.archive.find_transactions(field, value) if row['_id'] not in seen]
+        if not archived:
+            return rows
+        return sorted(rows + archived, key=lambda row: row['timestamp'], reverse=True)
+
+    def count_transactions(self):
+        """Number of transaction rows, archived ones included"""
+        total = routed(self.collection, ANALYTICS).count_documents({})
+        if self.archive is not None:
+            total += sum(item['count'] for item in self.archive.transaction_analytics())
+        return total
     
+    def ensure_indexes(self):
+        """History index; its user_id prefix also serves reconciliation's _id-range scans"""
+        self.collection.create_index([('user_id', ASCENDING), ('timestamp', DESCENDING)])
+
     def get_platform_analytics(self):
-        """Get platform analytics"""
+        """Get platform analytics, archived transactions included"""
         pipeline = [
             {
                 '$group': {
@@ -39,10 +72,13 @@ class Transaction:
                 }
             }
         ]
-        return list(self.collection.aggregate(pipeline))
+        analytics = list(routed(self.collection, ANALYTICS).aggregate(pipeline))
+        if self.archive is not None:
+            analytics = merge_analytics(analytics, self.archive.transaction_analytics())
+        return analytics
     
     def get_lender_returns(self, lender_id):
-        """Get lender return analytics"""
+        """Get lender return analytics, archived returns included"""
         pipeline = [
             {'$match': {'user_id': ObjectId(lender_id), 'type': 'interest_payment'}},
             {
@@ -53,5 +89,11 @@ class Transaction:
                 }
             }
         ]
-        result = list(self.collection.aggregate(pipeline))
-        return result[0] if result else {'total_returns': 0, 'transaction_count': 0}
+        result = list(routed(self.collection, ANALYTICS).aggregate(pipeline))
+        returns = result[0] if result else {'total_returns': 0, 'transaction_count': 0}
+        if self.archive is not None:
+            archived = [row for row in self.archive.find_transactions('user_id', ObjectId(lender_id))
+                        if row['type'] == 'interest_payment']
+            returns['total_returns'] += sum(row['amount'] for row in archived)
+            returns['transaction_count'] += len(archived)
+        return returns
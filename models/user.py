@@ -1,14 +1,21 @@
 from datetime import datetime
 from bson import ObjectId
 import bcrypt
+from cache import user_cache
+from metrics import track_bcrypt
+from models.outbox import outbox_for
+from models.records import UserRecord, USER_RECORD_PROJECTION, RAW_CODEC_OPTIONS
+from models.routing import after_commit, routed, STRONG, ANALYTICS
 
 class User:
-    def __init__(self, collection):
+    def __init__(self, collection, outbox=None):
         self.collection = collection
+        self.outbox = outbox if outbox is not None else outbox_for(collection)
     
     def create_user(self, name, email, password, role):
         """Create a new user"""
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        with track_bcrypt():
+            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
         
         user_data = {
             'name': name,
@@ -20,35 +27,73 @@ class User:
             'updated_at': datetime.utcnow()
         }
         
-        result = self.collection.insert_one(user_data)
+        result = routed(self.collection, STRONG).insert_one(user_data)
         return str(result.inserted_id)
     
     def get_user_by_email(self, email):
         """Get user by email"""
-        return self.collection.find_one({'email': email})
+        return routed(self.collection, STRONG).find_one({'email': email})
     
     def get_user_by_id(self, user_id):
         """Get user by ID"""
-        return self.collection.find_one({'_id': ObjectId(user_id)})
+        return routed(self.collection, STRONG).find_one({'_id': ObjectId(user_id)})
     
-    def update_wallet_balance(self, user_id, amount):
-        """Update user wallet balance"""
-        self.collection.update_one(
+    def get_users_by_ids(self, user_ids):
+        """Get several users in one query, keyed by ObjectId"""
+        ids = list({ObjectId(user_id) for user_id in user_ids})
+        if not ids:
+            return {}
+        found = routed(self.collection, STRONG).find({'_id': {'$in': ids}}, {'password': 0})
+        return {user['_id']: user for user in found}
+
+    def get_user_records_by_ids(self, user_ids):
+        """Get several users' public fields in one query, as UserRecords keyed by ObjectId"""
+        ids = list({ObjectId(user_id) for user_id in user_ids})
+        if not ids:
+            return {}
+        collection = routed(self.collection, STRONG).with_options(codec_options=RAW_CODEC_OPTIONS)
+        records = (UserRecord.from_document(raw)
+                   for raw in collection.find({'_id': {'$in': ids}}, USER_RECORD_PROJECTION))
+        return {record.id: record for record in records}
+    
+    def update_wallet_balance(self, user_id, amount, session=None):
+        """Add `amount` (negative to debit) to a wallet; with the outbox
+        enabled this also records a wallet.balance_changed event"""
+        routed(self.collection, STRONG).update_one(
             {'_id': ObjectId(user_id)},
             {
                 '$inc': {'wallet_balance': amount},
                 '$set': {'updated_at': datetime.utcnow()}
-            }
+            },
+            session=session
+        )
+        if self.outbox is not None:
+            self.outbox.record('wallet.balance_changed', {'user_id': ObjectId(user_id), 'amount': amount},
+                               session=session)
+        after_commit(session, lambda: user_cache.invalidate('user', user_id))
+
+    def set_wallet_balance(self, user_id, balance, session=None):
+        """Overwrite a wallet balance; with the outbox enabled this also
+        records a wallet.balance_set event"""
+        routed(self.collection, STRONG).update_one(
+            {'_id': ObjectId(user_id)},
+            {'$set': {'wallet_balance': balance, 'updated_at': datetime.utcnow()}},
+            session=session
         )
+        if self.outbox is not None:
+            self.outbox.record('wallet.balance_set', {'user_id': ObjectId(user_id), 'balance': balance},
+                               session=session)
+        after_commit(session, lambda: user_cache.invalidate('user', user_id))
     
     def verify_password(self, password, hashed_password):
         """Verify password"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+        with track_bcrypt():
+            return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
     
     def get_all_lenders(self):
         """Get all lenders"""
-        return list(self.collection.find({'role': 'lender'}))
+        return list(routed(self.collection, ANALYTICS).find({'role': 'lender'}))
     
     def get_all_borrowers(self):
         """Get all borrowers"""
-        return list(self.collection.find({'role': 'borrower'}))
+        return list(routed(self.collection, ANALYTICS).find({'role': 'borrower'}))
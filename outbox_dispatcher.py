@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+QuickCred Outbox Dispatcher
+Delivers loan and wallet events from the outbox collection to the
+configured sinks (OUTBOX_SINKS) in batches, retrying failed deliveries
+with backoff. Requests only insert an event row, so their latency does not
+depend on how many sinks there are. Each gunicorn worker runs a dispatcher
+thread unless OUTBOX_DISPATCH_IN_APP=false, in which case run one or more
+standalone dispatchers:
+    python outbox_dispatcher.py run
+    python outbox_dispatcher.py status
+    python outbox_dispatcher.py requeue-dead
+    python outbox_dispatcher.py webhook-stub [--port 8099]
+"""
+
+import argparse
+import atexit
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from metrics import OUTBOX_DELIVERY_SECONDS, OUTBOX_EVENTS
+
+
+def _plain(value):
+    """ObjectIds as strings and datetimes as ISO 8601, for sinks outside MongoDB"""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _event_json(event):
+    return {'id': str(event['_id']), 'type': event['type'], 'created_at': event['created_at'].isoformat(),
+            'payload': _plain(event['payload'])}
+
+
+class LogSink:
+    """Prints one JSON line per event"""
+
+    name = 'log'
+
+    def send(self, events):
+        for event in events:
+            print(f"📣 {json.dumps(_event_json(event))}")
+
+
+class WebhookSink:
+    """POSTs each batch as {"events": [...]} to a URL; any non-2xx reply is a failure"""
+
+    name = 'webhook'
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, events):
+        body = json.dumps({'events': [_event_json(event) for event in events]}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class EmailSink:
+    """Stands in for an email provider: appends the message for each event to a file"""
+
+    name = 'email'
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, events):
+        messages = []
+        for event in events:
+            payload = event['payload']
+            messages.append(f"To: user {payload.get('user_id') or payload.get('borrower_id')}\n"
+                            f"Subject: QuickCred {event['type']}\n\n"
+                            f"{json.dumps(_event_json(event)['payload'], indent=2)}\n\n")
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(''.join(messages))
+
+
+# Sink factories by OUTBOX_SINKS name; register_sink() adds more
+SINKS = {
+    'log': lambda config: LogSink(),
+    'webhook': lambda config: WebhookSink(config['OUTBOX_WEBHOOK_URL']),
+    'email': lambda config: EmailSink(config['OUTBOX_EMAIL_PATH']),
+}
+
+
+def register_sink(name, factory):
+    """Make `factory(config)` available as OUTBOX_SINKS entry `name`"""
+    SINKS[name] = factory
+
+
+def build_sinks(names, config):
+    """Sinks for a comma-separated OUTBOX_SINKS value"""
+    sinks = []
+    for name in (part.strip() for part in names.split(',')):
+        if not name:
+            continue
+        if name not in SINKS:
+            raise ValueError(f"Unknown outbox sink {name!r}; expected one of {', '.join(SINKS)}")
+        sinks.append(SINKS[name](config))
+    return sinks
+
+
+class OutboxDispatcher:
+    """Claims due outbox events in batches and hands each batch to every sink"""
+
+    def __init__(self):
+        self.outbox = None
+        self.sinks = []
+        self.batch_size = 100
+        self.poll_interval = 0.5
+        self.lease_seconds = 30
+        self.max_attempts = 8
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._worker = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._registered = False
+
+    @property
+    def enabled(self):
+        return self.outbox is not None
+
+    def configure(self, outbox, sinks, batch_size=100, poll_ms=500, lease_seconds=30, max_attempts=8):
+        """Attach the outbox and sinks; disabled until called"""
+        self.outbox = outbox
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.poll_interval = poll_ms / 1000.0
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # configure() runs again in each worker after fork
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        if not self._registered:
+            atexit.register(self.stop)
+            self._registered = True
+
+    def dispatch_once(self):
+        """Deliver one batch; returns the number of events claimed"""
+        events = self.outbox.claim(self.owner, self.batch_size, self.lease_seconds)
+        if not events:
+            return 0
+
+        failed = {}
+        for sink in self.sinks:
+            batch = [event for event in events if sink.name not in event['delivered_to']]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                sink.send(batch)
+            except Exception as e:
+                OUTBOX_EVENTS.labels(sink=sink.name, outcome='failed').inc(len(batch))
+                print(f"⚠️  Outbox sink {sink.name} failed for {len(batch)} events: {e}")
+                for event in batch:
+                    failed.setdefault(event['_id'], e)
+                continue
+            OUTBOX_DELIVERY_SECONDS.labels(sink=sink.name).observe(time.perf_counter() - started)
+            OUTBOX_EVENTS.labels(sink=sink.name, outcome='delivered').inc(len(batch))
+            self.outbox.mark_delivered_to([event['_id'] for event in batch], sink.name)
+
+        delivered = [event['_id'] for event in events if event['_id'] not in failed]
+        if delivered:
+            self.outbox.complete(delivered, self.owner)
+        if failed:
+            retry = [event for event in events if event['_id'] in failed]
+            self.outbox.fail(retry, self.owner, next(iter(failed.values())), self.max_attempts)
+        return len(events)
+
+    def drain(self, timeout=10.0):
+        """Dispatch until nothing is due or the timeout passes; returns events claimed"""
+        deadline = time.monotonic() + timeout
+        total = 0
+        while time.monotonic() < deadline:
+            claimed = self.dispatch_once()
+            total += claimed
+            if claimed < self.batch_size:
+                break
+        return total
+
+    def start(self):
+        """Run the dispatcher thread; a no-op when not configured or already running"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.dispatch_once()
+            except PyMongoError as e:
+                print(f"⚠️  Outbox dispatch failed: {e}")
+                claimed = 0
+            # A full batch means more is probably waiting
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def stop(self, timeout=10.0):
+        """Stop after the batch in flight; undelivered events stay in the outbox"""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+
+outbox_dispatcher = OutboxDispatcher()
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        for event in body.get('events', []):
+            print(f"📨 {event['type']} {event['id']} {json.dumps(event['payload'])}")
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver outbox events to the configured sinks')
+    parser.add_argument('command', choices=['run', 'status', 'requeue-dead', 'webhook-stub'])
+    parser.add_argument('--port', type=int, default=8099, help='webhook-stub port')
+    args = parser.parse_args()
+
+    if args.command == 'webhook-stub':
+        print(f"🚀 Outbox webhook stub on http://127.0.0.1:{args.port}/events")
+        HTTPServer(('127.0.0.1', args.port), StubWebhookHandler).serve_forever()
+        return
+
+    # Add the current directory to Python path
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+    from models.outbox import Outbox, OUTBOX_COLLECTION
+
+    outbox = Outbox(db[OUTBOX_COLLECTION])
+    print("🚀 QuickCred Outbox Dispatcher")
+    print("=" * 40)
+    if args.command == 'status':
+        for status, count in outbox.stats().items():
+            print(f"{status:<10} {count}")
+        return
+    if args.command == 'requeue-dead':
+        print(f"✅ Requeued {outbox.requeue_dead()} dead events")
+        return
+
+    outbox.ensure_indexes()
+    outbox_dispatcher.configure(
+        outbox,
+        build_sinks(app.config['OUTBOX_SINKS'], app.config),
+        batch_size=app.config['OUTBOX_BATCH_SIZE'],
+        poll_ms=app.config['OUTBOX_POLL_MS'],
+        lease_seconds=app.config['OUTBOX_LEASE_SECONDS'],
+        max_attempts=app.config['OUTBOX_MAX_ATTEMPTS']
+    )
+    print(f"📣 Delivering to {', '.join(sink.name for sink in outbox_dispatcher.sinks)}; Ctrl+C to stop")
+    outbox_dispatcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        outbox_dispatcher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Startup readiness
+Importing app.py does no network I/O: the MongoDB client connects lazily,
+and the checks that need the database at startup (a ping, and creating
+indexes once) run here on a background thread instead. /healthz answers
+as soon as the process is up; /readyz reports the last check result, so
+probes never wait on the database themselves.
+
+Scripts that need the database up front wait for it explicitly:
+    from readiness import readiness
+    readiness.wait(timeout=10)
+"""
+
+import asyncio
+import threading
+import time
+
+import pymongo
+from flask import jsonify
+
+from models.indexes import ensure_indexes
+
+
+class Readiness:
+    """Periodically checks the database and remembers the result"""
+
+    def __init__(self):
+        self.db = None
+        self.interval = 5.0
+        self.timeout = 2.0
+        self.status = {'ready': False, 'checks': {'database': 'pending', 'indexes': 'pending'}}
+        self.checked_at = None
+        self._indexes_ready = False
+        self._index_warnings = []
+        self._changed = threading.Condition()
+        self._worker = None
+
+    @property
+    def ready(self):
+        return self.status['ready']
+
+    def configure(self, db, interval=5.0, timeout=2.0):
+        """Attach the database to check; called again after a fork with the new client"""
+        self.db = db
+        self.interval = interval
+        self.timeout = timeout
+
+    def check(self):
+        """Ping the database and create indexes on the first success; returns the status"""
+        checks = {'database': 'ok', 'indexes': 'ok' if self._indexes_ready else 'pending'}
+        started = time.perf_counter()
+        try:
+            with pymongo.timeout(self.timeout):
+                self.db.client.admin.command('ping')
+            checks['database_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e:
+            checks['database'] = f'error: {e}'
+        if checks['database'] == 'ok' and not self._indexes_ready:
+            try:
+                # Conflicts with existing indexes come back as warnings, not errors
+                self._index_warnings = ensure_indexes(self.db)
+                self._indexes_ready = True
+                checks['indexes'] = 'ok'
+            except Exception as e:
+                checks['indexes'] = f'error: {e}'
+        if self._index_warnings:
+            checks['index_warnings'] = self._index_warnings
+
+        status = {'ready': checks['database'] == 'ok' and checks['indexes'] == 'ok', 'checks': checks}
+        with self._changed:
+            if status['ready'] != self.status['ready']:
+                print("✅ Database ready" if status['ready'] else f"❌ Database not ready: {checks}")
+            self.status = status
+            self.checked_at = time.time()
+            self._changed.notify_all()
+        return status
+
+    def start(self):
+        """Run the checks every `interval` seconds on a daemon thread"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='readiness', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self.check()
+            time.sleep(self.interval)
+
+    def wait(self, timeout=None):
+        """Start the checks if needed and block until ready; False on timeout"""
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while not self.status['ready']:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
+
+    async def wait_async(self, timeout=None):
+        """wait() for event loops, run on the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.wait, timeout)
+
+
+readiness = Readiness()
+
+
+def healthz():
+    """Liveness: the process is up and serving; never touches the database"""
+    return jsonify({'status': 'ok'})
+
+
+def readyz():
+    """Readiness: the last database and index check, 503 until it passes"""
+    # Under the development server or `flask run` nothing else starts the checks
+    readiness.start()
+    status = dict(readiness.status, checked_at=readiness.checked_at)
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+def init_readiness(app):
+    """Register /healthz and /readyz; connect_db() configures the checks"""
+    app.add_url_rule('/healthz', 'healthz', healthz)
+    app.add_url_rule('/readyz', 'readyz', readyz)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+QuickCred Borrower Score Recompute
+Rebuilds borrower_scores from the loans collection and the archive, and
+copies each score onto the borrower's pending loans. Run after importing
+data, or whenever incremental updates may have been missed:
+    python recompute_scores.py
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.borrower_score import BorrowerScore
+
+
+def main():
+    from app import borrower_scores, loans
+
+    print("🚀 QuickCred Borrower Score Recompute")
+    print("=" * 40)
+    started = time.perf_counter()
+    count = BorrowerScore(borrower_scores, loans).recompute_all()
+    print(f"✅ Recomputed {count} borrower scores in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
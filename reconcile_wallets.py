@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+QuickCred Wallet Reconciliation
+Recomputes every user's wallet balance from the transaction ledger and
+reports users whose stored wallet_balance differs, e.g. after an
+update-wallet that set the balance without a ledger row. Users are split
+into _id ranges reconciled in parallel by a process pool, one aggregation
+per range. Discrepancies go to reconciliation_discrepancies and,
+with --report, to an NDJSON file. An interrupted run is resumed by
+running again:
+    python reconcile_wallets.py [--workers 8] [--partitions 64] [--report discrepancies.ndjson]
+    python reconcile_wallets.py --new    # start over instead of resuming
+"""
+
+import argparse
+import sys
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo import MongoClient
+
+from config import Config
+from models.archive import archive_store
+from models.reconciliation import ReconciliationRun, reconcile_partition
+
+_worker_db = None
+
+
+def init_worker(uri, db_name):
+    """Each worker process opens its own client; one must not cross a fork"""
+    global _worker_db
+    _worker_db = MongoClient(uri)[db_name]
+
+
+def reconcile_range(index, lower, upper, tolerance):
+    users, transactions = _worker_db['users'], _worker_db['transactions']
+    checked, discrepancies = reconcile_partition(users, transactions, lower, upper,
+                                                 archive_store(transactions), tolerance)
+    return index, checked, discrepancies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile wallet balances against the transaction ledger')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--partitions', type=int, default=Config.RECONCILE_PARTITIONS)
+    parser.add_argument('--tolerance', type=float, default=Config.RECONCILE_TOLERANCE)
+    parser.add_argument('--run', help='resume this run id instead of the latest unfinished one')
+    parser.add_argument('--new', action='store_true', help='start a new run even if one is unfinished')
+    parser.add_argument('--report', help='also write the discrepancies to this NDJSON (.gz) file')
+    args = parser.parse_args()
+
+    from app import MONGODB_DB, MONGODB_URI, db, users
+
+    print("🚀 QuickCred Wallet Reconciliation")
+    print("=" * 40)
+    runs = ReconciliationRun(db)
+    runs.ensure_indexes()
+    run = None if args.new else runs.get(args.run)
+    if run is None:
+        if args.run:
+            print(f"❌ No reconciliation run {args.run}")
+            sys.exit(1)
+        run = runs.start(users, args.partitions)
+        print(f"📋 Run {run['_id']}: {len(run['partitions'])} partitions")
+    else:
+        print(f"📋 Resuming run {run['_id']}: {len(run['done'])}/{len(run['partitions'])} partitions done")
+
+    started = time.perf_counter()
+    pending = runs.pending(run)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(MONGODB_URI, MONGODB_DB)) as pool:
+        futures = [pool.submit(reconcile_range, index, lower, upper, args.tolerance)
+                   for index, lower, upper in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            index, checked, discrepancies = future.result()
+            runs.record(run['_id'], index, checked, discrepancies)
+            print(f"  partition {index}: {checked} users, {len(discrepancies)} discrepancies "
+                  f"({finished}/{len(pending)})")
+
+    run = runs.finish(run['_id'])
+    print(f"✅ Checked {run['users_checked']} users in {time.perf_counter() - started:.1f}s: "
+          f"{run['discrepancies']} discrepancies")
+    if args.report:
+        count = runs.export(run['_id'], args.report)
+        print(f"📄 Wrote {count} discrepancies to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
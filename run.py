@@ -6,7 +6,10 @@ Startup script for development server
 
 import os
 import sys
-from app import app
+from app import app, init_templates
+from readiness import readiness
+from outbox_dispatcher import outbox_dispatcher
+from tasks import task_executor
 
 if __name__ == '__main__':
     # Check MongoDB connection
@@ -17,7 +20,13 @@ if __name__ == '__main__':
     print("🚀 Starting QuickCred development server...")
     print("📱 Open your browser and go to: http://localhost:5000")
     print("🛑 Press Ctrl+C to stop the server")
+    print("🏭 For production, use: python serve.py")
     
+    init_templates()
+    readiness.start()
+    if app.config['OUTBOX_DISPATCH_IN_APP']:
+        outbox_dispatcher.start()
+    task_executor.start()
     try:
         app.run(
             debug=True,
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+QuickCred - Micro-Lending Platform
+Production launcher: runs gunicorn with worker and thread counts tuned to
+the machine (see gunicorn.conf.py)
+
+Usage:
+    python serve.py                         # start the production server
+    python serve.py --dry-run               # print the chosen settings
+    python serve.py --profile --duration 60 # sustained-load report for the settings
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+
+# Fraction of request wall time spent waiting on MongoDB rather than on CPU.
+# Measure it for your deployment with `python serve.py --profile`.
+DEFAULT_IO_RATIO = 0.8
+MAX_THREADS = 32
+
+SERVER_TIMING = re.compile(r'(\w[\w-]*);dur=([\d.]+)')
+
+
+def worker_settings(cpu_count=None, io_ratio=None, worker_class=None):
+    """Derive gunicorn worker settings from CPU count and I/O ratio.
+
+    One process per core keeps every core usable despite the GIL. A worker
+    spends `io_ratio` of each request waiting on MongoDB, so it needs about
+    1 / (1 - io_ratio) requests in flight to keep its core busy; that is
+    the thread count (or, with gevent, a multiple of it as greenlets).
+    WEB_CONCURRENCY and GUNICORN_THREADS override the derived values.
+    """
+    cpu_count = cpu_count or multiprocessing.cpu_count()
+    if io_ratio is None:
+        io_ratio = float(os.getenv('QUICKCRED_IO_RATIO', DEFAULT_IO_RATIO))
+    io_ratio = min(max(io_ratio, 0.0), 0.97)
+    worker_class = worker_class or os.getenv('QUICKCRED_WORKER_CLASS', 'gthread')
+
+    in_flight = max(1, min(MAX_THREADS, math.ceil(1 / (1 - io_ratio) - 1e-9)))
+    settings = {
+        'worker_class': worker_class,
+        'workers': int(os.getenv('WEB_CONCURRENCY', max(2, cpu_count))),
+        'threads': int(os.getenv('GUNICORN_THREADS', in_flight)),
+    }
+    if worker_class == 'gevent':
+        # Greenlets are cheap; MongoDB's pool becomes the limit, not the workers
+        settings['threads'] = 1
+        settings['worker_connections'] = min(1000, in_flight * 25)
+    return settings
+
+
+def gunicorn_command(extra=()):
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [sys.executable, '-m', 'gunicorn', '-c', os.path.join(here, 'gunicorn.conf.py'), *extra, 'app:app']
+
+
+# ---------------------------------------------------------------------------
+# --profile
+# ---------------------------------------------------------------------------
+
+def profile(args):
+    """Seed the benchmark database, start the tuned server and hold load on it"""
+    import subprocess
+    from pymongo import MongoClient
+    from benchmark import (DEFAULT_DB, SCENARIOS, HttpDriver, free_port, login_body,
+                           percentile, seed_database)
+
+    settings = worker_settings()
+    print(f"⚙️  Profiling {settings}")
+
+    mongo = MongoClient(args.uri, serverSelectionTimeoutMS=5000)
+    seed_database(mongo[DEFAULT_DB], args.size, reserve=0)
+
+    port = free_port()
+    env = dict(os.environ, MONGODB_URI=args.uri, MONGODB_DB=DEFAULT_DB,
+               BIND=f'127.0.0.1:{port}', REQUEST_LOG='false')
+    server = subprocess.Popen(gunicorn_command(), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                HttpDriver(base_url).request('anon', 'GET', '/dashboard/platform-stats')
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    print("❌ Server did not start")
+                    sys.exit(1)
+                time.sleep(0.2)
+
+        # Read-only mix; writes would drain the seeded data during a long run
+        reads = [s for s in SCENARIOS if s[2] == 'GET']
+        samples = []
+        lock = threading.Lock()
+        stop = time.time() + args.duration
+        started = time.time()
+
+        def client():
+            driver = HttpDriver(base_url)
+            driver.request('borrower', 'POST', '/auth/login', login_body('borrower'))
+            driver.request('lender', 'POST', '/auth/login', login_body('lender'))
+            i = 0
+            while time.time() < stop:
+                name, role, method, path, body = reads[i % len(reads)]
+                i += 1
+                t0 = time.perf_counter()
+                status = driver.request(role, method, path)
+                elapsed = (time.perf_counter() - t0) * 1000
+                timing = dict((k, float(v)) for k, v in SERVER_TIMING.findall(
+                    driver.last_headers.get('Server-Timing', '')))
+                with lock:
+                    samples.append((time.time() - started, elapsed, status, timing))
+
+        threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    print_profile(samples, args, settings)
+
+
+def print_profile(samples, args, settings):
+    if not samples:
+        print("❌ No requests completed")
+        return
+    latencies = [s[1] for s in samples]
+    errors = sum(1 for s in samples if s[2] >= 400)
+    app_ms = sum(s[3].get('app', 0) for s in samples)
+    cpu_ms = sum(s[3].get('cpu', 0) for s in samples)
+    db_ms = sum(s[3].get('db', 0) for s in samples)
+
+    print("\n📊 Sustained load report")
+    print(f"  requests     {len(samples)} over {args.duration}s at concurrency {args.concurrency}")
+    print(f"  throughput   {len(samples) / args.duration:.1f} req/s")
+    print(f"  latency      p50 {percentile(latencies, 50):.1f}ms  p95 {percentile(latencies, 95):.1f}ms  "
+          f"p99 {percentile(latencies, 99):.1f}ms")
+    print(f"  errors       {errors} ({100.0 * errors / len(samples):.2f}%)")
+
+    # Throughput per window shows whether the settings hold up or degrade over time
+    window = max(1, args.duration // 6)
+    print("  per window   " + '  '.join(
+        f"{sum(1 for s in samples if w <= s[0] < w + window) / window:.0f}"
+        for w in range(0, args.duration, window)) + f" req/s (every {window}s)")
+
+    if app_ms:
+        measured = 1 - cpu_ms / app_ms
+        print(f"\n  server time  {app_ms / len(samples):.1f}ms/request, "
+              f"{cpu_ms / len(samples):.1f}ms CPU, {db_ms / len(samples):.1f}ms MongoDB")
+        print(f"  I/O ratio    {measured:.2f} measured vs {float(os.getenv('QUICKCRED_IO_RATIO', DEFAULT_IO_RATIO)):.2f} configured")
+        recommended = worker_settings(io_ratio=measured, worker_class=settings['worker_class'])
+        if recommended != settings:
+            print(f"  💡 Recommended: QUICKCRED_IO_RATIO={measured:.2f} -> {recommended}")
+        else:
+            print("  ✅ Current settings match the measured load")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run QuickCred under gunicorn with tuned settings')
+    parser.add_argument('--dry-run', action='store_true', help='print the settings and exit')
+    parser.add_argument('--profile', action='store_true', help='run a sustained-load report')
+    parser.add_argument('--uri', default=os.getenv('BENCH_MONGODB_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--size', default='small', help='benchmark dataset size for --profile')
+    parser.add_argument('--duration', type=int, default=60, help='seconds of load for --profile')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent clients for --profile')
+    args = parser.parse_args()
+
+    if args.profile:
+        profile(args)
+        return
+
+    settings = worker_settings()
+    print(f"🚀 Starting QuickCred: {settings}")
+    if args.dry_run:
+        return
+    command = gunicorn_command()
+    os.execv(command[0], command)
+
+
+if __name__ == '__main__':
+    main()
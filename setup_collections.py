@@ -15,20 +15,26 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 def setup_collections():
     """Create required collections in MongoDB"""
     try:
-        from app import app, mongo
+        from app import app, client, db
+        from config import Config
+        from models.indexes import ensure_indexes
+        from models.loan import Loan
+        from models.sharding import shard_collections
 
         # Create app context
         app_context = app.app_context()
         app_context.push()
 
         try:
-            db = mongo.db
-
             print("🔗 Testing MongoDB connection...")
             # Test connection
             db.command('ping')
             print("✅ MongoDB connection successful!")
 
+            if Config.MONGO_SHARDED:
+                shard_collections(client, db.name)
+                print("✅ Collections sharded by their shard keys")
+
             print("📁 Creating required collections...")
 
             # Create users collection
@@ -91,13 +97,20 @@ def setup_collections():
             else:
                 print("✅ 'transactions' collection already exists")
 
+            ensure_indexes(db)
+            print("✅ Indexes ready")
+
+            if Config.MONGO_SHARDED:
+                count = Loan(db.loans).rebuild_pending_index()
+                print(f"✅ Pending loan index holds {count} loans")
+
             print("\n🎉 All collections created successfully!")
             print("📊 Collections in your database:")
             collections = db.list_collection_names()
             for collection in collections:
                 count = db[collection].count_documents({})
                 print(f"  - {collection}: {count} documents")
-            mongo.cx.close()  # close the client cleanly
+            client.close()  # close the client cleanly
 
             return True
 
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+QuickCred Slow Query Log
+Captures find/aggregate commands on the model collections that exceed a
+threshold, together with their explain('executionStats') output, into a
+capped `slow_queries` collection.
+
+Report, grouped by query shape:
+    python slow_query_log.py [--hours 24] [--limit 20]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import has_request_context, request
+from pymongo import monitoring
+
+WATCHED_COMMANDS = ('find', 'aggregate')
+WATCHED_COLLECTIONS = ('users', 'loans', 'transactions')
+COLLECTION_NAME = 'slow_queries'
+
+# Fields pymongo adds to every command that are not part of the query itself
+DRIVER_FIELDS = ('$db', 'lsid', '$clusterTime', '$readPreference', 'txnNumber',
+                 'autocommit', 'startTransaction', 'readConcern', 'writeConcern')
+
+
+def redact(value):
+    """Replace every literal in a filter with '?', keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in/$nin lists collapse to one placeholder so their length doesn't split shapes
+        if value and all(not isinstance(item, (dict, list, tuple)) for item in value):
+            return ['?']
+        return [redact(item) for item in value]
+    return '?'
+
+
+def query_shape(command_name, command):
+    """Return the redacted, value-free shape of a find or aggregate command"""
+    if command_name == 'find':
+        return {
+            'filter': redact(command.get('filter', {})),
+            'sort': dict(command.get('sort') or {}),
+            'projection': dict(command.get('projection') or {}),
+        }
+    pipeline = []
+    for stage in command.get('pipeline', []):
+        name = next(iter(stage))
+        pipeline.append({name: redact(stage[name])} if name in ('$match', '$limit', '$skip') else dict(stage))
+    return {'pipeline': pipeline}
+
+
+def shape_hash(collection, command_name, shape):
+    raw = json.dumps([collection, command_name, shape], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def find_execution_stats(explain):
+    """Locate executionStats in find or aggregate explain output"""
+    if isinstance(explain, dict):
+        if 'executionStats' in explain:
+            return explain['executionStats']
+        for value in explain.values():
+            found = find_execution_stats(value)
+            if found:
+                return found
+    elif isinstance(explain, list):
+        for value in explain:
+            found = find_execution_stats(value)
+            if found:
+                return found
+    return None
+
+
+def winning_plan(stats):
+    """Summarize the execution stage tree as e.g. 'FETCH > IXSCAN(status_1)'"""
+    stages = []
+    node = stats.get('executionStages') if stats else None
+    while node:
+        stage = node.get('stage', '?')
+        if node.get('indexName'):
+            stage += f"({node['indexName']})"
+        stages.append(stage)
+        node = node.get('inputStage')
+    return ' > '.join(stages)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Queues slow commands for explain capture on a background thread"""
+
+    def __init__(self):
+        self.db = None
+        self.threshold_ms = 100.0
+        self.explain_interval = 60.0
+        self.capped_bytes = 16 * 1024 * 1024
+        self._pending = {}
+        self._queue = queue.Queue(maxsize=100)
+        self._last_explained = {}
+        self._worker = None
+        self._collection_ready = False
+
+    def configure(self, db, threshold_ms=100.0, explain_interval=60.0, capped_bytes=16 * 1024 * 1024):
+        """Attach the database the log is written to; disabled until called"""
+        self.db = db
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self.capped_bytes = capped_bytes
+
+    def started(self, event):
+        if self.db is None or event.command_name not in WATCHED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if collection not in WATCHED_COLLECTIONS:
+            return
+        endpoint = request.endpoint if has_request_context() else None
+        self._pending[event.request_id] = (collection, dict(event.command), endpoint)
+
+    def succeeded(self, event):
+        pending = self._pending.pop(event.request_id, None)
+        if pending is None or event.duration_micros < self.threshold_ms * 1000:
+            return
+        collection, command, endpoint = pending
+        try:
+            self._queue.put_nowait((collection, event.command_name, command, endpoint,
+                                    event.duration_micros / 1000.0, datetime.utcnow()))
+        except queue.Full:
+            return
+        self._ensure_worker()
+
+    def failed(self, event):
+        self._pending.pop(event.request_id, None)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._capture(*item)
+            except Exception as e:
+                print(f"⚠️  Slow query capture failed: {e}")
+
+    def _ensure_collection(self):
+        if self._collection_ready:
+            return
+        if COLLECTION_NAME not in self.db.list_collection_names():
+            self.db.create_collection(COLLECTION_NAME, capped=True, size=self.capped_bytes)
+        self._collection_ready = True
+
+    def _capture(self, collection, command_name, command, endpoint, duration_ms, timestamp):
+        shape = query_shape(command_name, command)
+        key = shape_hash(collection, command_name, shape)
+        record = {
+            'shape_hash': key,
+            'collection': collection,
+            'operation': command_name,
+            'shape': json.dumps(shape, sort_keys=True, default=str),
+            'endpoint': endpoint,
+            'duration_ms': round(duration_ms, 3),
+            'timestamp': timestamp,
+        }
+
+        # Explain re-runs the query, so do it at most once per shape per interval
+        now = time.monotonic()
+        if now - self._last_explained.get(key, float('-inf')) >= self.explain_interval:
+            self._last_explained[key] = now
+            query = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+            explain = self.db.command({'explain': query, 'verbosity': 'executionStats'})
+            stats = find_execution_stats(explain) or {}
+            record.update({
+                'docs_examined': stats.get('totalDocsExamined'),
+                'keys_examined': stats.get('totalKeysExamined'),
+                'returned': stats.get('nReturned'),
+                'execution_ms': stats.get('executionTimeMillis'),
+                'plan': winning_plan(stats),
+            })
+
+        self._ensure_collection()
+        self.db[COLLECTION_NAME].insert_one(record)
+
+
+slow_query_listener = SlowQueryListener()
+
+
+def print_report(db, hours, limit):
+    """Print slow queries grouped by shape, worst total time first"""
+    pipeline = [
+        {'$match': {'timestamp': {'$gte': datetime.utcnow() - timedelta(hours=hours)}}},
+        {'$group': {
+            '_id': '$shape_hash',
+            'collection': {'$first': '$collection'},
+            'operation': {'$first': '$operation'},
+            'shape': {'$first': '$shape'},
+            'endpoints': {'$addToSet': '$endpoint'},
+            'count': {'$sum': 1},
+            'total_ms': {'$sum': '$duration_ms'},
+            'max_ms': {'$max': '$duration_ms'},
+            'docs_examined': {'$max': '$docs_examined'},
+            'returned': {'$max': '$returned'},
+            'plan': {'$max': '$plan'},
+        }},
+        {'$sort': {'total_ms': -1}},
+        {'$limit': limit},
+    ]
+    groups = list(db[COLLECTION_NAME].aggregate(pipeline))
+    if not groups:
+        print(f"✅ No slow queries in the last {hours}h")
+        return
+
+    for group in groups:
+        print(f"\n🐢 {group['collection']}.{group['operation']}  [{group['_id']}]")
+        print(f"   {group['count']} calls, {group['total_ms']:.1f}ms total, {group['max_ms']:.1f}ms max")
+        if group.get('docs_examined') is not None:
+            print(f"   examined {group['docs_examined']} docs for {group['returned']} returned")
+        if group.get('plan'):
+            print(f"   plan: {group['plan']}")
+        print(f"   endpoints: {', '.join(e for e in group['endpoints'] if e) or '-'}")
+        print(f"   shape: {group['shape']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report slow queries grouped by shape')
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    # Add the current directory to Python path
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import db
+
+    print("🚀 QuickCred Slow Query Report")
+    print("=" * 40)
+    print_report(db, args.hours, args.limit)
+
+
+if __name__ == '__main__':
+    main()
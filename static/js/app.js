@@ -19,13 +19,34 @@ function hideRegister() {
 }
 
 function updateAuthUI() {
-    loadUserProfile();
+    const bootstrap = getBootstrap();
+    if (bootstrap) {
+        applyUserProfile(bootstrap.user);
+    } else {
+        loadUserProfile();
+    }
 }
 
 let authCheckInProgress = false;
 
+// Initial page data rendered into the page by the server (dashboard pages)
+function getBootstrap() {
+    if (window.pageBootstrap === undefined) {
+        const el = document.getElementById('page-bootstrap');
+        window.pageBootstrap = el ? JSON.parse(el.textContent) : null;
+    }
+    return window.pageBootstrap;
+}
+
 // Initialize app with auth check
 document.addEventListener('DOMContentLoaded', function() {
+    // The embedded payload already carries the profile
+    const bootstrap = getBootstrap();
+    if (bootstrap) {
+        applyUserProfile(bootstrap.user);
+        return;
+    }
+
     // Only check auth in specific situations
     const shouldCheckAuth = 
         window.location.pathname !== '/' || // Not on index page
@@ -47,47 +68,7 @@ async function loadUserProfile() {
         const data = await response.json();
 
         if (response.ok) {
-            currentUser = data.user;
-            localStorage.setItem('hasSession', 'true');
-            
-            // Update UI elements if they exist
-            const authButtons = document.getElementById('auth-buttons');
-            const authButtonsMobile = document.getElementById('auth-buttons-mobile');
-            const userMenu = document.getElementById('user-menu');
-            const userMenuMobile = document.getElementById('user-menu-mobile');
-            const userName = document.getElementById('user-name');
-            const userNameMobile = document.getElementById('user-name-mobile');
-            
-            // Hide auth buttons and show user menu
-            [authButtons, authButtonsMobile].forEach(el => {
-                if (el) el.classList.add('hidden');
-            });
-            
-            // Show user menus with appropriate display styles
-            if (userMenu) {
-                userMenu.classList.remove('hidden');
-                userMenu.style.display = 'flex';
-            }
-            if (userMenuMobile) {
-                userMenuMobile.classList.remove('hidden');
-            }
-            
-            // Update usernames
-            [userName, userNameMobile].forEach(el => {
-                if (el) el.textContent = data.user.name;
-            });
-
-            // Handle different pages
-            if (window.location.pathname === '/dashboard') {
-                initializeDashboardView(data.user.role);
-                // Hide auth buttons in dashboard
-                [authButtons, authButtonsMobile].forEach(el => {
-                    if (el) el.style.display = 'none';
-                });
-            }
-            else if (window.location.pathname === '/' && !sessionStorage.getItem('preventRedirect')) {
-                window.location.href = '/dashboard';
-            }
+            applyUserProfile(data.user);
         } else {
             handleAuthFailure(data);
         }
@@ -99,10 +80,59 @@ async function loadUserProfile() {
     }
 }
 
+function applyUserProfile(user) {
+    currentUser = user;
+    localStorage.setItem('hasSession', 'true');
+    setApiCacheUser(user.id);
+    
+    // Update UI elements if they exist
+    const authButtons = document.getElementById('auth-buttons');
+    const authButtonsMobile = document.getElementById('auth-buttons-mobile');
+    const userMenu = document.getElementById('user-menu');
+    const userMenuMobile = document.getElementById('user-menu-mobile');
+    const userName = document.getElementById('user-name');
+    const userNameMobile = document.getElementById('user-name-mobile');
+    
+    // Hide auth buttons and show user menu
+    [authButtons, authButtonsMobile].forEach(el => {
+        if (el) el.classList.add('hidden');
+    });
+    
+    // Show user menus with appropriate display styles
+    if (userMenu) {
+        userMenu.classList.remove('hidden');
+        userMenu.style.display = 'flex';
+    }
+    if (userMenuMobile) {
+        userMenuMobile.classList.remove('hidden');
+    }
+    
+    // Update usernames
+    [userName, userNameMobile].forEach(el => {
+        if (el) el.textContent = user.name;
+    });
+
+    // Handle different pages
+    const dashboardPaths = ['/dashboard', '/borrower', '/lender'];
+    if (dashboardPaths.includes(window.location.pathname)) {
+        // /borrower and /lender pin their view; /dashboard restores the last one
+        const pinnedView = window.location.pathname === '/dashboard' ? null : window.location.pathname.slice(1);
+        initializeDashboardView(user.role, pinnedView);
+        // Hide auth buttons in dashboard
+        [authButtons, authButtonsMobile].forEach(el => {
+            if (el) el.style.display = 'none';
+        });
+    }
+    else if (window.location.pathname === '/' && !sessionStorage.getItem('preventRedirect')) {
+        window.location.href = '/dashboard';
+    }
+}
+
 function handleAuthFailure(data = {}) {
     // Clear auth state
     currentUser = null;
     localStorage.removeItem('hasSession');
+    clearApiCache();
     sessionStorage.removeItem('justLoggedIn');
     
     // Update UI if elements exist
@@ -123,8 +153,8 @@ function handleAuthFailure(data = {}) {
 }
 
 // Dashboard view management
-function initializeDashboardView(userRole) {
-    const lastView = localStorage.getItem('dashboardView') || userRole;
+function initializeDashboardView(userRole, pinnedView = null) {
+    const lastView = pinnedView || localStorage.getItem('dashboardView') || userRole;
     
     // Check if user has dual role access (currently all users can switch views)
     const borrowerBtn = document.getElementById('borrower-btn');
@@ -262,6 +292,7 @@ async function logout() {
             currentUser = null;
             localStorage.removeItem('hasSession');
             sessionStorage.removeItem('justLoggedIn');
+            clearApiCache();
             
             // Show success message using existing notification system if available
             if (typeof showNotification === 'function') {
@@ -343,16 +374,32 @@ function formatDate(dateString) {
 
 // API helper function
 async function apiCall(endpoint, options = {}) {
-    const defaultOptions = {
-        headers: {
-            'Content-Type': 'application/json'
-        }
+    const headers = {
+        'Content-Type': 'application/json',
+        ...(options.headers || {})
     };
 
+    // State-changing calls carry an Idempotency-Key so a retry after a timeout
+    // is answered with the original result instead of being applied twice
+    const idempotency = isIdempotentCall(endpoint, options) ? idempotencyKeyFor(endpoint, options.body) : null;
+    if (idempotency) {
+        headers['Idempotency-Key'] = idempotency.key;
+    }
+
     // Use fetchWithTimeout if available (added by dashboard UI); fallback to native fetch
     const fetchFn = window.fetchWithTimeout || fetch;
 
-    const response = await fetchFn(endpoint, { ...defaultOptions, ...options }, 8000);
+    const response = await fetchFn(endpoint, { ...options, headers }, 8000);
+
+    // The action has a definite outcome; a later identical action gets a new key
+    if (idempotency && response && response.status !== 409 && response.status < 500) {
+        sessionStorage.removeItem(idempotency.storageKey);
+    }
+
+    // Balances and loan lists changed; cached dashboard data is now wrong
+    if (idempotency && response && response.ok) {
+        clearApiCache();
+    }
 
     if (response && response.status === 401) {
         // Session expired or invalid
@@ -363,6 +410,112 @@ async function apiCall(endpoint, options = {}) {
     return response;
 }
 
+function isIdempotentCall(endpoint, options) {
+    return (options.method || 'GET').toUpperCase() === 'POST' &&
+        (endpoint.startsWith('/loan/') || endpoint.startsWith('/transactions/'));
+}
+
+// Reuse the key of an unfinished attempt at the same call, so retries match
+function idempotencyKeyFor(endpoint, body) {
+    const storageKey = `idempotency:${endpoint}:${body || ''}`;
+    let key = sessionStorage.getItem(storageKey);
+    if (!key) {
+        key = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        sessionStorage.setItem(storageKey, key);
+    }
+    return { key, storageKey };
+}
+
+// Stale-while-revalidate cache for GET data, kept in localStorage per user
+// and endpoint. Cached data renders immediately; the server is then asked
+// with If-None-Match and only sends a new body when the data changed.
+const API_CACHE_PREFIX = 'apiCache:';
+const API_CACHE_MAX_AGE_MS = 24 * 60 * 60 * 1000;
+
+function apiCacheKey(endpoint) {
+    const userId = (currentUser && currentUser.id) || localStorage.getItem('apiCacheUser');
+    return userId ? `${API_CACHE_PREFIX}${userId}:${endpoint}` : null;
+}
+
+function readApiCache(key) {
+    try {
+        const entry = key && JSON.parse(localStorage.getItem(key));
+        if (entry && Date.now() - entry.savedAt < API_CACHE_MAX_AGE_MS) {
+            return entry;
+        }
+    } catch (error) {
+        // Corrupt entry; treat as a miss
+    }
+    return null;
+}
+
+function writeApiCache(key, etag, data) {
+    if (!key) return;
+    try {
+        localStorage.setItem(key, JSON.stringify({ etag, data, savedAt: Date.now() }));
+    } catch (error) {
+        // Quota exceeded: drop the cache rather than keep a partial one
+        clearApiCache();
+    }
+}
+
+function clearApiCache() {
+    Object.keys(localStorage)
+        .filter(key => key.startsWith(API_CACHE_PREFIX))
+        .forEach(key => localStorage.removeItem(key));
+}
+
+// Remember whose data is cached; another user's entries are discarded
+function setApiCacheUser(userId) {
+    if (localStorage.getItem('apiCacheUser') !== userId) {
+        clearApiCache();
+        localStorage.setItem('apiCacheUser', userId);
+    }
+}
+
+// GET `endpoint`, calling render(data) with the cached copy first (if any)
+// and again only if the server has newer data. Resolves to the latest data.
+async function cachedGet(endpoint, render, timeout = 8000) {
+    const key = apiCacheKey(endpoint);
+    const cached = readApiCache(key);
+    if (cached) {
+        render(cached.data);
+    }
+
+    const headers = cached && cached.etag ? { 'If-None-Match': cached.etag } : {};
+    let response;
+    try {
+        response = await fetchWithTimeout(endpoint, { headers, cache: 'no-store' }, timeout);
+    } catch (error) {
+        if (cached) {
+            console.warn(`Revalidating ${endpoint} failed; showing cached data`, error);
+            return cached.data;
+        }
+        throw error;
+    }
+
+    if (response.status === 304 && cached) {
+        writeApiCache(key, cached.etag, cached.data);
+        return cached.data;
+    }
+    if (response.status === 503 && cached) {
+        // Shedding load: keep the cached copy rather than retrying right away
+        console.warn(`${endpoint} is busy (Retry-After ${response.headers.get('Retry-After')}s); showing cached data`);
+        return cached.data;
+    }
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(`API Error: ${errorData.error || 'Unknown error'}`);
+    }
+
+    const data = await response.json();
+    writeApiCache(key, response.headers.get('ETag'), data);
+    render(data);
+    return data;
+}
+
 // Small utility: fetch with a timeout (ms)
 function fetchWithTimeout(url, options = {}, timeout = 8000) {
     return Promise.race([
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+QuickCred Background Tasks
+Runs work a request does not need to wait for (borrower score updates,
+analytics refreshes) on a bounded pool of worker threads after the
+response has gone out. Tasks are registered by name with @task and queued
+by priority; CPU-bound ones can run in a process pool instead. When the
+queue is full, or the executor is not enabled, a task runs inline.
+
+Durable tasks are stored in the background_tasks collection before they
+are queued, so work a worker did not get to before a restart is picked up
+by another one. Everything else is drained on shutdown for up to
+TASK_DRAIN_SECONDS and dropped after that.
+    python tasks.py status
+    python tasks.py requeue-failed
+"""
+
+import argparse
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import after_this_request, has_request_context
+from pymongo.errors import PyMongoError
+
+from metrics import TASK_DURATION_SECONDS, TASK_QUEUE_DEPTH, TASK_RUNS, TASK_WAIT_SECONDS
+
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = {HIGH: 'high', NORMAL: 'normal', LOW: 'low'}
+
+
+class Task:
+    """A registered task and its defaults"""
+
+    def __init__(self, name, fn, priority=NORMAL, durable=False, process=False):
+        self.name = name
+        self.fn = fn
+        self.priority = priority
+        self.durable = durable
+        self.process = process
+
+
+# Tasks by name; durable tasks are stored by name, so the name must not change
+TASKS = {}
+
+
+def task(name, priority=NORMAL, durable=False, process=False):
+    """Register a function as background task `name`.
+
+    Arguments of durable tasks are stored in MongoDB and must be BSON
+    values; process tasks must be module-level functions whose arguments
+    pickle.
+    """
+    def register(fn):
+        TASKS[name] = Task(name, fn, priority, durable, process)
+        return fn
+    return register
+
+
+class TaskExecutor:
+    """Priority queue of tasks served by worker threads, with an optional process pool and durable store"""
+
+    def __init__(self):
+        self.threads = 2
+        self.processes = 0
+        self.store = None
+        self.lease_seconds = 60
+        self.max_attempts = 5
+        self.recover_interval = 30.0
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._configured = False
+        self._queue = queue.PriorityQueue(maxsize=1000)
+        self._sequence = itertools.count()
+        self._workers = []
+        self._recoverer = None
+        self._process_pool = None
+        self._queued_ids = set()
+        self._stopping = False
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._registered = False
+
+    @property
+    def enabled(self):
+        return self._configured
+
+    def configure(self, threads=2, processes=0, max_queue=1000, store=None, lease_seconds=60, max_attempts=5,
+                  recover_interval=30.0):
+        """Set the pool sizes and the durable store (None for none); tasks run inline until called"""
+        self.threads = threads
+        self.processes = processes
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.recover_interval = recover_interval
+        # configure() runs again in each worker after fork
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue.maxsize = max_queue
+        self._stopping = False
+        self._configured = True
+        if not self._registered:
+            atexit.register(self.shutdown)
+            self._registered = True
+
+    def submit(self, name, *args, priority=None, **kwargs):
+        """Queue task `name`; it runs inline when the executor is off, stopping or full"""
+        spec = TASKS[name]
+        priority = spec.priority if priority is None else priority
+        task_id = None
+        if spec.durable and self.store is not None and not self._stopping:
+            task_id = self.store.add(name, args, kwargs, priority)
+        self._enqueue(spec, args, kwargs, priority, task_id)
+
+    def defer(self, name, *args, priority=None, **kwargs):
+        """Submit task `name` once the current response has been sent.
+
+        A durable task is stored straight away, so it survives the worker
+        dying before the response is closed; outside a request this is
+        submit().
+        """
+        if not has_request_context():
+            self.submit(name, *args, priority=priority, **kwargs)
+            return
+        spec = TASKS[name]
+        priority = spec.priority if priority is None else priority
+        task_id = None
+        if spec.durable and self.store is not None and not self._stopping:
+            task_id = self.store.add(name, args, kwargs, priority)
+
+        @after_this_request
+        def enqueue_on_close(response):
+            response.call_on_close(lambda: self._enqueue(spec, args, kwargs, priority, task_id))
+            return response
+
+    def _enqueue(self, spec, args, kwargs, priority, task_id=None):
+        job = {'task': spec, 'args': args, 'kwargs': kwargs, 'priority': priority, 'task_id': task_id,
+               'queued_at': time.monotonic()}
+        if not self.enabled or self._stopping:
+            self._execute(job)
+            return
+        self._ensure_workers()
+        with self._lock:
+            if task_id is not None:
+                if task_id in self._queued_ids:
+                    return
+                self._queued_ids.add(task_id)
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), job))
+            TASK_QUEUE_DEPTH.labels(PRIORITY_NAMES.get(priority, str(priority))).inc()
+        except queue.Full:
+            TASK_RUNS.labels(task=spec.name, outcome='inline').inc()
+            self._execute(job)
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.threads:
+                worker = threading.Thread(target=self._run, name=f'task-worker-{len(self._workers)}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            if self.processes and self._process_pool is None:
+                # spawn rather than fork: the parent has live threads and a MongoClient
+                self._process_pool = ProcessPoolExecutor(self.processes,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+
+    def _run(self):
+        while True:
+            priority, _, job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                TASK_QUEUE_DEPTH.labels(PRIORITY_NAMES.get(priority, str(priority))).dec()
+                self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, job):
+        spec = job['task']
+        TASK_WAIT_SECONDS.labels(PRIORITY_NAMES.get(job['priority'], str(job['priority']))).observe(
+            time.monotonic() - job['queued_at'])
+        stored = None
+        if job['task_id'] is not None:
+            with self._lock:
+                self._queued_ids.discard(job['task_id'])
+            try:
+                stored = self.store.claim(job['task_id'], self.owner, self.lease_seconds)
+            except PyMongoError as e:
+                print(f"⚠️  Could not claim task {spec.name}; it will be recovered later: {e}")
+                return
+            if stored is None:
+                # Done already, or another worker has it
+                TASK_RUNS.labels(task=spec.name, outcome='skipped').inc()
+                return
+
+        started = time.perf_counter()
+        try:
+            if spec.process and self._process_pool is not None:
+                self._process_pool.submit(spec.fn, *job['args'], **job['kwargs']).result()
+            else:
+                spec.fn(*job['args'], **job['kwargs'])
+        except Exception as e:
+            TASK_RUNS.labels(task=spec.name, outcome='failed').inc()
+            print(f"⚠️  Background task {spec.name} failed: {e}")
+            if stored is not None:
+                self._settle(self.store.fail, stored, self.owner, e, self.max_attempts)
+            return
+        TASK_DURATION_SECONDS.labels(task=spec.name).observe(time.perf_counter() - started)
+        TASK_RUNS.labels(task=spec.name, outcome='done').inc()
+        if stored is not None:
+            self._settle(self.store.complete, stored['_id'], self.owner)
+
+    def _settle(self, method, *args):
+        # A task left running is recovered when its lease runs out
+        try:
+            method(*args)
+        except PyMongoError as e:
+            print(f"⚠️  Could not record task outcome: {e}")
+
+    def start(self):
+        """Start the worker threads, and the recovery of stored tasks; a no-op until configured"""
+        if not self.enabled:
+            return
+        self._ensure_workers()
+        if self.store is None:
+            return
+        with self._lock:
+            if self._recoverer is not None and self._recoverer.is_alive():
+                return
+            self._stop.clear()
+            self._recoverer = threading.Thread(target=self._recover_loop, name='task-recovery', daemon=True)
+            self._recoverer.start()
+
+    def recover(self):
+        """Queue stored tasks no worker is running; returns how many"""
+        count = 0
+        for stored in self.store.due(grace_seconds=self.lease_seconds):
+            spec = TASKS.get(stored['name'])
+            if spec is None:
+                continue
+            self._enqueue(spec, tuple(stored['args']), stored['kwargs'], stored['priority'], stored['_id'])
+            count += 1
+        return count
+
+    def _recover_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.recover()
+            except PyMongoError as e:
+                print(f"⚠️  Task recovery failed: {e}")
+            self._stop.wait(self.recover_interval)
+
+    def flush(self, timeout=10.0):
+        """Wait until every queued task has run"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            if not any(worker.is_alive() for worker in self._workers):
+                break
+            time.sleep(0.01)
+
+    def shutdown(self, timeout=10.0):
+        """Drain the queue for up to `timeout`, then stop the workers.
+
+        New tasks run inline from here on. Tasks still queued afterwards
+        are dropped; durable ones stay stored and another worker recovers
+        them.
+        """
+        if not self.enabled or self._stopping:
+            return
+        self._stopping = True
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        self.flush(timeout)
+
+        dropped = 0
+        while True:
+            try:
+                priority, _, job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            TASK_QUEUE_DEPTH.labels(PRIORITY_NAMES.get(priority, str(priority))).dec()
+            if job['task_id'] is None:
+                TASK_RUNS.labels(task=job['task'].name, outcome='dropped').inc()
+                dropped += 1
+        if dropped:
+            print(f"⚠️  Dropped {dropped} queued background tasks on shutdown")
+
+        for worker in self._workers:
+            self._queue.put((HIGH, next(self._sequence), None))
+        for worker in self._workers:
+            worker.join(max(deadline - time.monotonic(), 0.1))
+        self._workers = []
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def stats(self):
+        """Queue depth and worker counts, with stored task counts when durable"""
+        stats = {'queued': self._queue.qsize(), 'threads': len([w for w in self._workers if w.is_alive()]),
+                 'processes': self.processes if self._process_pool is not None else 0}
+        if self.store is not None:
+            stats['stored'] = self.store.stats()
+        return stats
+
+
+task_executor = TaskExecutor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect stored background tasks')
+    parser.add_argument('command', choices=['status', 'requeue-failed'])
+    args = parser.parse_args()
+
+    # Add the current directory to Python path
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import db
+    from models.task_store import TaskStore, TASK_COLLECTION
+
+    store = TaskStore(db[TASK_COLLECTION])
+    print("🚀 QuickCred Background Tasks")
+    print("=" * 40)
+    if args.command == 'status':
+        for status, count in store.stats().items():
+            print(f"{status:<10} {count}")
+        return
+    print(f"✅ Requeued {store.requeue_failed()} failed tasks")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Interest Accrual Test
+Accrues funded loans in small chunks and checks the figures against
+Loan.calculate_interest, the run summary, that a rerun drops loans repaid
+in between, that a run older than the latest is refused, and that
+dashboards show the stored accruals; no MongoDB needed
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from fake_mongo import FakeDB
+from models.accrual import Accrual, accrue
+from models.loan import Loan
+from controllers.dashboard_controller import build_borrower_data, build_lender_data
+
+
+def funded_loan(db, amount, term_months, funded_days_ago, as_of, status='funded'):
+    loan_id = ObjectId()
+    db['loans'].insert_one({
+        '_id': loan_id, 'borrower_id': ObjectId(), 'lender_id': ObjectId(), 'status': status,
+        'amount': amount, 'term_months': term_months, 'interest_rate': 0.047, 'lender_return_rate': 0.02,
+        'funded_at': as_of - timedelta(days=funded_days_ago),
+    })
+    return loan_id
+
+
+def test_accrue_matches_calculate_interest():
+    loan_model = Loan(None, pending_index=None, archive=None)
+    interest, lender_return, margin = accrue([1000.0, 2500.0], [0.047, 0.047], [0.02, 0.02], [45, 9999], [3, 6])
+    assert interest == [round(loan_model.calculate_interest(1000.0, 0.047, 1.5), 2),
+                        round(loan_model.calculate_interest(2500.0, 0.047, 6), 2)]
+    assert lender_return == [30.0, 300.0]
+    assert margin == [round(interest[0] - 30.0, 2), round(interest[1] - 300.0, 2)]
+
+
+def test_job_accrues_funded_loans_in_chunks():
+    db = FakeDB()
+    as_of = datetime(2024, 3, 1)
+    ids = [funded_loan(db, 1000.0, 3, days, as_of) for days in (15, 45, 400)]
+    funded_loan(db, 5000.0, 3, 30, as_of, status='repaid')
+    db['loans'].insert_one({'status': 'pending', 'amount': 700.0})
+
+    model = Accrual(db['loan_accruals'])
+    summary = model.accrue_funded_loans(db['loans'], as_of, chunk_size=2)
+    assert db['loan_accruals'].bulk_writes == 2
+    accruals = {doc['_id']: doc for doc in db['loan_accruals'].docs}
+    assert set(accruals) == set(ids)
+    assert [accruals[i]['accrued_interest'] for i in ids] == [23.5, 70.5, 141.0]
+    assert [accruals[i]['accrued_lender_return'] for i in ids] == [10.0, 30.0, 60.0]
+    assert summary['loans'] == 3
+    assert summary['principal'] == 3000.0
+    assert summary['accrued_interest'] == 235.0
+    assert summary['accrued_platform_margin'] == 135.0
+    assert model.get_latest_summary()['_id'] == as_of
+
+
+def test_rerun_drops_loans_no_longer_funded():
+    db = FakeDB()
+    as_of = datetime(2024, 3, 1)
+    kept, repaid = funded_loan(db, 1000.0, 3, 30, as_of), funded_loan(db, 1000.0, 3, 30, as_of)
+    model = Accrual(db['loan_accruals'])
+    model.accrue_funded_loans(db['loans'], as_of)
+    model.accrue_funded_loans(db['loans'], as_of)
+    assert len(db['loan_accruals'].docs) == 2
+
+    for loan in db['loans'].docs:
+        if loan['_id'] == repaid:
+            loan['status'] = 'repaid'
+    model.accrue_funded_loans(db['loans'], as_of + timedelta(days=1))
+    assert [doc['_id'] for doc in db['loan_accruals'].docs] == [kept]
+    assert db['loan_accruals'].docs[0]['days_accrued'] == 31
+    assert len(db['accrual_summaries'].docs) == 2
+
+
+def test_backdated_run_is_refused():
+    db = FakeDB()
+    as_of = datetime(2024, 3, 1)
+    funded_loan(db, 1000.0, 3, 30, as_of)
+    model = Accrual(db['loan_accruals'])
+    model.accrue_funded_loans(db['loans'], as_of)
+
+    try:
+        model.accrue_funded_loans(db['loans'], as_of - timedelta(days=1))
+        assert False, 'a run older than the latest one was accepted'
+    except ValueError:
+        pass
+    assert [doc['as_of'] for doc in db['loan_accruals'].docs] == [as_of]
+    assert model.get_latest_summary()['_id'] == as_of
+
+    # Rows from any other day are dropped, not only older ones
+    db['loan_accruals'].insert_one({'_id': ObjectId(), 'as_of': as_of + timedelta(days=1)})
+    model.accrue_funded_loans(db['loans'], as_of)
+    assert [doc['as_of'] for doc in db['loan_accruals'].docs] == [as_of]
+
+
+def test_dashboards_show_stored_accruals():
+    db = FakeDB()
+    as_of = datetime(2024, 3, 1)
+    loan_id = funded_loan(db, 1000.0, 3, 30, as_of)
+    model = Accrual(db['loan_accruals'])
+    model.accrue_funded_loans(db['loans'], as_of)
+    loan = db['loans'].docs[0]
+    loan.update(purpose='rent', created_at=as_of)
+    user = {'_id': loan['lender_id'], 'name': 'L', 'email': 'l@x', 'role': 'lender', 'wallet_balance': 0.0}
+
+    lender = build_lender_data(user, [loan], [], {}, model.get_by_lender(loan['lender_id']))
+    assert lender['my_loans'][0]['accrued_return'] == 20.0
+    assert lender['analytics']['accrued_returns'] == 20.0
+
+    borrower = build_borrower_data(dict(user, _id=loan['borrower_id']), [loan],
+                                   model.get_by_borrower(loan['borrower_id']))
+    assert borrower['loans'][0]['accrued_interest'] == 47.0
+    assert borrower['analytics']['accrued_interest'] == 47.0
+    assert build_borrower_data(user, [loan])['analytics']['accrued_interest'] == 0.0
+    assert loan_id in model.get_by_lender(loan['lender_id'])
+
+
+def main():
+    print("🚀 QuickCred Interest Accrual Test")
+    print("=" * 40)
+    for test in (test_accrue_matches_calculate_interest, test_job_accrues_funded_loans_in_chunks,
+                 test_rerun_drops_loans_no_longer_funded, test_backdated_run_is_refused,
+                 test_dashboards_show_stored_accruals):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
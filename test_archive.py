@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Archival Test
+Archives old repaid loans into collections and into gzip NDJSON segments,
+then checks that history views and counters still include them without
+aggregating the archive, that a segment lookup decompresses only the
+matching records, and that an interrupted run is finished by the next
+one; no MongoDB needed
+"""
+
+import sys
+import os
+import gzip
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from models import archive as archive_module
+from fake_mongo import FakeCollection, FakeDB
+from models.archive import ArchiveStore, archive_repaid_loans
+from models.loan import Loan
+from models.transaction import Transaction
+
+
+class ArchiveCollection(FakeCollection):
+    """FakeCollection with the $match/$group aggregations the analytics use"""
+
+    aggregations = 0
+
+    def aggregate(self, pipeline):
+        """$match followed by a $group of $sum accumulators"""
+        self.aggregations += 1
+        docs = self.find(pipeline[0]['$match']) if '$match' in pipeline[0] else self.docs
+        spec = dict(pipeline[-1]['$group'])
+        key = spec.pop('_id')
+        groups = {}
+        for doc in docs:
+            group_id = doc.get(key.lstrip('$')) if key else None
+            group = groups.setdefault(group_id, dict({name: 0 for name in spec}, _id=group_id))
+            for name, accumulator in spec.items():
+                value = accumulator['$sum']
+                group[name] += value if value == 1 else doc.get(value.lstrip('$'), 0)
+        return list(groups.values())
+
+
+def seed(db, archive):
+    """One borrower with a loan repaid two years ago, one repaid recently and one pending"""
+    borrower_id, lender_id = ObjectId(), ObjectId()
+    loan_model = Loan(db['loans'], archive=archive)
+    transaction_model = Transaction(db['transactions'], archive=archive)
+    now = datetime.utcnow()
+    loan_ids = []
+    for repaid_at in (now - timedelta(days=730), now - timedelta(days=10), None):
+        loan_id = loan_model.create_loan(borrower_id, 1000, 3, 'rent')
+        loan_ids.append(loan_id)
+        transaction_model.create_transaction(loan_id, borrower_id, 1000, 'loan_funding')
+        transaction_model.create_transaction(loan_id, lender_id, 60, 'interest_payment')
+        if repaid_at:
+            db['loans'].update_one({'_id': ObjectId(loan_id)}, {'$set': {
+                'status': 'repaid', 'lender_id': lender_id, 'repaid_at': repaid_at}})
+    return borrower_id, lender_id, loan_ids, loan_model, transaction_model
+
+
+def counters(loan_model, transaction_model, borrower_id, lender_id):
+    return {
+        'loans': loan_model.count_loans(),
+        'transactions': transaction_model.count_transactions(),
+        'by_status': sorted((item['_id'], item['count']) for item in loan_model.get_loan_analytics()),
+        'borrower_loans': len(loan_model.get_loans_by_borrower(borrower_id)),
+        'lender_loans': len(loan_model.get_loans_by_lender(lender_id)),
+        'borrower_history': len(transaction_model.get_transactions_by_user(borrower_id)),
+        'lender_returns': transaction_model.get_lender_returns(lender_id)['total_returns'],
+    }
+
+
+def check_archival(segment_dir=None):
+    db = FakeDB(ArchiveCollection)
+    archive = ArchiveStore(db, segment_dir)
+    borrower_id, lender_id, loan_ids, loan_model, transaction_model = seed(db, archive)
+    before = counters(loan_model, transaction_model, borrower_id, lender_id)
+
+    moved = archive_repaid_loans(db['loans'], db['transactions'], archive, older_than_days=365, batch_size=1)
+    assert moved == (1, 2)
+    assert len(db['loans'].docs) == 2
+    assert len(db['transactions'].docs) == 4
+    assert counters(loan_model, transaction_model, borrower_id, lender_id) == before
+    assert loan_model.get_loan_by_id(loan_ids[0])['status'] == 'repaid'
+    assert len(transaction_model.get_transactions_by_loan(loan_ids[0])) == 2
+    assert archive_repaid_loans(db['loans'], db['transactions'], archive, older_than_days=365) == (0, 0)
+    return db
+
+
+def test_archive_to_collections():
+    db = check_archival()
+    assert len(db['loans_archive'].docs) == 1
+    assert len(db['transactions_archive'].docs) == 2
+    # The counters summed the batch's catalog entry instead
+    assert db['loans_archive'].aggregations == db['transactions_archive'].aggregations == 0
+    assert len(db['archive_segments'].docs) == 1
+
+
+def test_archive_to_segments():
+    segment_dir = tempfile.mkdtemp(prefix='quickcred-archive-')
+    try:
+        db = check_archival(segment_dir)
+        assert len(db['archive_segments'].docs) == 1
+        assert [name.endswith('.ndjson.gz') for name in os.listdir(segment_dir)] == [True]
+    finally:
+        shutil.rmtree(segment_dir)
+
+
+def test_segment_lookup_reads_only_matching_records():
+    segment_dir = tempfile.mkdtemp(prefix='quickcred-archive-')
+    original = archive_module.gzip
+    try:
+        db = FakeDB(ArchiveCollection)
+        archive = ArchiveStore(db, segment_dir)
+        borrower_id, lender_id = ObjectId(), ObjectId()
+        for _ in range(3):
+            loans = [{'_id': ObjectId(), 'borrower_id': ObjectId(), 'lender_id': lender_id,
+                      'status': 'repaid', 'amount': 100.0} for _ in range(4)]
+            loans[1]['borrower_id'] = borrower_id
+            rows = [{'_id': ObjectId(), 'loan_id': loan['_id'], 'user_id': loan['borrower_id'],
+                     'type': 'loan_funding', 'amount': 100.0} for loan in loans]
+            archive.write(loans, rows)
+
+        decompressed = []
+
+        def decompress(data):
+            decompressed.append(len(data))
+            return gzip.decompress(data)
+        archive_module.gzip = SimpleNamespace(compress=gzip.compress, decompress=decompress, open=gzip.open)
+
+        assert len(archive.find_loans('borrower_id', borrower_id)) == 3
+        assert len(decompressed) == 3
+        rows = archive.find_transactions('loan_id', loans[2]['_id'])
+        assert [row['user_id'] for row in rows] == [loans[2]['borrower_id']]
+        assert len(decompressed) == 4
+        assert len(archive.find_loans('lender_id', lender_id)) == 12
+        assert archive.find_loans('_id', ObjectId()) == []
+        assert len(decompressed) == 16
+        # The files still read as ordinary gzip NDJSON
+        assert len(list(archive.iter_loans())) == 12
+    finally:
+        archive_module.gzip = original
+        shutil.rmtree(segment_dir)
+
+
+def test_interrupted_run_is_finished():
+    """A batch archived but not yet deleted is deleted, not archived again"""
+    segment_dir = tempfile.mkdtemp(prefix='quickcred-archive-')
+    try:
+        db = FakeDB(ArchiveCollection)
+        archive = ArchiveStore(db, segment_dir)
+        seed(db, archive)
+        old = [loan for loan in db['loans'].docs if loan['status'] == 'repaid'][0]
+        rows = [row for row in db['transactions'].docs if row['loan_id'] == old['_id']]
+        archive.write([old], rows)
+
+        assert archive_repaid_loans(db['loans'], db['transactions'], archive, older_than_days=365) == (0, 0)
+        assert old['_id'] not in {loan['_id'] for loan in db['loans'].docs}
+        assert len(db['archive_segments'].docs) == 1
+    finally:
+        shutil.rmtree(segment_dir)
+
+
+def main():
+    print("🚀 QuickCred Archival Test")
+    print("=" * 40)
+    for test in (test_archive_to_collections, test_archive_to_segments,
+                 test_segment_lookup_reads_only_matching_records, test_interrupted_run_is_finished):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Borrower Score Test
+Checks the scoring formula, the incremental updates and their copy on
+pending loans (applied once when a task is redelivered, also after a
+rebuild), the rebuild from archived loans, and paging /loan/pending by score when some loans
+have no score yet; no MongoDB needed
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+from controllers import loan_controller
+from fake_mongo import MISSING, FakeCollection, FakeDB
+from models.archive import ArchiveStore
+from models.borrower_score import (APPLIED_EVENTS_KEPT, DEFAULT_SCORE, EXPOSURE_PENALTY_MAX, BorrowerScore,
+                                   compute_score)
+
+
+class LoansCollection(FakeCollection):
+    """Loans with nothing settled in the hot collection: the aggregation finds no borrowers"""
+
+    def aggregate(self, pipeline, **kwargs):
+        return iter([])
+
+
+class ObjectIdJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        return str(o) if isinstance(o, ObjectId) else DefaultJSONProvider.default(o)
+
+
+def test_new_borrower_gets_default():
+    assert compute_score({}) == DEFAULT_SCORE
+
+
+def test_history_outweighs_a_single_loan():
+    """Twenty on-time repayments beat one; defaults and lateness pull the score down"""
+    one = compute_score({'loans_repaid': 1, 'repaid_on_time': 1})
+    twenty = compute_score({'loans_repaid': 20, 'repaid_on_time': 20})
+    late = compute_score({'loans_repaid': 20, 'repaid_on_time': 10})
+    defaulted = compute_score({'loans_repaid': 20, 'repaid_on_time': 20, 'loans_defaulted': 5})
+    assert DEFAULT_SCORE < one < twenty <= 100
+    assert late < twenty and defaulted < twenty
+
+
+def test_exposure_penalty_is_bounded():
+    clean = compute_score({'loans_repaid': 3, 'repaid_on_time': 3})
+    exposed = compute_score({'loans_repaid': 3, 'repaid_on_time': 3, 'outstanding': 10 ** 9})
+    assert clean - exposed == EXPOSURE_PENALTY_MAX
+    assert compute_score({'loans_defaulted': 50, 'outstanding': 10 ** 9}) >= 0
+
+
+def test_incremental_update_is_copied_to_pending_loans():
+    db = FakeDB()
+    scores = BorrowerScore(db['borrower_scores'], db['loans'])
+    borrower_id, other_id = ObjectId(), ObjectId()
+    db['loans'].insert_many([
+        {'borrower_id': borrower_id, 'status': 'pending', 'borrower_score': DEFAULT_SCORE},
+        {'borrower_id': borrower_id, 'status': 'funded', 'borrower_score': DEFAULT_SCORE},
+        {'borrower_id': other_id, 'status': 'pending', 'borrower_score': DEFAULT_SCORE},
+    ])
+
+    scores.record_funding(borrower_id, 10000, str(ObjectId()))
+    repaid = scores.record_repayment(borrower_id, 10000, True, str(ObjectId()))
+    stats = db['borrower_scores'].find_one({'_id': borrower_id})
+    assert (stats['loans_funded'], stats['loans_repaid'], stats['repaid_on_time']) == (1, 1, 1)
+    assert repaid == scores.get_score(borrower_id) == compute_score(stats) > DEFAULT_SCORE
+
+    # Only the borrower's pending loans carry the new score
+    scores_by_loan = {(loan['borrower_id'], loan['status']): loan['borrower_score']
+                      for loan in db['loans'].find({})}
+    assert scores_by_loan == {(borrower_id, 'pending'): repaid, (borrower_id, 'funded'): DEFAULT_SCORE,
+                              (other_id, 'pending'): DEFAULT_SCORE}
+
+
+def test_redelivered_task_is_applied_once():
+    db = FakeDB()
+    scores = BorrowerScore(db['borrower_scores'], db['loans'])
+    borrower_id, loan_id = ObjectId(), str(ObjectId())
+    db['loans'].insert_one({'borrower_id': borrower_id, 'status': 'pending', 'borrower_score': DEFAULT_SCORE})
+
+    # The same durable task delivered twice, as after a worker crash
+    funded = scores.record_funding(borrower_id, 10000, loan_id)
+    assert scores.record_funding(borrower_id, 10000, loan_id) == funded
+    stats = db['borrower_scores'].find_one({'_id': borrower_id})
+    assert stats['loans_funded'] == 1 and stats['outstanding'] == 10000
+
+    repaid = scores.record_repayment(borrower_id, 10000, True, loan_id)
+    assert scores.record_repayment(borrower_id, 10000, True, loan_id) == repaid
+    stats = db['borrower_scores'].find_one({'_id': borrower_id})
+    assert stats['loans_repaid'] == 1 and stats['repaid_on_time'] == 1 and stats['outstanding'] == 0
+    assert repaid == compute_score(stats)
+    assert db['loans'].find_one({'borrower_id': borrower_id})['borrower_score'] == repaid
+
+    # Another loan still counts
+    scores.record_funding(borrower_id, 5000, str(ObjectId()))
+    assert db['borrower_scores'].find_one({'_id': borrower_id})['loans_funded'] == 2
+
+
+def test_applied_events_are_bounded():
+    db = FakeDB()
+    scores = BorrowerScore(db['borrower_scores'], db['loans'])
+    borrower_id = ObjectId()
+    loan_ids = [str(ObjectId()) for _ in range(APPLIED_EVENTS_KEPT + 5)]
+    for loan_id in loan_ids:
+        scores.record_funding(borrower_id, 100, loan_id)
+
+    stats = db['borrower_scores'].find_one({'_id': borrower_id})
+    assert stats['loans_funded'] == APPLIED_EVENTS_KEPT + 5
+    assert stats['applied_events'] == [f"funding:{loan_id}" for loan_id in loan_ids[-APPLIED_EVENTS_KEPT:]]
+    scores.record_funding(borrower_id, 100, loan_ids[-1])
+    assert db['borrower_scores'].find_one({'_id': borrower_id})['loans_funded'] == APPLIED_EVENTS_KEPT + 5
+
+
+def test_task_queued_before_recompute_is_not_counted_twice():
+    borrower_id, funded_id, repaid_id = ObjectId(), ObjectId(), ObjectId()
+
+    class SettledLoans(FakeCollection):
+        """The hot aggregation already counts both loans and their events"""
+
+        def aggregate(self, pipeline, **kwargs):
+            return iter([{'_id': borrower_id, 'loans_funded': 2, 'loans_repaid': 1, 'loans_defaulted': 0,
+                          'repaid_on_time': 1, 'outstanding': 1000.0,
+                          'funding_events': [f"funding:{funded_id}", f"funding:{repaid_id}"],
+                          'repayment_events': [f"repayment:{repaid_id}"]}])
+
+    db = FakeDB(SettledLoans)
+    scores = BorrowerScore(db['borrower_scores'], db['loans'])
+    # A stale event from before the rebuild is replaced by the covered ones
+    scores.record_funding(borrower_id, 500, str(ObjectId()))
+    assert scores.recompute_all() == 1
+
+    # The deferred tasks for those loans run after the rebuild
+    scores.record_funding(borrower_id, 1000, str(funded_id))
+    scores.record_repayment(borrower_id, 1000, True, str(repaid_id))
+    stats = db['borrower_scores'].find_one({'_id': borrower_id})
+    assert (stats['loans_funded'], stats['loans_repaid'], stats['outstanding']) == (2, 1, 1000.0)
+    assert 'funding_events' not in stats and len(stats['applied_events']) == 3
+
+
+def test_recompute_counts_archived_loans_and_null_scores():
+    db = FakeDB(LoansCollection)
+    borrower_id, newcomer_id = ObjectId(), ObjectId()
+    due = datetime.utcnow()
+    db['loans'].insert_many([
+        {'borrower_id': borrower_id, 'status': 'pending', 'borrower_score': None},
+        {'borrower_id': newcomer_id, 'status': 'pending', 'borrower_score': None},
+        {'borrower_id': newcomer_id, 'status': 'pending'},
+    ])
+    ArchiveStore(db).write([
+        {'_id': ObjectId(), 'borrower_id': borrower_id, 'status': 'repaid', 'amount': 1000.0,
+         'due_date': due, 'repaid_at': due - timedelta(days=1)},
+        {'_id': ObjectId(), 'borrower_id': borrower_id, 'status': 'repaid', 'amount': 1000.0,
+         'due_date': due, 'repaid_at': due + timedelta(days=1)},
+    ], [])
+
+    original = Config.ARCHIVE_ENABLED
+    Config.ARCHIVE_ENABLED = True
+    try:
+        assert BorrowerScore(db['borrower_scores'], db['loans']).recompute_all() == 1
+    finally:
+        Config.ARCHIVE_ENABLED = original
+
+    stats = db['borrower_scores'].find_one({'_id': borrower_id})
+    assert (stats['loans_funded'], stats['loans_repaid'], stats['repaid_on_time']) == (2, 2, 1)
+    assert db['loans'].find_one({'borrower_id': borrower_id})['borrower_score'] == stats['score']
+    assert [loan['borrower_score'] for loan in db['loans'].find({'borrower_id': newcomer_id})] == [DEFAULT_SCORE] * 2
+
+
+def test_pending_pages_by_score_include_unscored_loans():
+    db = FakeDB()
+    borrower_id = ObjectId()
+    db['users'].insert_one({'_id': borrower_id, 'name': 'Asha', 'email': 'asha@example.com'})
+    # MISSING: created before scores were kept, so it has no borrower_score
+    # at all; it sorts with the nulls and ends the third page
+    for score in (80.0, 80.0, 65.5, None, MISSING, None, 50.0):
+        loan = {'_id': ObjectId(), 'borrower_id': borrower_id, 'status': 'pending', 'amount': 1000.0}
+        if score is not MISSING:
+            loan['borrower_score'] = score
+        db['loans'].insert_one(loan)
+
+    app = Flask(__name__)
+    app.json = ObjectIdJSONProvider(app)
+    app.register_blueprint(loan_controller.loan_bp, url_prefix='/loan')
+    get_collections = loan_controller.get_collections
+    loan_controller.get_collections = lambda: (db['users'], db['loans'], db['transactions'])
+    try:
+        client = app.test_client()
+        seen, cursor = [], None
+        while True:
+            query = '/loan/pending?sort=score&limit=2' + (f'&cursor={cursor}' if cursor else '')
+            page = client.get(query).get_json()
+            seen.extend((loan.get('borrower_score'), loan['id']) for loan in page['loans'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+    finally:
+        loan_controller.get_collections = get_collections
+
+    assert len(seen) == len({loan_id for _, loan_id in seen}) == 7
+    assert [score for score, _ in seen] == [80.0, 80.0, 65.5, 50.0, None, None, None]
+
+
+def main():
+    print("🚀 QuickCred Borrower Score Test")
+    print("=" * 40)
+    for test in (test_new_borrower_gets_default, test_history_outweighs_a_single_loan,
+                 test_exposure_penalty_is_bounded, test_incremental_update_is_copied_to_pending_loans,
+                 test_redelivered_task_is_applied_once, test_applied_events_are_bounded,
+                 test_task_queued_before_recompute_is_not_counted_twice,
+                 test_recompute_counts_archived_loans_and_null_scores,
+                 test_pending_pages_by_score_include_unscored_loans):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
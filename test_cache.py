@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+TTL Cache Test
+Checks expiry, eviction and single-flight refills, which leave no
+per-key locks behind; no MongoDB needed
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cache import TTLCache
+
+
+def test_entries_expire():
+    cache = TTLCache(ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=10)
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+
+def test_eviction_keeps_size_bounded():
+    cache = TTLCache(ttl=10, max_entries=3)
+    for i in range(10):
+        cache.set(i, i, ttl=10 + i)
+    assert len(cache._entries) == 3
+    assert cache.get(9) == 9
+
+
+def test_concurrent_misses_compute_once():
+    """A burst of requests on an empty entry runs the factory a single time"""
+    cache = TTLCache(ttl=10)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'page'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_set('index', factory)))
+               for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['page'] * 20
+    assert cache._key_locks == {}
+
+
+def test_key_locks_do_not_accumulate():
+    """Refilling many keys, or a factory that fails, leaves no per-key locks behind"""
+    cache = TTLCache(ttl=10, max_entries=8)
+    for i in range(1000):
+        cache.get_or_set(f'page:{i}', lambda: 'page')
+    try:
+        cache.get_or_set('broken', lambda: 1 / 0)
+    except ZeroDivisionError:
+        pass
+    assert len(cache._entries) == 8
+    assert cache._key_locks == {}
+
+
+def test_none_is_not_cached():
+    cache = TTLCache(ttl=10)
+    assert cache.get_or_set('stats', lambda: None) is None
+    assert cache.get_or_set('stats', lambda: 'ok') == 'ok'
+
+
+def main():
+    print("🚀 QuickCred Cache Test")
+    print("=" * 40)
+    for test in (test_entries_expire, test_eviction_keeps_size_bounded,
+                 test_concurrent_misses_compute_once, test_key_locks_do_not_accumulate,
+                 test_none_is_not_cached):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
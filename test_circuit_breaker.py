@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker Test
+Checks that the breaker opens on consecutive timeouts but not on errors
+the server answered, that lost heartbeats only count once no server is
+writable, that it lets one half-open probe through and closes when it
+succeeds, and that while open writes fail fast and degraded reads get
+their last good response flagged as stale. The fault-injection test stops
+and restarts a local mongod and is skipped when mongod is not installed.
+"""
+
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Blueprint, Flask, jsonify, session
+from pymongo import MongoClient
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, init_circuit_breaker, mongo_breaker
+from local_cluster import LocalReplicaSet, mongod_available
+
+TIMEOUT = SimpleNamespace(failure={'errmsg': 'timed out', 'errtype': 'NetworkTimeout'})
+DUPLICATE_KEY = SimpleNamespace(failure={'errmsg': 'E11000 duplicate key', 'code': 11000})
+
+
+def breaker(failures=3, reset_seconds=0.05):
+    circuit = CircuitBreaker()
+    circuit.configure(failure_threshold=failures, reset_seconds=reset_seconds)
+    return circuit
+
+
+def make_app(config=None, fetch=None):
+    """A small app with a degraded read, a per-user degraded read, a plain read and a write"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config.update(MONGO_BREAKER=True, MONGO_BREAKER_FAILURES=3, MONGO_BREAKER_RESET_SECONDS=0.2,
+                      MONGO_BREAKER_STALE_BYTES=1024 * 1024, MONGO_BREAKER_STALE_SECONDS=60, **(config or {}))
+    init_circuit_breaker(app)
+    fetch = fetch or (lambda: {'count': 1})
+    loan_bp, auth_bp = Blueprint('loan', __name__), Blueprint('auth', __name__)
+
+    @loan_bp.route('/pending')
+    def get_pending_loans():
+        try:
+            return jsonify({'loans': fetch()}), 200
+        except Exception as e:
+            # Like the controllers: the error becomes a 500, not an exception
+            return jsonify({'error': str(e)}), 500
+
+    @loan_bp.route('/my-loans')
+    def get_my_loans():
+        return jsonify({'loans': []}), 200
+
+    @loan_bp.route('/create', methods=['POST'])
+    def create_loan():
+        return jsonify({'message': 'created'}), 201
+
+    @auth_bp.route('/profile')
+    def get_profile():
+        return jsonify({'user': {'id': session['user_id']}}), 200
+
+    app.register_blueprint(loan_bp, url_prefix='/loan')
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.add_url_rule('/healthz', 'healthz', lambda: 'ok')
+    return app
+
+
+def trip(circuit, count=3):
+    for _ in range(count):
+        circuit.listeners[0].failed(TIMEOUT)
+
+
+def test_opens_on_consecutive_timeouts_only():
+    circuit = breaker()
+    trip(circuit, 2)
+    circuit.listeners[0].succeeded(SimpleNamespace())
+    trip(circuit, 2)
+    # The server answered, so an error reply doesn't count as a timeout
+    circuit.listeners[0].failed(DUPLICATE_KEY)
+    trip(circuit, 2)
+    assert circuit.state == CLOSED and circuit.allow() is True
+
+    trip(circuit, 1)
+    assert circuit.state == OPEN
+    assert circuit.allow() is False
+    assert circuit.retry_after() == 1
+
+
+def test_heartbeats_count_once_nothing_is_writable():
+    circuit = breaker()
+    heartbeats, topology = circuit.listeners[1], circuit.listeners[2]
+    for _ in range(5):
+        heartbeats.failed(SimpleNamespace())
+    assert circuit.state == CLOSED
+
+    no_primary = SimpleNamespace(new_description=SimpleNamespace(has_writable_server=lambda: False))
+    topology.description_changed(no_primary)
+    for _ in range(3):
+        heartbeats.failed(SimpleNamespace())
+    assert circuit.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens():
+    circuit = breaker()
+    trip(circuit)
+    time.sleep(0.06)
+    assert circuit.allow() == 'probe'
+    assert circuit.state == HALF_OPEN
+    assert circuit.allow() is False  # one probe at a time
+    trip(circuit, 1)
+    assert circuit.state == OPEN and circuit.allow() is False
+
+    time.sleep(0.06)
+    assert circuit.allow() == 'probe'
+    circuit.listeners[0].succeeded(SimpleNamespace())
+    assert circuit.state == CLOSED and circuit.allow() is True
+
+    # A probe that never reached MongoDB lets the next request try
+    trip(circuit)
+    time.sleep(0.06)
+    assert circuit.allow() == 'probe'
+    circuit.end_probe()
+    assert circuit.allow() == 'probe'
+
+
+def test_open_breaker_fails_writes_and_serves_stale_reads():
+    state = {'down': False}
+
+    def fetch():
+        if state['down']:
+            trip(mongo_breaker, 1)
+            raise ConnectionError('No servers found yet')
+        mongo_breaker.listeners[0].succeeded(SimpleNamespace())
+        return [{'amount': 1000}]
+
+    app = make_app(fetch=fetch)
+    client = app.test_client()
+    try:
+        with client.session_transaction() as user_session:
+            user_session['user_id'] = 'alice'
+        assert client.get('/loan/pending').get_json() == {'loans': [{'amount': 1000}]}
+        assert client.get('/auth/profile').status_code == 200
+
+        # Timeouts trip the breaker; the request that tripped it falls back too
+        state['down'] = True
+        assert client.get('/loan/pending?page=2').status_code == 500
+        assert client.get('/loan/pending?page=2').status_code == 500
+        response = client.get('/loan/pending')
+        assert mongo_breaker.state == OPEN
+        assert response.status_code == 200 and response.get_json()['stale'] is True
+        assert response.headers['Warning'] == '110 - "Response is Stale"'
+
+        started = time.perf_counter()
+        response = client.post('/loan/create')
+        assert response.status_code == 503 and 'Retry-After' in response.headers
+        assert time.perf_counter() - started < 0.1
+        assert client.get('/loan/my-loans').status_code == 503
+        assert client.get('/healthz').status_code == 200
+
+        data = client.get('/auth/profile').get_json()
+        assert data['user'] == {'id': 'alice'} and data['stale'] is True
+        # Per-user responses are never served to someone else
+        with client.session_transaction() as user_session:
+            user_session['user_id'] = 'bob'
+        assert client.get('/auth/profile').status_code == 503
+
+        # Back up: the probe succeeds and the breaker closes
+        state['down'] = False
+        time.sleep(0.25)
+        # A probe that doesn't touch MongoDB leaves it half-open
+        assert client.get('/loan/my-loans').status_code == 200
+        assert mongo_breaker.state == HALF_OPEN
+        assert client.get('/loan/pending').get_json() == {'loans': [{'amount': 1000}]}
+        assert mongo_breaker.state == CLOSED
+    finally:
+        mongo_breaker.configure()
+
+
+def test_stopped_mongod_trips_and_recovers():
+    if not mongod_available():
+        pytest.skip('mongod not found')
+
+    with LocalReplicaSet(members=1) as rs:
+        mongo = MongoClient(rs.uri, serverSelectionTimeoutMS=1000, heartbeatFrequencyMS=500,
+                            event_listeners=mongo_breaker.listeners)
+        loans = mongo.quickcred_breaker_test.loans
+        loans.insert_one({'amount': 1000})
+        app = make_app({'MONGO_BREAKER_RESET_SECONDS': 1.0},
+                       fetch=lambda: [{'amount': loan['amount']} for loan in loans.find({}, {'_id': 0})])
+        client = app.test_client()
+        try:
+            assert client.get('/loan/pending').get_json() == {'loans': [{'amount': 1000}]}
+
+            rs.stop_member(0)
+            deadline = time.monotonic() + 30
+            while mongo_breaker.state != OPEN and time.monotonic() < deadline:
+                client.get('/loan/pending?fresh=1')
+            assert mongo_breaker.state == OPEN
+
+            started = time.perf_counter()
+            assert client.post('/loan/create').status_code == 503
+            assert time.perf_counter() - started < 0.1
+            assert client.get('/loan/pending').get_json()['stale'] is True
+
+            rs.start_member(0)
+            rs.wait_healthy()
+            deadline = time.monotonic() + 30
+            while mongo_breaker.state != CLOSED and time.monotonic() < deadline:
+                client.get('/loan/pending')
+                time.sleep(0.2)
+            assert mongo_breaker.state == CLOSED
+            assert 'stale' not in client.get('/loan/pending').get_json()
+        finally:
+            mongo.close()
+            mongo_breaker.configure()
+
+
+def main():
+    print("🚀 QuickCred Circuit Breaker Test")
+    print("=" * 40)
+    for test in (test_opens_on_consecutive_timeouts_only, test_heartbeats_count_once_nothing_is_writable,
+                 test_half_open_probe_closes_or_reopens, test_open_breaker_fails_writes_and_serves_stale_reads,
+                 test_stopped_mongod_trips_and_recovers):
+        if test is test_stopped_mongod_trips_and_recovers and not mongod_available():
+            print("⚠️  mongod not found; skipping fault-injection test")
+            continue
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
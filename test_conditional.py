@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Conditional Response Test
+Checks ETag and 304 handling of the `conditional` decorator; no MongoDB needed
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, jsonify
+
+from decorators import conditional
+
+
+def make_app():
+    app = Flask(__name__)
+    state = {'balance': 100}
+
+    @app.route('/data')
+    @conditional
+    def data():
+        return jsonify({'balance': state['balance']}), 200
+
+    @app.route('/async-data')
+    @conditional
+    async def async_data():
+        return jsonify({'balance': state['balance']}), 200
+
+    @app.route('/missing')
+    @conditional
+    def missing():
+        return jsonify({'error': 'User not found'}), 404
+
+    return app, state
+
+
+def test_revalidation_returns_304_until_data_changes():
+    app, state = make_app()
+    client = app.test_client()
+    for path in ('/data', '/async-data'):
+        first = client.get(path)
+        etag = first.headers['ETag']
+        assert first.status_code == 200
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+        assert 'Cookie' in first.headers['Vary']
+
+        unchanged = client.get(path, headers={'If-None-Match': etag})
+        assert unchanged.status_code == 304 and unchanged.data == b''
+
+        state['balance'] += 50
+        changed = client.get(path, headers={'If-None-Match': etag})
+        assert changed.status_code == 200 and changed.get_json() == {'balance': state['balance']}
+
+
+def test_errors_are_not_tagged():
+    app, _ = make_app()
+    response = app.test_client().get('/missing')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def main():
+    print("🚀 QuickCred Conditional Response Test")
+    print("=" * 40)
+    for test in (test_revalidation_returns_304_until_data_changes, test_errors_are_not_tagged):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,15 +13,14 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 def test_mongodb_connection():
     """Test MongoDB connection"""
     try:
-        from app import mongo
+        from app import db
         print("🔗 Testing MongoDB connection...")
         
         # Test basic connection
-        result = mongo.db.command('ping')
+        result = db.command('ping')
         print("✅ MongoDB connection successful!")
         
         # Test database access
-        db = mongo.db
         print(f"✅ Database access successful: {db.name}")
         
         # Test collection access
@@ -47,7 +46,7 @@ def test_app_imports():
     """Test if all app imports work"""
     try:
         print("📦 Testing imports...")
-        from app import app, mongo
+        from app import app, db
         from controllers.auth_controller import auth_bp
         from controllers.loan_controller import loan_bp
         from controllers.transaction_controller import transaction_bp
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Idempotency-Key Test
+Runs the decorator against an in-memory key store, including a retry
+taking over an abandoned reservation, and 5xx handling: released when
+nothing was written, replayed after a commit or a non-transactional
+write; no MongoDB needed
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from bson import ObjectId
+from flask import Flask, jsonify, session
+from pymongo.errors import DuplicateKeyError
+
+import decorators
+from config import Config
+from controllers import loan_controller, transaction_controller
+from decorators import idempotent
+from fake_mongo import FakeCollection, FakeDB
+from models.idempotency import IdempotencyKey
+
+
+class KeyCollection(FakeCollection):
+    """The idempotency_keys collection, unique on (user_id, key)"""
+
+    def insert_one(self, doc, session=None):
+        if self.find_one({'user_id': doc['user_id'], 'key': doc['key']}):
+            raise DuplicateKeyError('duplicate key')
+        return super().insert_one(doc, session=session)
+
+
+def make_app(collection):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    calls = []
+    decorators.idempotency_store = lambda: IdempotencyKey(collection)
+
+    @app.route('/login')
+    def login():
+        session['user_id'] = 'user-1'
+        return 'ok'
+
+    @app.route('/topup', methods=['POST'])
+    @idempotent
+    def topup():
+        calls.append(1)
+        if len(calls) > 5:
+            return jsonify({'error': 'boom'}), 500
+        return jsonify({'new_balance': 100 * len(calls)})
+
+    return app, calls
+
+
+def test_retry_replays_first_response():
+    """A retried POST is answered from the store without running the handler"""
+    collection = KeyCollection()
+    app, calls = make_app(collection)
+    client = app.test_client()
+    client.get('/login')
+
+    first = client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k1'})
+    finds = collection.finds
+    retry = client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k1'})
+
+    assert len(calls) == 1
+    assert retry.status_code == first.status_code == 200
+    assert retry.get_json() == first.get_json() == {'new_balance': 100}
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert collection.finds - finds == 1
+
+
+def test_key_reuse_and_in_progress():
+    """A key reused for another body is rejected; an unfinished one gets 409"""
+    collection = KeyCollection()
+    app, calls = make_app(collection)
+    client = app.test_client()
+    client.get('/login')
+
+    client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k1'})
+    mismatch = client.post('/topup', json={'amount': 500}, headers={'Idempotency-Key': 'k1'})
+    assert mismatch.status_code == 422
+
+    collection.update_one({'key': 'k1'}, {'$set': {'status': 'in_progress', 'reserved_at': datetime.utcnow()}})
+    busy = client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k1'})
+    assert busy.status_code == 409 and busy.headers['Retry-After'] == '1'
+    assert len(calls) == 1
+
+
+def test_abandoned_reservation_is_taken_over():
+    """A retry runs again once the first attempt's lease has run out"""
+    collection = KeyCollection()
+    app, calls = make_app(collection)
+    client = app.test_client()
+    client.get('/login')
+
+    client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k3'})
+    collection.update_one({'key': 'k3'}, {'$set': {'status': 'in_progress', 'reserved_at': datetime.utcnow()}})
+    busy = client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k3'})
+    assert busy.status_code == 409
+
+    # The worker died: once the lease has run out the retry runs it
+    expired = datetime.utcnow() - timedelta(seconds=Config.IDEMPOTENCY_LEASE_SECONDS + 1)
+    collection.update_one({'key': 'k3'}, {'$set': {'reserved_at': expired}})
+    retry = client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k3'})
+    assert retry.status_code == 200 and 'Idempotent-Replayed' not in retry.headers
+    assert len(calls) == 2
+    assert collection.find_one({'key': 'k3'})['status'] == 'completed'
+
+
+def test_failure_before_any_write_releases_key():
+    """A 5xx that wrote nothing releases the key so the retry runs again"""
+    collection = KeyCollection()
+    app, calls = make_app(collection)
+    client = app.test_client()
+    client.get('/login')
+    calls.extend([1] * 5)
+
+    failed = client.post('/topup', json={'amount': 100}, headers={'Idempotency-Key': 'k2'})
+    assert failed.status_code == 500
+    assert collection.find_one({'key': 'k2'}) is None
+
+    # Requests without a key are passed straight through
+    client.post('/topup', json={'amount': 100})
+    assert len(calls) == 7
+
+
+class FakeSession:
+    """A session whose transaction just runs the callback"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def with_transaction(self, callback, **kwargs):
+        return callback(self)
+
+
+class FailingReads(FakeCollection):
+    """Users whose writes land but whose reads fail, as on a failover right after a commit"""
+
+    def find(self, *args, **kwargs):
+        raise ConnectionError('connection reset')
+
+
+class FailingInserts(FakeCollection):
+    def insert_one(self, doc, session=None):
+        raise ConnectionError('connection reset')
+
+
+def post_twice(app, path, body, user_id):
+    client = app.test_client()
+    with client.session_transaction() as user_session:
+        user_session['user_id'] = str(user_id)
+    first = client.post(path, json=body, headers={'Idempotency-Key': 'k5'})
+    retry = client.post(path, json=body, headers={'Idempotency-Key': 'k5'})
+    return first, retry
+
+
+def test_failure_after_commit_is_replayed():
+    """Top-up: the credit commits, the read after it fails; the retry must not credit again"""
+    keys, users = KeyCollection(), FailingReads()
+    user_id = ObjectId()
+    users.insert_one({'_id': user_id, 'wallet_balance': 0.0})
+    decorators.idempotency_store = lambda: IdempotencyKey(keys)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(transaction_controller.transaction_bp, url_prefix='/transactions')
+
+    originals = transaction_controller.get_collections, transaction_controller.get_client, Config.MONGO_TRANSACTIONS
+    transaction_controller.get_collections = lambda: (users, FakeCollection(), FakeCollection())
+    transaction_controller.get_client = lambda: SimpleNamespace(start_session=FakeSession)
+    Config.MONGO_TRANSACTIONS = True
+    try:
+        first, retry = post_twice(app, '/transactions/topup', {'amount': 100}, user_id)
+    finally:
+        transaction_controller.get_collections, transaction_controller.get_client, Config.MONGO_TRANSACTIONS = originals
+
+    assert first.status_code == retry.status_code == 500
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert users.docs[0]['wallet_balance'] == 100
+
+
+def test_failure_in_non_transactional_create_is_replayed():
+    """Loan create: the loan is inserted, its index copy fails; the retry must not create another"""
+    db = FakeDB()
+    db['pending_loans'] = FailingInserts(db, 'pending_loans')
+    keys = KeyCollection()
+    decorators.idempotency_store = lambda: IdempotencyKey(keys)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(loan_controller.loan_bp, url_prefix='/loan')
+
+    originals = loan_controller.get_collections, loan_controller.get_score_model, Config.MONGO_SHARDED
+    loan_controller.get_collections = lambda: (db['users'], db['loans'], db['transactions'])
+    loan_controller.get_score_model = lambda: SimpleNamespace(get_score=lambda borrower_id: 50.0)
+    Config.MONGO_SHARDED = True
+    try:
+        first, retry = post_twice(app, '/loan/create', {'amount': 1000, 'term_months': 3}, ObjectId())
+    finally:
+        loan_controller.get_collections, loan_controller.get_score_model, Config.MONGO_SHARDED = originals
+
+    assert first.status_code == retry.status_code == 500
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert len(db['loans'].docs) == 1
+
+
+def main():
+    print("🚀 QuickCred Idempotency Test")
+    print("=" * 40)
+    for test in (test_retry_replays_first_response, test_key_reuse_and_in_progress,
+                 test_abandoned_reservation_is_taken_over, test_failure_before_any_write_releases_key,
+                 test_failure_after_commit_is_replayed, test_failure_in_non_transactional_create_is_replayed):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
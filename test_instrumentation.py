@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Request Instrumentation Test
+Feeds synthetic command events through the listener, including from an
+async view's AsyncModel threads; no MongoDB needed
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, jsonify
+
+from instrumentation import command_tally, current_tally, init_instrumentation, logger
+from models.async_model import AsyncModel
+
+
+def issue(name, ms, request_id):
+    """Publish a command's events the way pymongo does, on the calling thread"""
+    event = FakeEvent(name, ms, request_id)
+    command_tally.started(event)
+    command_tally.succeeded(event)
+
+
+class FakeEvent:
+    """Stands in for pymongo's command events (only the attributes we read)"""
+
+    def __init__(self, command_name, duration_ms, request_id, collection='loans'):
+        self.command_name = command_name
+        self.command = {command_name: collection}
+        self.duration_micros = int(duration_ms * 1000)
+        self.request_id = request_id
+
+
+class CommandModel:
+    """A model whose query issues the command it is given"""
+
+    def query(self, name, ms, request_id):
+        issue(name, ms, request_id)
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(SERVER_TIMING=True, REQUEST_LOG=True, SLOW_REQUEST_MS=500, TRACE_SAMPLE_RATE=0.0)
+    app.config.update(config)
+    init_instrumentation(app)
+
+    @app.route('/work')
+    def work():
+        for i, (name, ms) in enumerate([('find', 2.0), ('find', 7.5), ('update', 1.0)]):
+            issue(name, ms, i)
+        return jsonify({'ok': True})
+
+    @app.route('/async-work')
+    async def async_work():
+        model = AsyncModel(CommandModel())
+        await asyncio.gather(model.query('find', 2.0, 0), model.query('aggregate', 4.0, 1))
+        return jsonify({'ok': True})
+
+    return app
+
+
+class CapturingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+def test_server_timing_header():
+    """Command count, DB time and slowest command end up in Server-Timing"""
+    response = make_app().test_client().get('/work')
+    header = response.headers['Server-Timing']
+    assert 'db;dur=10.50;desc="3 commands"' in header
+    assert 'db-slowest;dur=7.50;desc="find"' in header
+    assert 'app;dur=' in header and 'cpu;dur=' in header
+
+
+def test_structured_log_and_trace():
+    """Slow sampled requests log their full command trace"""
+    handler = CapturingHandler()
+    logger.addHandler(handler)
+    try:
+        make_app(SLOW_REQUEST_MS=0, TRACE_SAMPLE_RATE=1.0).test_client().get('/work')
+    finally:
+        logger.removeHandler(handler)
+
+    entry = handler.records[-1]
+    assert entry['endpoint'] == 'work'
+    assert entry['db_commands'] == 3
+    assert entry['slow'] is True
+    assert [t['command'] for t in entry['trace']] == ['find', 'find', 'update']
+    assert entry['trace'][0]['collection'] == 'loans'
+
+
+def test_async_view_counts_executor_commands():
+    """Commands AsyncModel runs on its thread pool count towards the request"""
+    response = make_app().test_client().get('/async-work')
+    assert 'db;dur=6.00;desc="2 commands"' in response.headers['Server-Timing']
+    assert 'db-slowest;dur=4.00;desc="aggregate"' in response.headers['Server-Timing']
+
+
+def test_events_outside_requests_are_ignored():
+    """Commands issued outside a request (scripts, startup) are not tallied"""
+    command_tally.succeeded(FakeEvent('ping', 1.0, 99))
+    assert current_tally() is None
+
+
+def main():
+    print("🚀 QuickCred Instrumentation Test")
+    print("=" * 40)
+    for test in (test_server_timing_header, test_structured_log_and_trace,
+                 test_async_view_counts_executor_commands, test_events_outside_requests_are_ignored):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
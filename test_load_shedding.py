@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Load Shedding Test
+Checks that X-Request-Start is parsed in any unit, that a request that
+already queued past its budget is rejected with 503 and Retry-After
+before its view runs, that analytics routes give way while writes and
+health probes still get through (also at the default capacity, the
+worker's threads), and that slow requests shrink a class's concurrency
+limit which fast ones grow back; no MongoDB needed
+"""
+
+import math
+import sys
+import os
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Blueprint, Flask, jsonify
+
+from load_shedding import ANALYTICS, CLASS_SHARES, READ, WRITE, LoadShedder, init_load_shedding, load_shedder, request_arrival
+from serve import worker_settings
+
+CAPACITY = 4
+
+
+def make_app(gate, started, capacity=CAPACITY):
+    app = Flask(__name__)
+    app.config.update(LOAD_SHEDDING=True, LOAD_SHED_CAPACITY=capacity, MONGO_MAX_POOL_SIZE=100,
+                      LOAD_SHED_BUDGET_MS=300, LOAD_SHED_ANALYTICS_BUDGET_MS=100, LOAD_SHED_TARGET_MS=1000,
+                      LOAD_SHED_RETRY_AFTER=2)
+    init_load_shedding(app)
+    transaction_bp = Blueprint('transaction', __name__)
+
+    @transaction_bp.route('/slow')
+    def slow():
+        started.release()
+        gate.wait(5)
+        return jsonify({'ok': True})
+
+    @transaction_bp.route('/platform-analytics')
+    def get_platform_analytics():
+        return jsonify({'ok': True})
+
+    @transaction_bp.route('/create', methods=['POST'])
+    def create():
+        return jsonify({'ok': True})
+
+    app.register_blueprint(transaction_bp, url_prefix='/transactions')
+    app.add_url_rule('/healthz', 'healthz', lambda: 'ok')
+    return app
+
+
+def test_request_arrival_units():
+    now = 1_700_000_000.5
+    assert request_arrival(None, now) == now
+    assert request_arrival('garbage', now) == now
+    assert request_arrival('t=1700000000.25', now) == 1700000000.25
+    assert request_arrival('t=1700000000250', now) == 1700000000.25
+    assert request_arrival('1700000000250000', now) == 1700000000.25
+    # Never later than now, so a fast proxy clock can't extend the budget
+    assert request_arrival('t=1700000009', now) == now
+
+
+def test_request_queued_past_budget_is_rejected():
+    app = make_app(threading.Event(), threading.Semaphore(0))
+    client = app.test_client()
+    try:
+        assert client.get('/transactions/platform-analytics').status_code == 200
+
+        queued_since = f"t={int((time.time() - 1) * 1e6)}"
+        response = client.get('/transactions/platform-analytics', headers={'X-Request-Start': queued_since})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '4'
+        assert response.get_json()['retry_after'] == 4
+        # Writes have the longer budget, health probes none at all
+        recent = f"t={time.time() - 0.1}"
+        assert client.post('/transactions/create', headers={'X-Request-Start': recent}).status_code == 200
+        assert client.get('/healthz', headers={'X-Request-Start': queued_since}).status_code == 200
+    finally:
+        load_shedder.configure(0)
+
+
+def test_analytics_give_way_before_writes():
+    gate, started = threading.Event(), threading.Semaphore(0)
+    app = make_app(gate, started)
+    results = []
+
+    def slow_read():
+        results.append(app.test_client().get('/transactions/slow').status_code)
+
+    # Two slow reads fill the analytics share (50% of 4) but not the write share
+    readers = [threading.Thread(target=slow_read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for _ in readers:
+        assert started.acquire(timeout=5)
+    try:
+        client = app.test_client()
+        assert load_shedder.stats()[READ]['in_flight'] == 2
+        assert client.get('/transactions/platform-analytics').status_code == 503
+        assert client.post('/transactions/create').status_code == 200
+        assert client.get('/healthz').status_code == 200
+        gate.set()
+        for reader in readers:
+            reader.join(5)
+        assert results == [200, 200]
+        assert client.get('/transactions/platform-analytics').status_code == 200
+    finally:
+        gate.set()
+        load_shedder.configure(0)
+
+
+def test_default_capacity_sheds_analytics_before_writes():
+    """Unset, the capacity is the worker's threads, and analytics still give way first"""
+    gate, started = threading.Event(), threading.Semaphore(0)
+    app = make_app(gate, started, capacity=0)
+    assert load_shedder.capacity == worker_settings()['threads']
+    results = []
+
+    def slow_read():
+        results.append(app.test_client().get('/transactions/slow').status_code)
+
+    # Enough slow reads to fill the analytics share of the capacity
+    share = math.ceil(load_shedder.capacity * CLASS_SHARES[ANALYTICS])
+    readers = [threading.Thread(target=slow_read) for _ in range(share)]
+    for reader in readers:
+        reader.start()
+    for _ in readers:
+        assert started.acquire(timeout=5)
+    try:
+        client = app.test_client()
+        assert client.get('/transactions/platform-analytics').status_code == 503
+        assert client.post('/transactions/create').status_code == 200
+    finally:
+        gate.set()
+        for reader in readers:
+            reader.join(5)
+        load_shedder.configure(0)
+    assert results == [200] * len(readers)
+
+
+def test_waiting_request_is_admitted_when_a_slot_frees():
+    shedder = LoadShedder()
+    shedder.configure(2, budget_ms=1000)
+    write = shedder.classes[WRITE]
+    assert shedder.admit(write, time.time()) is None
+    assert shedder.admit(write, time.time()) is None
+    timer = threading.Timer(0.05, shedder.release, (write, 0.01))
+    timer.start()
+    assert shedder.admit(write, time.time()) is None
+    timer.join()
+    assert shedder.admit(write, time.time() - 0.9) == 'concurrency'
+    assert shedder.admit(write, time.time() - 2) == 'queue_time'
+
+
+def test_limit_shrinks_on_slow_requests_and_recovers():
+    shedder = LoadShedder()
+    shedder.configure(40, target_ms=50)
+    analytics = shedder.classes[ANALYTICS]
+    assert analytics.max_limit == 20
+
+    assert shedder.admit(analytics, time.time()) is None
+    shedder.release(analytics, latency=0.2)
+    assert analytics.limit == 15
+    # Only one decrease per target interval
+    assert shedder.admit(analytics, time.time()) is None
+    shedder.release(analytics, latency=0.2)
+    assert analytics.limit == 15
+    time.sleep(0.06)
+    assert shedder.admit(analytics, time.time()) is None
+    shedder.release(analytics, latency=0.01, overloaded=True)
+    assert analytics.limit == 11.25
+
+    for _ in range(200):
+        assert shedder.admit(analytics, time.time()) is None
+        shedder.release(analytics, latency=0.01)
+    assert analytics.limit == 20
+    assert shedder.stats()[ANALYTICS] == {'in_flight': 0, 'limit': 20, 'max_limit': 20}
+
+
+def main():
+    print("🚀 QuickCred Load Shedding Test")
+    print("=" * 40)
+    for test in (test_request_arrival_units, test_request_queued_past_budget_is_rejected,
+                 test_analytics_give_way_before_writes, test_default_capacity_sheds_analytics_before_writes,
+                 test_waiting_request_is_admitted_when_a_slot_frees,
+                 test_limit_shrinks_on_slow_requests_and_recovers):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Pending Loan Search Test
+Checks the queries the search issues against a recording collection; no MongoDB needed
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from models.loan import Loan, PENDING_COUNT_CAP, decode_cursor, encode_cursor
+
+
+class RecordingCursor:
+    def __init__(self, docs, calls):
+        self.docs = docs
+        self.calls = calls
+
+    def sort(self, spec):
+        self.calls['sort'] = spec
+        return self
+
+    def limit(self, n):
+        self.calls['limit'] = n
+        return self.docs[:n]
+
+
+class RecordingCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = {}
+
+    def with_options(self, **kwargs):
+        return self
+
+    def count_documents(self, query, limit=0):
+        self.calls['count'] = (query, limit)
+        return min(len(self.docs), limit)
+
+    def find(self, query):
+        self.calls['find'] = query
+        return RecordingCursor(self.docs, self.calls)
+
+
+def test_cursor_round_trip():
+    """Cursors carry the sort value (including datetimes) and the _id"""
+    created = datetime(2024, 5, 1, 12, 30)
+    loan_id = ObjectId()
+    assert decode_cursor(encode_cursor(created, str(loan_id))) == (created, loan_id)
+    try:
+        decode_cursor('not-a-cursor')
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+
+
+def test_filters_sort_and_next_page():
+    """Filters, the keyset condition and the sort all target the compound index"""
+    docs = [{'_id': ObjectId(), 'amount': 1000.0 + i, 'term_months': 3} for i in range(6)]
+    collection = RecordingCollection(docs)
+    after = encode_cursor(900.0, str(docs[0]['_id']))
+
+    loans, next_cursor, total, capped = Loan(collection).search_pending_loans(
+        min_amount=500, max_term=6, text='medical', sort='smallest', cursor=after, limit=5)
+
+    query = collection.calls['find']
+    assert query['status'] == 'pending'
+    assert query['amount'] == {'$gte': 500.0}
+    assert query['term_months'] == {'$lte': 6}
+    assert query['$text'] == {'$search': 'medical'}
+    assert query['$or'][0] == {'amount': {'$gt': 900.0}}
+    assert collection.calls['sort'] == [('amount', 1), ('_id', 1)]
+    assert '$or' not in collection.calls['count'][0]
+    assert collection.calls['count'][1] == PENDING_COUNT_CAP
+
+    assert len(loans) == 5 and total == 6 and not capped
+    assert decode_cursor(next_cursor) == (1004.0, docs[4]['_id'])
+
+
+def test_unknown_sort_is_rejected():
+    try:
+        Loan(RecordingCollection([])).search_pending_loans(sort='random')
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+
+
+def main():
+    print("🚀 QuickCred Loan Search Test")
+    print("=" * 40)
+    for test in (test_cursor_round_trip, test_filters_sort_and_next_page, test_unknown_sort_is_rejected):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
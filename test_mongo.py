@@ -15,15 +15,13 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 def test_mongodb():
     """Test MongoDB connection and create collections"""
     try:
-        from app import app, mongo
+        from app import app, client, db
 
         # Create app context
         app_context = app.app_context()
         app_context.push()
 
         try:
-            db = mongo.db
-
             print("🔗 Testing MongoDB connection...")
             # Test connection
             db.command('ping')
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Outbox Test
+Checks that loan and wallet writes record their events with the same
+session, that the dispatcher delivers batches to every sink, retries only
+the sinks that failed, gives up after the attempt limit, and re-delivers
+events whose dispatcher died mid-batch; no MongoDB needed
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from config import Config
+from fake_mongo import FakeDB
+from models.loan import Loan
+from models.outbox import Outbox, DEAD, DELIVERED, PENDING
+from models.routing import in_transaction
+from models.transaction import Transaction
+from models.user import User
+from outbox_dispatcher import OutboxDispatcher, build_sinks, register_sink
+
+
+class RecordingSink:
+    def __init__(self, name, failures=0):
+        self.name = name
+        self.failures = failures
+        self.batches = []
+
+    def send(self, events):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError(f'{self.name} unavailable')
+        self.batches.append([event['_id'] for event in events])
+
+
+def dispatcher(outbox, sinks, max_attempts=8, owner=None):
+    worker = OutboxDispatcher()
+    worker.configure(outbox, sinks, batch_size=10, max_attempts=max_attempts)
+    if owner:
+        worker.owner = owner
+    return worker
+
+
+def make_due(outbox):
+    """Skip the retry backoff"""
+    for event in outbox.collection.docs:
+        event['next_attempt_at'] = datetime.utcnow() - timedelta(seconds=1)
+
+
+def test_writes_record_events_in_their_session():
+    db = FakeDB()
+    outbox = Outbox(db['outbox'])
+    borrower_id, lender_id = ObjectId(), ObjectId()
+    loans = Loan(db['loans'], outbox=outbox)
+    users = User(db['users'], outbox=outbox)
+    db['users'].insert_one({'_id': lender_id, 'wallet_balance': 5000.0})
+    loan_id = loans.create_loan(borrower_id, 1000, 3)
+    db['users'].sessions.clear()
+
+    session = object()
+    assert loans.fund_loan(loan_id, lender_id, session=session)
+    users.update_wallet_balance(lender_id, -1000.0, session=session)
+    Transaction(db['transactions']).create_transaction(loan_id, lender_id, 1000, 'loan_funding', session=session)
+    loans.repay_loan(loan_id, borrower_id, session=session)
+    users.set_wallet_balance(lender_id, 42.0, session=session)
+
+    events = db['outbox'].docs
+    assert [event['type'] for event in events] == [
+        'loan.funded', 'wallet.balance_changed', 'loan.repaid', 'wallet.balance_set']
+    assert events[0]['payload']['amount'] == 1000.0
+    assert events[0]['payload']['lender_id'] == lender_id
+    assert all(event['status'] == PENDING for event in events)
+    for name in ('outbox', 'users', 'transactions'):
+        assert set(db[name].sessions) == {session}, name
+
+
+def test_in_transaction_passes_its_session():
+    calls = []
+
+    class FakeSession:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def with_transaction(self, callback, **kwargs):
+            calls.append(kwargs)
+            return callback(self)
+
+    client = SimpleNamespace(start_session=FakeSession)
+    original = Config.MONGO_TRANSACTIONS
+    try:
+        Config.MONGO_TRANSACTIONS = False
+        assert in_transaction(client, lambda session: session) is None
+        Config.MONGO_TRANSACTIONS = True
+        assert isinstance(in_transaction(client, lambda session: session), FakeSession)
+        assert calls[0]['write_concern'].document['w'] == 'majority'
+    finally:
+        Config.MONGO_TRANSACTIONS = original
+
+
+def test_batches_reach_every_sink():
+    db = FakeDB()
+    outbox = Outbox(db['outbox'])
+    ids = [outbox.record('wallet.balance_changed', {'user_id': ObjectId(), 'amount': i}) for i in range(15)]
+    log, hook = RecordingSink('log'), RecordingSink('webhook')
+
+    assert dispatcher(outbox, [log, hook]).drain() == 15
+    assert [len(batch) for batch in log.batches] == [10, 5]
+    assert sum(hook.batches, []) == ids
+    assert all(event['status'] == DELIVERED for event in db['outbox'].docs)
+
+
+def test_failed_sink_is_retried_alone():
+    db = FakeDB()
+    outbox = Outbox(db['outbox'])
+    event_id = outbox.record('loan.funded', {'loan_id': ObjectId()})
+    log, hook = RecordingSink('log'), RecordingSink('webhook', failures=1)
+    worker = dispatcher(outbox, [log, hook])
+
+    assert worker.dispatch_once() == 1
+    [event] = db['outbox'].docs
+    assert event['status'] == PENDING and event['attempts'] == 1
+    assert event['delivered_to'] == ['log']
+    assert event['next_attempt_at'] > datetime.utcnow()
+    assert worker.dispatch_once() == 0  # backing off
+
+    make_due(outbox)
+    assert worker.dispatch_once() == 1
+    assert event['status'] == DELIVERED
+    assert log.batches == [[event_id]]
+    assert hook.batches == [[event_id]]
+
+
+def test_gives_up_after_max_attempts():
+    db = FakeDB()
+    outbox = Outbox(db['outbox'])
+    outbox.record('loan.repaid', {'loan_id': ObjectId()})
+    worker = dispatcher(outbox, [RecordingSink('webhook', failures=99)], max_attempts=3)
+    for _ in range(3):
+        make_due(outbox)
+        worker.dispatch_once()
+    make_due(outbox)
+    assert worker.dispatch_once() == 0
+    assert db['outbox'].docs[0]['status'] == DEAD
+    assert outbox.requeue_dead() == 1
+    assert db['outbox'].docs[0]['status'] == PENDING
+
+
+def test_expired_lease_is_delivered_again():
+    """A dispatcher that dies after claiming leaves events another one picks up"""
+    db = FakeDB()
+    outbox = Outbox(db['outbox'])
+    outbox.record('loan.funded', {'loan_id': ObjectId()})
+    assert len(outbox.claim('crashed', lease_seconds=30)) == 1
+    sink = RecordingSink('log')
+    survivor = dispatcher(outbox, [sink], owner='survivor')
+    assert survivor.dispatch_once() == 0
+
+    db['outbox'].docs[0]['lease_until'] = datetime.utcnow() - timedelta(seconds=1)
+    assert survivor.dispatch_once() == 1
+    assert db['outbox'].docs[0]['status'] == DELIVERED
+    # The crashed dispatcher's late completion no longer owns the event
+    outbox.complete([db['outbox'].docs[0]['_id']], 'crashed')
+    assert 'claimed_by' not in db['outbox'].docs[0]
+
+
+def test_sink_registry():
+    register_sink('test', lambda config: RecordingSink('test'))
+    sinks = build_sinks('log, webhook,email,test', {'OUTBOX_WEBHOOK_URL': 'http://127.0.0.1:1/events',
+                                                     'OUTBOX_EMAIL_PATH': os.devnull})
+    assert [sink.name for sink in sinks] == ['log', 'webhook', 'email', 'test']
+    try:
+        build_sinks('sms', {})
+        assert False, 'unknown sink accepted'
+    except ValueError:
+        pass
+
+
+def main():
+    print("🚀 QuickCred Outbox Test")
+    print("=" * 40)
+    for test in (test_writes_record_events_in_their_session, test_in_transaction_passes_its_session,
+                 test_batches_reach_every_sink, test_failed_sink_is_retried_alone,
+                 test_gives_up_after_max_attempts, test_expired_lease_is_delivered_again, test_sink_registry):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Read-Preference Routing Test
+Starts a local three-node replica set and checks that analytics reads go
+to secondaries while money-moving operations stay on the primary.
+Skipped when mongod is not installed.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from pymongo import MongoClient, monitoring
+from pymongo.write_concern import WriteConcern
+
+from local_cluster import LocalReplicaSet, mongod_available
+from models.loan import Loan
+from models.transaction import Transaction
+from models.routing import routed, ANALYTICS, STRONG
+
+
+class AddressRecorder(monitoring.CommandListener):
+    """Records which server each command was sent to"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in ('find', 'aggregate', 'update', 'insert', 'count'):
+            self.commands.append((event.command_name, event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def test_routing_options():
+    """Analytics handles ask for secondaries within the staleness bound"""
+    collection = MongoClient(connect=False).quickcred.loans
+    analytics = routed(collection, ANALYTICS)
+    strong = routed(collection, STRONG)
+    assert analytics.read_preference.mongos_mode == 'secondaryPreferred'
+    assert analytics.read_preference.max_staleness >= 90
+    assert strong.read_preference.mongos_mode == 'primary'
+    assert strong.read_concern.level == 'majority'
+    assert strong.write_concern.document['w'] == 'majority'
+
+
+def test_analytics_reads_go_to_secondaries():
+    if not mongod_available():
+        print("⚠️  mongod not found; skipping replica set test")
+        return
+
+    recorder = AddressRecorder()
+    with LocalReplicaSet() as rs:
+        client = MongoClient(rs.uri, event_listeners=[recorder])
+        db = client.quickcred
+
+        # Write to every member so secondaries can answer immediately
+        lender_id = ObjectId()
+        seeded = db.loans.with_options(write_concern=WriteConcern(w=3))
+        loan_id = seeded.insert_one({
+            'borrower_id': ObjectId(), 'amount': 1000.0, 'term_months': 3, 'status': 'pending',
+            'interest_rate': 0.047, 'lender_return_rate': 0.02, 'created_at': datetime.utcnow(),
+        }).inserted_id
+        db.transactions.with_options(write_concern=WriteConcern(w=3)).insert_one({
+            'loan_id': loan_id, 'user_id': lender_id, 'amount': 20.0, 'type': 'interest_payment',
+        })
+
+        primary = client.primary
+        recorder.commands.clear()
+        Loan(db.loans).get_loan_analytics()
+        Transaction(db.transactions).get_platform_analytics()
+        Transaction(db.transactions).get_lender_returns(lender_id)
+        assert recorder.commands and all(address != primary for _, address in recorder.commands)
+
+        recorder.commands.clear()
+        assert Loan(db.loans).fund_loan(loan_id, lender_id)
+        assert recorder.commands and all(address == primary for _, address in recorder.commands)
+        client.close()
+
+
+def main():
+    print("🚀 QuickCred Read Routing Test")
+    print("=" * 40)
+    for test in (test_routing_options, test_analytics_reads_go_to_secondaries):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
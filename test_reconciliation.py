@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Wallet Reconciliation Test
+Builds wallets through the same moves the endpoints make, drifts one with a
+direct $set, and checks that reconciliation over _id-range partitions
+reports exactly that user, ignores a transfer committing between the
+wallet and ledger reads, counts archived history, and resumes a run
+without redoing finished partitions; no MongoDB needed
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from fake_mongo import FakeCollection, FakeDB
+from models.archive import ArchiveStore, archive_repaid_loans
+from models.reconciliation import ReconciliationRun, ledger_balances, reconcile_partition
+
+
+class LedgerCollection(FakeCollection):
+    """FakeCollection whose aggregate() understands $sample and the ledger pipeline"""
+
+    def __init__(self, database=None, name=None, docs=()):
+        super().__init__(database, name, docs)
+        self.aggregations = 0
+
+    def aggregate(self, pipeline):
+        self.aggregations += 1
+        if '$sample' in pipeline[0]:
+            return [{'_id': doc['_id']} for doc in self.docs]
+        balances = ledger_balances(self.find(pipeline[0]['$match']))
+        return [{'_id': user_id, 'expected': expected} for user_id, expected in balances.items()]
+
+
+def seed(db, lenders=20, borrowers=20):
+    """Wallets moved the way topup, fund and repay move them, each with its ledger rows"""
+    users, loans, transactions = db['users'], db['loans'], db['transactions']
+
+    def move(user_id, amount, kind, loan_id=None):
+        users.update_one({'_id': user_id}, {'$inc': {'wallet_balance': amount}})
+        transactions.insert_one({'user_id': user_id, 'loan_id': loan_id or ObjectId(),
+                                 'amount': abs(amount), 'type': kind, 'timestamp': datetime.utcnow()})
+
+    ids = []
+    for i in range(lenders + borrowers):
+        ids.append(users.insert_one({'wallet_balance': 0.0}).inserted_id)
+    for i in range(lenders):
+        lender_id, borrower_id = ids[i], ids[lenders + i]
+        move(lender_id, 10000.0, 'wallet_topup')
+        move(borrower_id, 500.0, 'wallet_topup')
+        loan_id = ObjectId()
+        loans.insert_one({'_id': loan_id, 'borrower_id': borrower_id, 'lender_id': lender_id,
+                          'status': 'funded', 'amount': 1000.0})
+        move(lender_id, -1000.0, 'loan_funding', loan_id)
+        if i % 2:
+            # Repaid: the lender's principal comes back without a row of its own
+            move(borrower_id, -141.0, 'repayment', loan_id)
+            users.update_one({'_id': lender_id}, {'$inc': {'wallet_balance': 1000.0}})
+            move(lender_id, 60.0, 'interest_payment', loan_id)
+            loans.update_one({'_id': loan_id}, {'$set': {
+                'status': 'repaid', 'repaid_at': datetime.utcnow() - timedelta(days=400)}})
+    return ids
+
+
+def reconcile_all(db, partitions, archive=None):
+    runs = ReconciliationRun(db)
+    run = runs.start(db['users'], partitions)
+    for index, lower, upper in runs.pending(run):
+        checked, discrepancies = reconcile_partition(db['users'], db['transactions'], lower, upper, archive)
+        runs.record(run['_id'], index, checked, discrepancies)
+    return runs.finish(run['_id'])
+
+
+def test_balanced_wallets_reconcile():
+    db = FakeDB(LedgerCollection)
+    seed(db)
+    run = reconcile_all(db, partitions=4)
+    assert len(run['partitions']) == 4
+    assert run['users_checked'] == 40
+    assert run['discrepancies'] == 0
+
+
+def test_set_balance_is_reported():
+    db = FakeDB(LedgerCollection)
+    ids = seed(db)
+    db['users'].update_one({'_id': ids[3]}, {'$set': {'wallet_balance': 12345.0}})
+    run = reconcile_all(db, partitions=8)
+    assert run['discrepancies'] == 1
+    [report] = db['reconciliation_discrepancies'].docs
+    assert report['user_id'] == ids[3]
+    assert report['expected_balance'] == 10060.0
+    assert report['difference'] == 12345.0 - 10060.0
+
+
+def test_transfer_between_reads_is_not_reported():
+    db = FakeDB(LedgerCollection)
+    ids = seed(db)
+    users = db['users']
+
+    class TopupAfterWalletRead(LedgerCollection):
+        """Users whose range read is followed by a committed topup of ids[5]"""
+
+        def find(self, query=None, projection=None, **kwargs):
+            found = users.find(query, projection)
+            if query and '_id' in query and isinstance(query['_id'], dict):
+                users.update_one({'_id': ids[5]}, {'$inc': {'wallet_balance': 250.0}})
+                db['transactions'].insert_one({'user_id': ids[5], 'loan_id': ObjectId(), 'amount': 250.0,
+                                               'type': 'wallet_topup', 'timestamp': datetime.utcnow()})
+            return found
+
+        def find_one(self, query=None, projection=None, **kwargs):
+            return users.find_one(query, projection)
+
+    checked, discrepancies = reconcile_partition(TopupAfterWalletRead(), db['transactions'], ids[0], None)
+    assert checked == 40 and discrepancies == []
+
+    # Real drift is still reported after the second look
+    users.update_one({'_id': ids[5]}, {'$inc': {'wallet_balance': 1.0}})
+    checked, discrepancies = reconcile_partition(users, db['transactions'], ids[0], None)
+    assert [(item['user_id'], item['difference']) for item in discrepancies] == [(ids[5], 1.0)]
+
+
+def test_archived_history_counts():
+    segment_dir = tempfile.mkdtemp(prefix='quickcred-reconcile-')
+    try:
+        for store_dir in (None, segment_dir):
+            db = FakeDB(LedgerCollection)
+            seed(db)
+            archive = ArchiveStore(db, store_dir)
+            moved = archive_repaid_loans(db['loans'], db['transactions'], archive, older_than_days=365)
+            assert moved == (10, 30)
+            run = reconcile_all(db, partitions=4, archive=archive)
+            assert run['discrepancies'] == 0
+    finally:
+        shutil.rmtree(segment_dir)
+
+
+def test_resume_skips_finished_partitions():
+    db = FakeDB(LedgerCollection)
+    ids = seed(db)
+    db['users'].update_one({'_id': ids[0]}, {'$set': {'wallet_balance': 0.0}})
+    runs = ReconciliationRun(db)
+    run = runs.start(db['users'], 4)
+    pending = runs.pending(run)
+    # Interrupted after two partitions, one of them recorded twice
+    for index, lower, upper in pending[:2] + pending[:1]:
+        runs.record(run['_id'], index, *reconcile_partition(db['users'], db['transactions'], lower, upper))
+
+    run = runs.get()
+    resumed = runs.pending(run)
+    assert [item[0] for item in resumed] == [item[0] for item in pending[2:]]
+    before = db['transactions'].aggregations
+    for index, lower, upper in resumed:
+        runs.record(run['_id'], index, *reconcile_partition(db['users'], db['transactions'], lower, upper))
+    assert db['transactions'].aggregations - before == len(resumed)
+
+    run = runs.finish(run['_id'])
+    assert runs.get() is None
+    assert run['users_checked'] == 40
+    assert run['discrepancies'] == 1
+    assert len(db['reconciliation_discrepancies'].docs) == 1
+
+
+def main():
+    print("🚀 QuickCred Wallet Reconciliation Test")
+    print("=" * 40)
+    for test in (test_balanced_wallets_reconcile, test_set_balance_is_reported,
+                 test_transfer_between_reads_is_not_reported,
+                 test_archived_history_counts, test_resume_skips_finished_partitions):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Record Types Test
+Checks that loan, user and transaction records build from dicts and raw
+BSON, compute their derived fields and serialize for JSON; no MongoDB needed
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import bson
+from bson import ObjectId
+
+from models.records import (LOAN_RECORD_PROJECTION, RAW_CODEC_OPTIONS, LoanRecord, TransactionRecord,
+                            UserRecord)
+
+
+def loan_document(**overrides):
+    doc = {
+        '_id': ObjectId(),
+        'borrower_id': ObjectId(),
+        'amount': 1000.0,
+        'term_months': 3,
+        'purpose': 'rent',
+        'status': 'funded',
+        'interest_rate': 0.047,
+        'lender_return_rate': 0.02,
+        'platform_margin_rate': 0.027,
+        'lender_id': ObjectId(),
+        'created_at': datetime(2024, 5, 1, 12, 0),
+        'updated_at': datetime(2024, 5, 2, 12, 0),
+    }
+    doc.update(overrides)
+    return doc
+
+
+def test_loan_record_from_raw_bson():
+    doc = loan_document()
+    raw = bson.decode_all(bson.encode(doc), RAW_CODEC_OPTIONS)[0]
+    record = LoanRecord.from_document(raw)
+
+    assert record.id == doc['_id'] and record.lender_id == doc['lender_id']
+    assert abs(record.total_interest - 141.0) < 1e-9
+    assert abs(record.total_amount - 1141.0) < 1e-9
+    assert abs(record.lender_return - 60.0) < 1e-9
+    assert not hasattr(record, '__dict__')
+    assert 'platform_margin_rate' not in LOAN_RECORD_PROJECTION
+    assert 'updated_at' not in LOAN_RECORD_PROJECTION
+
+
+def test_loan_record_to_dict():
+    doc = loan_document(status='pending', lender_id=None)
+    data = LoanRecord.from_document(doc).to_dict()
+    assert data['id'] == str(doc['_id'])
+    assert data['borrower_id'] == str(doc['borrower_id'])
+    assert data['lender_id'] is None
+    assert data['created_at'] == '2024-05-01T12:00:00'
+    assert 'total_interest' not in data
+    assert 'total_interest' in LoanRecord.from_document(loan_document()).to_dict()
+
+
+def test_user_and_transaction_records():
+    user_doc = {'_id': ObjectId(), 'name': 'Asha', 'email': 'asha@example.com', 'role': 'lender',
+                'password': b'hash', 'wallet_balance': 250.0}
+    user = UserRecord.from_document(bson.decode_all(bson.encode(user_doc), RAW_CODEC_OPTIONS)[0])
+    assert (user.name, user.role, user.wallet_balance) == ('Asha', 'lender', 250.0)
+
+    row = {'_id': ObjectId(), 'loan_id': ObjectId(), 'user_id': user_doc['_id'], 'amount': 60.0,
+           'type': 'interest_payment', 'description': 'Lender return', 'timestamp': datetime(2024, 5, 3)}
+    data = TransactionRecord.from_document(row).to_dict()
+    assert data['id'] == str(row['_id']) and data['user_id'] == str(user_doc['_id'])
+    assert data['timestamp'] == '2024-05-03T00:00:00'
+    assert data['status'] == 'completed'
+
+
+def main():
+    print("🚀 QuickCred Records Test")
+    print("=" * 40)
+    for test in (test_loan_record_from_raw_bson, test_loan_record_to_dict, test_user_and_transaction_records):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
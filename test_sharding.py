@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Sharded Mode Test
+Checks that per-user model queries carry their collection's shard key and
+that the marketplace reads the pending-loan index collection. When mongod
+and mongos are installed it also starts a local two-shard cluster and
+checks with explain that those queries reach a single shard.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from fake_mongo import FakeCollection
+from local_cluster import LocalShardedCluster, mongos_available
+from models.loan import Loan
+from models.sharding import SHARD_KEYS, is_targeted, shard_collections
+from models.transaction import Transaction
+from models.user import User
+
+
+class RecordingCollection(FakeCollection):
+    """FakeCollection that records every filter it is queried with"""
+
+    def __init__(self, name, docs=()):
+        super().__init__(name=name, docs=docs)
+        self.filters = []
+
+    def _matching(self, query):
+        self.filters.append(query)
+        return super()._matching(query)
+
+
+def assert_targeted(collection):
+    for query in collection.filters:
+        assert is_targeted(collection.name, query), f"{collection.name} query {query} is not targeted"
+
+
+def test_shard_key_detection():
+    borrower_id = ObjectId()
+    assert is_targeted('loans', {'_id': ObjectId(), 'borrower_id': borrower_id})
+    assert not is_targeted('loans', {'_id': ObjectId()})
+    assert not is_targeted('loans', {'borrower_id': {'$in': [borrower_id]}})
+    assert is_targeted('transactions', {'user_id': ObjectId(), 'type': 'repayment'})
+    assert set(SHARD_KEYS) == {'users', 'loans', 'transactions'}
+
+
+def test_per_user_queries_carry_shard_key():
+    borrower_id, lender_id = ObjectId(), ObjectId()
+    users = RecordingCollection('users', [{'_id': borrower_id, 'wallet_balance': 0.0},
+                                     {'_id': lender_id, 'wallet_balance': 0.0}])
+    loans = RecordingCollection('loans')
+    index = RecordingCollection('pending_loans')
+    transactions = RecordingCollection('transactions')
+
+    user_model = User(users)
+    loan_model = Loan(loans, pending_index=index)
+    transaction_model = Transaction(transactions)
+
+    loan_id = loan_model.create_loan(borrower_id, 1000, 3, 'rent')
+    assert loan_model.get_loan_by_id(loan_id)['borrower_id'] == borrower_id
+    assert loan_model.fund_loan(loan_id, lender_id)
+    assert index.docs == []
+    loan = loan_model.get_loan_by_id(loan_id, borrower_id=borrower_id)
+    loan_model.repay_loan(loan_id, loan['borrower_id'])
+    loan_model.get_loans_by_borrower(borrower_id)
+
+    user_model.get_user_by_id(borrower_id)
+    user_model.update_wallet_balance(lender_id, -1000)
+    transaction_model.create_transaction(loan_id, borrower_id, 1000, 'repayment')
+    transaction_model.get_transactions_by_user(borrower_id)
+
+    for collection in (users, loans, transactions):
+        assert collection.filters
+        assert_targeted(collection)
+    assert loans.docs[0]['status'] == 'repaid'
+
+
+def test_marketplace_reads_pending_index():
+    loans = RecordingCollection('loans')
+    index = RecordingCollection('pending_loans')
+    loan_model = Loan(loans, pending_index=index)
+    loan_model.create_loan(ObjectId(), 1000, 3, 'rent')
+    loans.filters.clear()
+
+    found, next_cursor, total, capped = loan_model.search_pending_loans(limit=10)
+    assert len(found) == 1 and total == 1
+    assert len(loan_model.get_pending_loans()) == 1
+    assert loans.filters == []
+
+
+def single_shard(db, collection, query):
+    explain = db.command('explain', {'find': collection, 'filter': query}, verbosity='queryPlanner')
+    return explain['queryPlanner']['winningPlan']['stage'] == 'SINGLE_SHARD'
+
+
+def test_queries_target_one_shard():
+    if not mongos_available():
+        print("⚠️  mongod/mongos not found; skipping sharded cluster test")
+        return
+
+    with LocalShardedCluster(shards=2) as cluster:
+        client = MongoClient(cluster.uri)
+        db = client.quickcred
+        shard_collections(client, 'quickcred')
+
+        borrower_id = ObjectId()
+        users = db.users
+        users.insert_one({'_id': borrower_id, 'wallet_balance': 0.0})
+        loan_id = Loan(db.loans, pending_index=db.pending_loans).create_loan(borrower_id, 1000, 3)
+        Transaction(db.transactions).create_transaction(loan_id, borrower_id, 1000, 'loan_funding')
+
+        assert single_shard(db, 'users', {'_id': borrower_id})
+        assert single_shard(db, 'loans', {'borrower_id': borrower_id})
+        assert single_shard(db, 'loans', {'_id': ObjectId(loan_id), 'borrower_id': borrower_id})
+        assert single_shard(db, 'transactions', {'user_id': borrower_id})
+        assert not single_shard(db, 'loans', {'status': 'pending', 'created_at': {'$lte': datetime.utcnow()}})
+        client.close()
+
+
+def main():
+    print("🚀 QuickCred Sharding Test")
+    print("=" * 40)
+    for test in (test_shard_key_detection, test_per_user_queries_carry_shard_key,
+                 test_marketplace_reads_pending_index, test_queries_target_one_shard):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Slow Query Log Test
+Checks query shape redaction and explain parsing without a database
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from slow_query_log import find_execution_stats, query_shape, shape_hash, winning_plan
+
+
+def test_find_shape_is_redacted():
+    """Literal values disappear; fields, operators, sort and projection stay"""
+    command = {
+        'find': 'loans',
+        'filter': {'borrower_id': ObjectId(), 'status': {'$in': ['pending', 'funded']}},
+        'sort': {'created_at': -1},
+    }
+    shape = query_shape('find', command)
+    assert shape['filter'] == {'borrower_id': '?', 'status': {'$in': ['?']}}
+    assert shape['sort'] == {'created_at': -1}
+
+
+def test_same_shape_same_hash():
+    """Queries that differ only in values group together"""
+    first = query_shape('find', {'filter': {'email': 'a@example.com'}})
+    second = query_shape('find', {'filter': {'email': 'b@example.com'}})
+    assert shape_hash('users', 'find', first) == shape_hash('users', 'find', second)
+
+
+def test_aggregate_match_is_redacted():
+    command = {'pipeline': [
+        {'$match': {'user_id': ObjectId(), 'type': 'interest_payment'}},
+        {'$group': {'_id': None, 'total': {'$sum': '$amount'}}},
+    ]}
+    shape = query_shape('aggregate', command)
+    assert shape['pipeline'][0] == {'$match': {'user_id': '?', 'type': '?'}}
+    assert shape['pipeline'][1]['$group']['total'] == {'$sum': '$amount'}
+
+
+def test_explain_parsing():
+    explain = {'stages': [{'$cursor': {'executionStats': {
+        'nReturned': 3, 'totalDocsExamined': 5000,
+        'executionStages': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'status_1'}},
+    }}}]}
+    stats = find_execution_stats(explain)
+    assert stats['totalDocsExamined'] == 5000
+    assert winning_plan(stats) == 'FETCH > IXSCAN(status_1)'
+
+
+def main():
+    print("🚀 QuickCred Slow Query Log Test")
+    print("=" * 40)
+    for test in (test_find_shape_is_redacted, test_same_shape_same_hash,
+                 test_aggregate_match_is_redacted, test_explain_parsing):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
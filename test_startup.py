@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Startup Test
+Checks that importing the app stays within its time budget with the
+database unreachable and leaves compiling templates to the servers, that
+an index conflicting with an existing one doesn't hold readiness back,
+and what /healthz and /readyz report; no MongoDB needed
+"""
+
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from pymongo.errors import OperationFailure
+
+from readiness import Readiness, init_readiness, readiness
+
+# Well under the 5 s server selection timeout, so any network wait at import fails it
+IMPORT_BUDGET_SECONDS = 2.0
+UNREACHABLE_URI = 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=5000'
+
+
+class FakeAdmin:
+    def __init__(self, db):
+        self.db = db
+
+    def command(self, name):
+        if not self.db.up:
+            raise ConnectionError('connection refused')
+        return {'ok': 1}
+
+
+class FakeClient:
+    def __init__(self, db):
+        self.admin = FakeAdmin(db)
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.database = db
+        self.name = name
+
+    def create_index(self, keys, **kwargs):
+        if self.name in self.db.failing:
+            raise self.db.failing[self.name]
+        self.db.indexes_created += 1
+
+
+class FakeDB:
+    def __init__(self, up=True, failing=None):
+        self.up = up
+        self.indexes_created = 0
+        self.failing = failing or {}
+        self.client = FakeClient(self)
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+
+def test_import_within_budget():
+    """A fresh interpreter imports the app without waiting on the database"""
+    code = ("import time; started = time.perf_counter(); import app; "
+            "print(time.perf_counter() - started)")
+    env = dict(os.environ, MONGODB_URI=UNREACHABLE_URI)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, timeout=30)
+    wall = time.perf_counter() - started
+    assert result.returncode == 0, result.stderr
+    import_seconds = float(result.stdout.strip().splitlines()[-1])
+    assert import_seconds < IMPORT_BUDGET_SECONDS, f"import took {import_seconds:.2f}s"
+    assert wall < IMPORT_BUDGET_SECONDS + 3, f"interpreter took {wall:.2f}s"
+
+
+def test_import_leaves_templates_to_the_server():
+    """Importing the app, as the command-line jobs do, compiles nothing; init_templates() does"""
+    cache_dir = os.path.join(tempfile.mkdtemp(prefix='quickcred-startup-'), 'jinja')
+    code = ("import os, app; assert not os.path.exists(os.environ['JINJA_CACHE_DIR']); "
+            "app.init_templates(); print(len(os.listdir(os.environ['JINJA_CACHE_DIR'])))")
+    env = dict(os.environ, MONGODB_URI=UNREACHABLE_URI, JINJA_CACHE_DIR=cache_dir)
+    try:
+        result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                env=env, capture_output=True, text=True, timeout=30)
+        assert result.returncode == 0, result.stderr
+        assert int(result.stdout.strip().splitlines()[-1]) > 0
+    finally:
+        shutil.rmtree(os.path.dirname(cache_dir))
+
+
+def test_indexes_created_once_database_is_up():
+    db = FakeDB(up=False)
+    checks = Readiness()
+    checks.configure(db)
+
+    status = checks.check()
+    assert not status['ready']
+    assert status['checks']['database'].startswith('error')
+    assert db.indexes_created == 0
+
+    db.up = True
+    assert checks.check()['ready']
+    created = db.indexes_created
+    assert created > 0
+    assert checks.check()['ready']
+    assert db.indexes_created == created
+
+
+def test_conflicting_index_does_not_block_readiness():
+    """An index that exists with other options is a warning; other failures are retried"""
+    conflict = OperationFailure('An existing index has the same name as the requested index', code=85)
+    db = FakeDB(failing={'idempotency_keys': conflict})
+    checks = Readiness()
+    checks.configure(db)
+    status = checks.check()
+    assert status['ready'] and status['checks']['indexes'] == 'ok'
+    assert len(status['checks']['index_warnings']) == 1
+    # The other models' indexes are still created
+    assert db.indexes_created > 0
+    assert checks.check()['checks']['index_warnings'] == status['checks']['index_warnings']
+
+    checks = Readiness()
+    checks.configure(FakeDB(failing={'loans': OperationFailure('not authorized', code=13)}))
+    status = checks.check()
+    assert not status['ready'] and status['checks']['indexes'].startswith('error')
+
+
+def test_wait_returns_once_ready():
+    checks = Readiness()
+    checks.configure(FakeDB(up=False), interval=0.01)
+    assert checks.wait(timeout=0.05) is False
+    checks.db.up = True
+    assert checks.wait(timeout=1.0) is True
+
+
+def test_health_endpoints():
+    """/healthz never depends on the database; /readyz follows the last check"""
+    app = Flask(__name__)
+    init_readiness(app)
+    client = app.test_client()
+    readiness.configure(FakeDB(up=False), interval=60)
+    readiness.check()
+
+    assert client.get('/healthz').status_code == 200
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['ready'] is False
+
+    readiness.db.up = True
+    readiness.check()
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    checks = response.get_json()['checks']
+    assert checks['database'] == 'ok' and checks['indexes'] == 'ok'
+
+
+def main():
+    print("🚀 QuickCred Startup Test")
+    print("=" * 40)
+    for test in (test_import_within_budget, test_import_leaves_templates_to_the_server,
+                 test_indexes_created_once_database_is_up,
+                 test_conflicting_index_does_not_block_readiness, test_wait_returns_once_ready,
+                 test_health_endpoints):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
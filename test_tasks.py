@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Background Task Test
+Checks that queued tasks run by priority, that a full queue runs tasks
+inline, that durable tasks are retried and survive a restart, that
+shutdown drains the queue, that deferred tasks run after the response,
+and that process tasks run in another process; no MongoDB needed
+"""
+
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from fake_mongo import FakeCollection
+from models.task_store import TaskStore, FAILED, QUEUED
+from tasks import HIGH, LOW, NORMAL, TaskExecutor, task, TASKS
+
+
+calls = []
+gate = threading.Event()
+blocking = threading.Event()
+failures = {'count': 0}
+
+
+@task('test.record')
+def record_call(value):
+    calls.append(value)
+
+
+@task('test.block', priority=HIGH)
+def block():
+    blocking.set()
+    gate.wait(5)
+
+
+@task('test.flaky', durable=True)
+def flaky(value):
+    if failures['count']:
+        failures['count'] -= 1
+        raise ConnectionError('score store unavailable')
+    calls.append(value)
+
+
+@task('test.write_pid', process=True)
+def write_pid(path):
+    with open(path, 'w') as handle:
+        handle.write(str(os.getpid()))
+
+
+def executor(threads=1, max_queue=100, store=None):
+    worker = TaskExecutor()
+    worker.configure(threads=threads, max_queue=max_queue, store=store)
+    return worker
+
+
+def make_due(collection):
+    """Skip the retry backoff and the recovery grace period"""
+    for doc in collection.docs:
+        doc['run_at'] = datetime.utcnow() - timedelta(hours=1)
+
+
+def test_tasks_run_by_priority():
+    calls.clear()
+    gate.clear()
+    worker = executor()
+    worker.submit('test.block')
+    worker.submit('test.record', 'low', priority=LOW)
+    worker.submit('test.record', 'normal')
+    worker.submit('test.record', 'high', priority=HIGH)
+    assert worker.stats()['queued'] >= 3
+    gate.set()
+    worker.shutdown(timeout=5)
+    assert calls == ['high', 'normal', 'low']
+
+
+def test_full_queue_runs_inline():
+    calls.clear()
+    gate.clear()
+    blocking.clear()
+    worker = executor(max_queue=1)
+    worker.submit('test.block')
+    assert blocking.wait(5)
+    worker.submit('test.record', 'queued')
+    worker.submit('test.record', 'inline')
+    assert calls == ['inline']
+    gate.set()
+    worker.shutdown(timeout=5)
+    assert calls == ['inline', 'queued']
+
+
+def test_disabled_executor_runs_inline():
+    calls.clear()
+    TaskExecutor().submit('test.record', 'now')
+    assert calls == ['now']
+
+
+def test_durable_task_is_retried_and_recovered():
+    calls.clear()
+    collection = FakeCollection()
+    store = TaskStore(collection)
+    failures['count'] = 1
+    worker = executor(store=store)
+    worker.submit('test.flaky', 'scored')
+    worker.shutdown(timeout=5)
+    [stored] = collection.docs
+    assert stored['status'] == QUEUED and stored['attempts'] == 1
+    assert stored['last_error'] == 'score store unavailable'
+    assert calls == []
+
+    # A new process finds it once it is due
+    make_due(collection)
+    restarted = executor(store=store)
+    assert restarted.recover() == 1
+    restarted.shutdown(timeout=5)
+    assert calls == ['scored']
+    assert collection.docs == []
+
+
+def test_stored_task_of_dead_worker_is_recovered():
+    calls.clear()
+    collection = FakeCollection()
+    store = TaskStore(collection)
+    store.add('test.record', ('orphan',), {}, NORMAL)
+    worker = executor(store=store)
+    assert worker.recover() == 0  # still within the grace period
+    make_due(collection)
+    assert worker.recover() == 1
+    worker.shutdown(timeout=5)
+    assert calls == ['orphan']
+    assert collection.docs == []
+
+
+def test_failed_task_gives_up():
+    collection = FakeCollection()
+    store = TaskStore(collection)
+    failures['count'] = 99
+    worker = TaskExecutor()
+    worker.configure(threads=1, store=store, max_attempts=2)
+    try:
+        worker.submit('test.flaky', 'never')
+        worker.flush()
+        make_due(collection)
+        assert worker.recover() == 1
+        worker.flush()
+        make_due(collection)
+        assert worker.recover() == 0
+    finally:
+        worker.shutdown(timeout=5)
+        failures['count'] = 0
+    [stored] = collection.docs
+    assert stored['status'] == FAILED and stored['attempts'] == 2
+
+
+def test_shutdown_drains_then_drops():
+    calls.clear()
+    gate.clear()
+    worker = executor()
+    worker.submit('test.record', 'drained')
+    worker.shutdown(timeout=5)
+    assert calls == ['drained']
+
+    blocking.clear()
+    worker = executor()
+    worker.submit('test.block')
+    assert blocking.wait(5)
+    worker.submit('test.record', 'dropped')
+    worker.shutdown(timeout=0.2)
+    gate.set()
+    assert 'dropped' not in calls
+    worker.submit('test.record', 'after')  # inline once stopping
+    assert calls[-1] == 'after'
+
+
+def test_defer_runs_after_the_response():
+    calls.clear()
+    app = Flask(__name__)
+    worker = executor()
+
+    @app.route('/work')
+    def work():
+        worker.defer('test.record', 'deferred')
+        return str(len(calls))
+
+    with app.test_client() as client:
+        response = client.get('/work')
+        assert response.get_data(as_text=True) == '0'
+        response.close()
+    worker.shutdown(timeout=5)
+    assert calls == ['deferred']
+
+
+def test_process_task_runs_in_another_process():
+    path = os.path.join(tempfile.mkdtemp(prefix='quickcred-tasks-'), 'pid')
+    worker = TaskExecutor()
+    worker.configure(threads=1, processes=1)
+    worker.submit('test.write_pid', path)
+    worker.shutdown(timeout=30)
+    with open(path) as handle:
+        assert int(handle.read()) != os.getpid()
+    assert 'test.write_pid' in TASKS
+
+
+def main():
+    print("🚀 QuickCred Background Task Test")
+    print("=" * 40)
+    for test in (test_tasks_run_by_priority, test_full_queue_runs_inline, test_disabled_executor_runs_inline,
+                 test_durable_task_is_retried_and_recovered, test_stored_task_of_dead_worker_is_recovered,
+                 test_failed_task_gives_up, test_shutdown_drains_then_drops, test_defer_runs_after_the_response,
+                 test_process_task_runs_in_another_process):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+User Cache Test
+Checks the byte-bounded LRU, that model writes invalidate exactly the
+cached queries of the users they touch, that a result computed while a
+write landed is never served as current, that writes in a transaction
+invalidate only once it commits, and that /loan/my-loans is served from
+the cache until the user's loans change; no MongoDB needed
+"""
+
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from flask import Flask
+
+from cache import LRUCache, MemoryBackend, user_cache
+from config import Config
+from controllers import loan_controller
+from models.loan import Loan
+from models.routing import in_transaction
+from models.transaction import Transaction
+from models.user import User
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.finds = 0
+
+    def with_options(self, **kwargs):
+        return self
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return [dict(doc) for doc in self.docs if all(doc.get(k) == v for k, v in query.items())]
+
+    def find_one(self, query, projection=None, session=None):
+        found = self.find(query)
+        return found[0] if found else None
+
+    def insert_one(self, doc, session=None):
+        doc.setdefault('_id', ObjectId())
+        self.docs.append(dict(doc))
+        return SimpleNamespace(inserted_id=doc['_id'])
+
+    def update_one(self, query, update, session=None):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                doc.update(update.get('$set', {}))
+                for field, amount in update.get('$inc', {}).items():
+                    doc[field] = doc.get(field, 0) + amount
+                return
+
+
+def enable_cache(max_bytes=1024 * 1024):
+    user_cache.configure(MemoryBackend(max_bytes, ttl=60), ttl=60)
+
+
+def disable_cache():
+    user_cache.configure(None)
+
+
+def test_lru_is_bounded_in_bytes():
+    cache = LRUCache(max_bytes=300, ttl=60)
+    for key in 'abc':
+        cache.set(key, 'x' * 80)
+    assert cache.get('a') is not None  # a is now the most recently used
+    cache.set('d', 'x' * 80)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('d') is not None
+    assert cache.size <= 300 and cache.evictions == 1
+    cache.set('huge', 'x' * 1000)
+    assert cache.get('huge') is None
+
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['evictions'] == 1 and stats['hits'] == 3
+
+
+def test_lru_expires_and_returns_copies():
+    cache = LRUCache(max_bytes=10000, ttl=0.05)
+    cache.set('loans', {'loans': [1, 2]})
+    cache.get('loans')['loans'].append(3)
+    assert cache.get('loans') == {'loans': [1, 2]}
+    time.sleep(0.06)
+    assert cache.get('loans') is None
+    assert cache.size == 0
+
+
+def test_writes_invalidate_only_their_users():
+    users, loans, transactions = FakeCollection(), FakeCollection(), FakeCollection()
+    alice = users.insert_one({'wallet_balance': 0.0}).inserted_id
+    bob = users.insert_one({'wallet_balance': 0.0}).inserted_id
+    enable_cache()
+    try:
+        def cached(user_id, shape, scopes):
+            return user_cache.get_or_set(user_id, shape, scopes, lambda: {'computed': time.monotonic()})
+
+        before = {(user_id, shape): cached(user_id, shape, scopes)
+                  for user_id in (alice, bob)
+                  for shape, scopes in (('wallet', ('user',)), ('history', ('transactions',)),
+                                        ('lender', ('user', 'loans', 'marketplace')))}
+
+        User(users, outbox=None).update_wallet_balance(alice, 100.0)
+        Transaction(transactions, archive=None).create_transaction(ObjectId(), bob, 100.0, 'wallet_topup')
+
+        assert cached(alice, 'wallet', ('user',)) != before[(alice, 'wallet')]
+        assert cached(bob, 'wallet', ('user',)) == before[(bob, 'wallet')]
+        assert cached(alice, 'history', ('transactions',)) == before[(alice, 'history')]
+        assert cached(bob, 'history', ('transactions',)) != before[(bob, 'history')]
+        assert cached(bob, 'lender', ('user', 'loans', 'marketplace')) == before[(bob, 'lender')]
+
+        # A new loan changes the marketplace every lender sees
+        Loan(loans, pending_index=None, archive=None, outbox=None).create_loan(alice, 1000, 3)
+        assert cached(bob, 'lender', ('user', 'loans', 'marketplace')) != before[(bob, 'lender')]
+        assert user_cache.stats()['hits'] >= 3
+    finally:
+        disable_cache()
+
+
+def test_result_computed_during_a_write_is_not_served():
+    user_id = ObjectId()
+    enable_cache()
+    try:
+        key, value = user_cache.lookup(user_id, 'history', ('transactions',))
+        assert value is None
+        # A write lands while the query runs
+        user_cache.invalidate('transactions', user_id)
+        user_cache.store(key, {'transactions': []})
+        assert user_cache.lookup(user_id, 'history', ('transactions',))[1] is None
+    finally:
+        disable_cache()
+
+
+def test_transaction_invalidates_after_commit():
+    class FakeSession:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def with_transaction(self, callback, **kwargs):
+            return callback(self)
+
+    users = FakeCollection()
+    user_id = users.insert_one({'wallet_balance': 0.0}).inserted_id
+    original = Config.MONGO_TRANSACTIONS
+    enable_cache()
+    try:
+        Config.MONGO_TRANSACTIONS = True
+        user_cache.get_or_set(user_id, 'wallet', ('user',), lambda: 'old')
+
+        def topup(session):
+            User(users, outbox=None).update_wallet_balance(user_id, 50.0, session=session)
+            # Not committed yet, so a concurrent read still gets the old entry
+            return user_cache.lookup(user_id, 'wallet', ('user',))[1]
+
+        assert in_transaction(SimpleNamespace(start_session=FakeSession), topup) == 'old'
+        assert user_cache.lookup(user_id, 'wallet', ('user',))[1] is None
+    finally:
+        Config.MONGO_TRANSACTIONS = original
+        disable_cache()
+
+
+def test_my_loans_served_from_cache_until_loans_change():
+    users, loans, transactions = FakeCollection(), FakeCollection(), FakeCollection()
+    borrower_id = users.insert_one({'role': 'borrower', 'wallet_balance': 0.0}).inserted_id
+    loan_model = Loan(loans, pending_index=None, archive=None, outbox=None)
+    loan_model.create_loan(borrower_id, 1000, 3)
+
+    original = loan_controller.get_collections
+    loan_controller.get_collections = lambda: (users, loans, transactions)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(loan_controller.loan_bp, url_prefix='/loan')
+    enable_cache()
+    try:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = str(borrower_id)
+
+        assert len(client.get('/loan/my-loans').get_json()['loans']) == 1
+        finds = loans.finds
+        assert len(client.get('/loan/my-loans').get_json()['loans']) == 1
+        assert loans.finds == finds
+
+        loan_model.create_loan(borrower_id, 2000, 6)
+        assert len(client.get('/loan/my-loans').get_json()['loans']) == 2
+        assert loans.finds == finds + 1
+    finally:
+        loan_controller.get_collections = original
+        disable_cache()
+
+
+def main():
+    print("🚀 QuickCred User Cache Test")
+    print("=" * 40)
+    for test in (test_lru_is_bounded_in_bytes, test_lru_expires_and_returns_copies,
+                 test_writes_invalidate_only_their_users, test_result_computed_during_a_write_is_not_served,
+                 test_transaction_invalidates_after_commit, test_my_loans_served_from_cache_until_loans_change):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == '__main__':
+    main()